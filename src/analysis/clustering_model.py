@@ -1,14 +1,64 @@
+import numpy as np
 import pandas as pd
 from scipy.spatial.distance import squareform
-from sklearn.cluster import AgglomerativeClustering
-from scipy.cluster.hierarchy import linkage, dendrogram
-import matplotlib.pyplot as plt
-from analysis.utils import CORR_MATRIX_PATH, CLUSTER_LABELS_PATH
+from scipy.cluster.hierarchy import linkage, dendrogram, fcluster
+from analysis.matrix_store import load_matrix, save_npy, tickers_path
+from analysis.utils import CORR_MATRIX_PATH, CLUSTER_LABELS_PATH, LINKAGE_PATH
 
+N_CLUSTERS = 10
 
-def run_clustering_model(input_path: str = CORR_MATRIX_PATH, output_path: str = CLUSTER_LABELS_PATH):
+
+def compute_linkage(correlation: pd.DataFrame) -> np.ndarray:
+    """Complete-linkage tree over the 1 - correlation distance (computed once, cut many times)."""
+    distance = 1 - correlation.to_numpy(dtype=np.float64)
+    distance = (distance + distance.T) / 2
+    np.fill_diagonal(distance, 0.0)
+    return linkage(squareform(distance, checks=False), method="complete")
+
+
+def save_linkage(path: str, Z: np.ndarray, tickers: list[str]):
+    """Tree plus tickers sidecar, each replaced atomically like save_matrix."""
+    save_npy(tickers_path(path), np.array(tickers, dtype=str))
+    save_npy(path, Z)
+
+
+def load_linkage(path: str = LINKAGE_PATH):
+    Z, tickers = np.load(path), np.load(tickers_path(path)).tolist()
+    if len(Z) != max(len(tickers) - 1, 0):
+        raise ValueError(f"{path}: linkage of {len(Z) + 1} leaves but {len(tickers)} tickers (interrupted save?)")
+    return Z, tickers
+
+
+def cut_linkage(Z: np.ndarray, n_clusters: int = None, threshold: float = None) -> np.ndarray:
+    """0-based flat labels for a cluster count (maxclust) or a distance threshold."""
+    if n_clusters is not None:
+        return fcluster(Z, t=n_clusters, criterion="maxclust") - 1
+    return fcluster(Z, t=threshold, criterion="distance") - 1
+
+
+def cluster_labels(
+        Z: np.ndarray, tickers: list[str], n_clusters: int = N_CLUSTERS,
+        cluster_counts=(), distance_thresholds=()
+) -> pd.DataFrame:
+    """
+    Labels from one tree: `cluster` for the primary cut, plus a `cluster_k{n}` column per
+    extra cluster count and a `cluster_t{t}` column per distance threshold.
+    """
+    cluster_df = pd.DataFrame({"ticker": tickers, "cluster": cut_linkage(Z, n_clusters=n_clusters)})
+    for k in cluster_counts:
+        cluster_df[f"cluster_k{k}"] = cut_linkage(Z, n_clusters=k)
+    for t in distance_thresholds:
+        cluster_df[f"cluster_t{t}"] = cut_linkage(Z, threshold=t)
+    return cluster_df
+
+
+def run_clustering_model(
+        input_path: str = CORR_MATRIX_PATH, output_path: str = CLUSTER_LABELS_PATH,
+        n_clusters: int = N_CLUSTERS, cluster_counts=(), distance_thresholds=(),
+        linkage_path: str = LINKAGE_PATH, plot: bool = False
+):
     # Load correlation matrix
-    correlation = pd.read_csv(input_path, index_col=0)
+    correlation = load_matrix(input_path)
 
     # Drop rows and columns with any NaNs (after enforcing symmetry)
     correlation = correlation.dropna(axis=0, how="any")
@@ -21,34 +71,37 @@ def run_clustering_model(input_path: str = CORR_MATRIX_PATH, output_path: str =
     # Check
     assert correlation.shape[0] == correlation.shape[1], f"{correlation.shape[0]} != {correlation.shape[1]}"
 
-    # Convert to distance matrix
-    distance = 1 - correlation
-
-    # Clustering
-    n_clusters = 10
-    clustering = AgglomerativeClustering(
-        metric="precomputed",
-        linkage="complete",
-        n_clusters=n_clusters
-    )
-
-    labels = clustering.fit_predict(distance)
+    # One linkage tree, persisted so other cuts never recompute it
+    Z = compute_linkage(correlation)
+    tickers = list(correlation.index)
+    save_linkage(linkage_path, Z, tickers)
 
     # Save results
-    cluster_df = pd.DataFrame({
-        "ticker": correlation.index,
-        "cluster": labels
-    })
+    cluster_df = cluster_labels(Z, tickers, n_clusters, cluster_counts, distance_thresholds)
     cluster_df.to_csv(output_path, index=False)
 
     print("✅ Clustering done. Sample result:")
     print(cluster_df["cluster"].value_counts())
 
-    # Dendrogram plot
-    Z = linkage(squareform(distance), method='complete')
-    dendrogram(Z, no_labels=True)
-    plt.show()
+    if plot:
+        import matplotlib.pyplot as plt
+
+        dendrogram(Z, no_labels=True)
+        plt.show()
+
+    return cluster_df
+
+
+def recut_clusters(
+        output_path: str = CLUSTER_LABELS_PATH, n_clusters: int = N_CLUSTERS,
+        cluster_counts=(), distance_thresholds=(), linkage_path: str = LINKAGE_PATH
+) -> pd.DataFrame:
+    """Relabel from the saved tree for new cluster counts / thresholds, without re-clustering."""
+    Z, tickers = load_linkage(linkage_path)
+    cluster_df = cluster_labels(Z, tickers, n_clusters, cluster_counts, distance_thresholds)
+    cluster_df.to_csv(output_path, index=False)
+    return cluster_df
 
 
 if __name__ == "__main__":
-    run_clustering_model()
\ No newline at end of file
+    run_clustering_model(plot=True)
@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+
+CORR_BLOCK_SIZE = 512  # tickers per block in pairwise_corr
+
+
+def _corr_from_moments(count, sum_a, sum_b, sumsq_a, sumsq_b, cross, min_periods: int = 2) -> np.ndarray:
+    """Pairwise-complete Pearson correlation from masked moments (all arrays shaped a × b)."""
+    cov = count * cross - sum_a * sum_b
+    var_a = count * sumsq_a - sum_a ** 2
+    var_b = count * sumsq_b - sum_b ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.sqrt(var_a * var_b)
+    corr[(count < min_periods) | (var_a <= 0) | (var_b <= 0)] = np.nan
+    return np.clip(corr, -1.0, 1.0)
+
+
+def pairwise_corr(
+        df: pd.DataFrame, min_periods: int = 2, dtype=np.float64, block_size: int = CORR_BLOCK_SIZE
+) -> pd.DataFrame:
+    """
+    Correlation matrix over pairwise-complete rows, like DataFrame.corr(), but computed with
+    masked matrix products over blocks of columns: no per-pair Python loop and no row dropna.
+    float32 halves memory and roughly doubles BLAS throughput at ~1e-4 precision.
+    """
+    values = df.to_numpy(dtype=np.float64)
+    mask = ~np.isnan(values)
+    # Centre each column: leaves correlations unchanged, keeps float32 sums from cancelling
+    values = values - np.nanmean(np.where(mask.any(axis=0), values, 0.0), axis=0)
+    x = np.where(mask, values, 0.0).astype(dtype)
+    m = mask.astype(dtype)
+    xx = x * x
+
+    n = x.shape[1]
+    corr = np.empty((n, n), dtype=np.float64)
+    for i in range(0, n, block_size):
+        a = slice(i, i + block_size)
+        for j in range(i, n, block_size):
+            b = slice(j, j + block_size)
+            block = _corr_from_moments(
+                count=m[:, a].T @ m[:, b],
+                sum_a=x[:, a].T @ m[:, b],
+                sum_b=m[:, a].T @ x[:, b],
+                sumsq_a=xx[:, a].T @ m[:, b],
+                sumsq_b=m[:, a].T @ xx[:, b],
+                cross=x[:, a].T @ x[:, b],
+                min_periods=min_periods,
+            )
+            corr[a, b] = block
+            corr[b, a] = block.T
+
+    observed = mask.sum(axis=0)
+    np.fill_diagonal(corr, np.where(observed >= min_periods, 1.0, np.nan))
+    return pd.DataFrame(corr, index=df.columns, columns=df.columns)
+
+
+class CorrelationStats:
+    """
+    Pairwise sufficient statistics of a panel of series, kept so the correlation
+    matrix can be updated as rows (days) are appended or dropped instead of recomputed.
+
+    For every ticker pair (i, j), over the rows where both are observed, with d_i = x_i - shift[i]:
+        count[i, j]  number of rows
+        sums[i, j]   sum of d_i
+        sumsq[i, j]  sum of d_i²
+        cross[i, j]  sum of d_i·d_j
+    Each ticker is anchored at its first observed value. Correlation ignores the shift, and
+    moments of the deviations don't lose the variance to cancellation the way raw price sums
+    do after many adds and removes. Adding or removing a block of T rows costs O(T·n²); a single
+    day is O(n²).
+    """
+
+    def __init__(self, tickers=()):
+        self.tickers = list(tickers)
+        n = len(self.tickers)
+        self.count = np.zeros((n, n))
+        self.sums = np.zeros((n, n))
+        self.sumsq = np.zeros((n, n))
+        self.cross = np.zeros((n, n))
+        self.shift = np.full(n, np.nan)  # NaN until the ticker is first observed
+        self.n_rows = 0
+        self.first_date = None
+        self.last_date = None
+
+
+    def _grow(self, tickers):
+        known = set(self.tickers)
+        added = [t for t in tickers if t not in known]
+        if not added:
+            return
+        n_old, n_new = len(self.tickers), len(self.tickers) + len(added)
+        for name in ("count", "sums", "sumsq", "cross"):
+            grown = np.zeros((n_new, n_new))
+            grown[:n_old, :n_old] = getattr(self, name)
+            setattr(self, name, grown)
+        self.shift = np.concatenate([self.shift, np.full(len(added), np.nan)])
+        self.tickers.extend(added)
+
+
+    def _apply(self, rows: pd.DataFrame, sign: float):
+        if rows.empty:
+            return
+        self._grow(rows.columns)
+        values = rows.reindex(columns=self.tickers).to_numpy(dtype=np.float64)
+        mask = ~np.isnan(values)
+        new = np.isnan(self.shift) & mask.any(axis=0)
+        if new.any():
+            cols = np.flatnonzero(new)
+            self.shift[cols] = values[mask[:, cols].argmax(axis=0), cols]
+        x = np.where(mask, values - self.shift, 0.0)
+        m = mask.astype(np.float64)
+
+        self.count += sign * (m.T @ m)
+        self.sums += sign * (x.T @ m)
+        self.sumsq += sign * ((x * x).T @ m)
+        self.cross += sign * (x.T @ x)
+        self.n_rows += int(sign) * len(rows)
+
+
+    def add(self, rows: pd.DataFrame):
+        """Fold in new rows (date index × ticker columns, NaN = missing)."""
+        if rows.empty:
+            return
+        self._apply(rows, 1.0)
+        first, last = rows.index.min(), rows.index.max()
+        self.first_date = first if self.first_date is None else min(self.first_date, first)
+        self.last_date = last if self.last_date is None else max(self.last_date, last)
+
+
+    def remove(self, rows: pd.DataFrame, first_date):
+        """Take back rows previously added, e.g. the days that slid out of a rolling window
+        (`first_date` is the first date still covered afterwards)."""
+        self._apply(rows, -1.0)
+        self.first_date = first_date
+
+
+    def observations(self) -> pd.Series:
+        """Number of rows in which each ticker was observed."""
+        return pd.Series(np.diag(self.count), index=self.tickers)
+
+
+    def corr(self, min_periods: int = 2) -> pd.DataFrame:
+        corr = _corr_from_moments(
+            self.count, self.sums, self.sums.T, self.sumsq, self.sumsq.T, self.cross, min_periods
+        )
+        np.fill_diagonal(corr, np.where(np.diag(self.count) >= min_periods, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.tickers, columns=self.tickers)
+
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            tickers=np.array(self.tickers, dtype=str),
+            count=self.count, sums=self.sums, sumsq=self.sumsq, cross=self.cross, shift=self.shift,
+            n_rows=self.n_rows,
+            first_date=np.datetime64(self.first_date, "ns") if self.first_date is not None else np.datetime64("NaT"),
+            last_date=np.datetime64(self.last_date, "ns") if self.last_date is not None else np.datetime64("NaT"),
+        )
+
+
+    @classmethod
+    def load(cls, path: str) -> "CorrelationStats":
+        with np.load(path) as data:
+            stats = cls(data["tickers"].tolist())
+            stats.count = data["count"]
+            stats.sums = data["sums"]
+            stats.sumsq = data["sumsq"]
+            stats.cross = data["cross"]
+            # files written before the shift was stored hold raw sums, i.e. a zero shift
+            stats.shift = data["shift"] if "shift" in data.files else np.zeros(len(stats.tickers))
+            stats.n_rows = int(data["n_rows"])
+            first, last = pd.Timestamp(data["first_date"][()]), pd.Timestamp(data["last_date"][()])
+        stats.first_date = None if pd.isna(first) else first
+        stats.last_date = None if pd.isna(last) else last
+        return stats
@@ -1,10 +1,21 @@
+import os
 from datetime import datetime
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import networkx as nx
-from analysis.utils import load_all_close_price_via_api, get_all_tickers_via_api, CORR_MATRIX_PATH
+from analysis.corr_stats import CorrelationStats, pairwise_corr
+from analysis.matrix_store import save_matrix
+from analysis.price_panel import PricePanel
+from analysis.utils import (
+    load_all_close_price_via_api, get_all_tickers_via_api, CORR_MATRIX_PATH, CORR_MATRIX_CSV_PATH, CORR_STATS_PATH
+)
+
+TRAIN_START = datetime(2010, 1, 1)
+TRAIN_END = datetime(2023, 12, 31)
+MIN_COVERAGE = 0.9  # keep tickers observed on at least this share of the window's dates
+CORR_DTYPE = np.float64  # np.float32 for a faster, lower-precision matrix
 
 
 def compute_log_returns(price_df: pd.DataFrame) -> pd.DataFrame:
@@ -12,9 +23,9 @@ def compute_log_returns(price_df: pd.DataFrame) -> pd.DataFrame:
     return np.log(price_df / price_df.shift(1)).dropna()
 
 
-def compute_correlation_matrix(log_returns: pd.DataFrame) -> pd.DataFrame:
-    """Correlation matrix computation."""
-    return log_returns.corr()
+def compute_correlation_matrix(log_returns: pd.DataFrame, dtype=CORR_DTYPE) -> pd.DataFrame:
+    """Pairwise-complete correlation matrix (blocked masked matrix products)."""
+    return pairwise_corr(log_returns, dtype=dtype)
 
 
 def plot_correlation_graph(corr_matrix, threshold=0.9):
@@ -42,21 +53,69 @@ def save_correlation_heatmap(corr_matrix: pd.DataFrame, path: str):
     plt.close()
 
 
-def run_correlation_model(corr_matrix_path: str = CORR_MATRIX_PATH):
-    start_date = datetime(2010, 1, 1)
-    end_date = datetime(2023, 12, 31)  # for training
-
-    tickers = get_all_tickers_via_api()
-    price_df = load_all_close_price_via_api(tickers, start_date, end_date)
-
-    clean_df = price_df.dropna(axis=1, thresh=int(0.9 * len(price_df)))  # keep cols with ≥90% data
-
-    # Drop any rows that still have NaNs
-    clean_df = clean_df.dropna()
-
+def update_correlation_stats(
+        price_df: pd.DataFrame, start_date: datetime, end_date: datetime, stats_path: str = CORR_STATS_PATH
+) -> CorrelationStats:
+    """
+    Bring the persisted sufficient statistics in line with the [start_date, end_date] window:
+    fold in only the dates after the last one seen, and take back dates that slid out of the window.
+    `price_df` must reach back to the previous window start when the window moves forward. The
+    statistics are keyed on the ticker set: any change to `price_df`'s columns rebuilds them.
+    """
+    start_date, end_date = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    stats = CorrelationStats.load(stats_path) if os.path.exists(stats_path) else CorrelationStats()
+
+    if stats.first_date is not None and (
+            start_date < stats.first_date or end_date < stats.last_date
+            or set(stats.tickers) != set(price_df.columns)
+    ):
+        # The window grew backwards or shrank at the end, or tickers were added or dropped (a
+        # backfilled ticker's past rows were never folded in): the stored moments don't match, start over
+        stats = CorrelationStats()
+
+    dates = price_df.index
+    if stats.first_date is not None and start_date > stats.first_date:
+        expired = price_df[(dates >= stats.first_date) & (dates < start_date) & (dates <= stats.last_date)]
+        stats.remove(expired, first_date=start_date)
+
+    after = stats.last_date if stats.last_date is not None else start_date - pd.Timedelta(days=1)
+    stats.add(price_df[(dates > after) & (dates >= start_date) & (dates <= end_date)])
+
+    stats.save(stats_path)
+    return stats
+
+
+def run_correlation_model(
+        corr_matrix_path: str = CORR_MATRIX_PATH, panel: PricePanel = None,
+        start_date: datetime = TRAIN_START, end_date: datetime = TRAIN_END,
+        incremental: bool = False, stats_path: str = CORR_STATS_PATH, csv_path: str = CORR_MATRIX_CSV_PATH,
+        min_coverage: float = MIN_COVERAGE
+):
+    if incremental:
+        # Pairwise-complete correlations from sufficient statistics updated with the new dates only
+        if panel is None:
+            panel = PricePanel.load(get_all_tickers_via_api())
+        stats = update_correlation_stats(panel.prices, start_date, end_date, stats_path)
+        observed = stats.observations()
+        keep = observed[observed >= int(min_coverage * stats.n_rows)].index
+        corr_matrix = stats.corr().loc[keep, keep]
+
+        save_matrix(corr_matrix_path, corr_matrix, csv_path)
+        print(f"✅ Correlation matrix saved (incremental, {stats.n_rows} dates)")
+        return corr_matrix
+
+    if panel is not None:
+        price_df = panel.window(start_date, end_date).prices
+    else:
+        tickers = get_all_tickers_via_api()
+        price_df = load_all_close_price_via_api(tickers, start_date, end_date)
+
+    clean_df = price_df.dropna(axis=1, thresh=int(min_coverage * len(price_df)))  # keep cols with ≥90% data
+
+    # Each pair uses every date both tickers traded: no dates are thrown away for other tickers' gaps
     corr_matrix = compute_correlation_matrix(clean_df)
 
-    corr_matrix.to_csv(corr_matrix_path)
+    save_matrix(corr_matrix_path, corr_matrix, csv_path)
     print("✅ Correlation matrix saved")
 
     return corr_matrix
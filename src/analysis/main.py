@@ -1,28 +1,102 @@
+import os
 from analysis.backtest import MeanReversionBacktester
-from analysis.clustering_model import run_clustering_model
-from analysis.correlation_model import run_correlation_model
-from analysis.mean_reversion import MeanReversionStrategy, Z_ENTRY, Z_EXIT, LOOKBACK
-from analysis.utils import CORR_MATRIX_PATH, CLUSTER_LABELS_PATH, TRADE_PATH
+from analysis.clustering_model import run_clustering_model, N_CLUSTERS
+from analysis.correlation_model import run_correlation_model, TRAIN_START, TRAIN_END, MIN_COVERAGE
+from analysis.matrix_store import tickers_path
+from analysis.mean_reversion import MeanReversionStrategy, Z_ENTRY, Z_EXIT, LOOKBACK, CORR_LIMIT, N_WORKERS
+from analysis.pipeline import Pipeline, Stage, hash_panel
+from analysis.price_cache import load_cached_panel
+from tracing import span, tracer
+from analysis.utils import CORR_MATRIX_PATH, CLUSTER_LABELS_PATH, LINKAGE_PATH, TRADE_PATH, TRACE_PATH
+
+# Artifact file names inside each stage's cache directory
+CORR_FILE = "correlation_matrix.npy"
+LABELS_FILE = "cluster_labels.csv"
+LINKAGE_FILE = "cluster_linkage.npy"
+TRADES_FILE = "mean_reversion_trades.csv"
+PNL_FILE = "pnl.csv"
+
+
+def build_pipeline(panel, z_entry=Z_ENTRY, z_exit=Z_EXIT, lookback=LOOKBACK, corr_limit=CORR_LIMIT) -> Pipeline:
+    """
+    correlation -> clustering -> strategy -> backtest, each keyed on its params and inputs.
+
+    Correlation reads only the training window, so it (and clustering, keyed on its artifact)
+    reruns only when bars inside that window change; strategy and backtest read the whole panel.
+    """
+
+    def correlation(out_dir, inputs, start_date, end_date, min_coverage):
+        run_correlation_model(
+            corr_matrix_path=os.path.join(out_dir, CORR_FILE), panel=panel,
+            start_date=start_date, end_date=end_date, min_coverage=min_coverage
+        )
+
+    def clustering(out_dir, inputs, n_clusters):
+        run_clustering_model(
+            input_path=os.path.join(inputs["correlation"], CORR_FILE),
+            output_path=os.path.join(out_dir, LABELS_FILE),
+            n_clusters=n_clusters,
+            linkage_path=os.path.join(out_dir, LINKAGE_FILE),
+        )
+
+    def strategy(out_dir, inputs, z_entry, z_exit, lookback, corr_limit):
+        MeanReversionStrategy(
+            corr_matrix_path=os.path.join(inputs["correlation"], CORR_FILE),
+            cluster_labels_path=os.path.join(inputs["clustering"], LABELS_FILE),
+            output_path=os.path.join(out_dir, TRADES_FILE),
+            z_entry=z_entry,
+            z_exit=z_exit,
+            lookback=lookback,
+            corr_limit=corr_limit,
+            n_workers=N_WORKERS,
+            panel=panel
+        ).run()
+
+    def backtest(out_dir, inputs):
+        backtester = MeanReversionBacktester(
+            trade_path=os.path.join(inputs["strategy"], TRADES_FILE),
+            panel=panel
+        )
+        backtester.backtest()
+        backtester.save_results(os.path.join(out_dir, PNL_FILE))
+
+    stages = [
+        Stage(
+            "correlation", correlation, data="train",
+            params={"start_date": TRAIN_START, "end_date": TRAIN_END, "min_coverage": MIN_COVERAGE},
+            publish={CORR_FILE: CORR_MATRIX_PATH, tickers_path(CORR_FILE): tickers_path(CORR_MATRIX_PATH)},
+        ),
+        Stage(
+            "clustering", clustering, deps=["correlation"],
+            params={"n_clusters": N_CLUSTERS},
+            publish={LABELS_FILE: CLUSTER_LABELS_PATH, LINKAGE_FILE: LINKAGE_PATH},
+        ),
+        Stage(
+            "strategy", strategy, deps=["correlation", "clustering"], data="full",
+            params={"z_entry": z_entry, "z_exit": z_exit, "lookback": lookback, "corr_limit": corr_limit},
+            publish={TRADES_FILE: TRADE_PATH},
+        ),
+        Stage("backtest", backtest, deps=["strategy"], data="full"),
+    ]
+    data_versions = {"train": hash_panel(panel.window(TRAIN_START, TRAIN_END)), "full": hash_panel(panel)}
+    return Pipeline(stages, data_versions=data_versions)
 
 
 def main():
-    run_correlation_model()
-    run_clustering_model()
-
-    strategy = MeanReversionStrategy(
-        corr_matrix_path=CORR_MATRIX_PATH,
-        cluster_labels_path=CLUSTER_LABELS_PATH,
-        output_path=TRADE_PATH,
-        z_entry=Z_ENTRY,
-        z_exit=Z_EXIT,
-        lookback=LOOKBACK
-    )
-    strategy.run()
+    # Incrementally refreshed, memory-mapped close-price panel shared by every stage
+    with span("load_panel") as info:
+        panel = load_cached_panel()
+        info["tickers"] = len(panel.tickers)
+
+    # Stages whose data version, parameters and upstream artifacts are unchanged are loaded from cache
+    artifacts = build_pipeline(panel).run()
+    print("🧭 Stage trace saved to:", tracer.dump(TRACE_PATH))
 
     backtester = MeanReversionBacktester(
-        trade_path=TRADE_PATH,
+        trade_path=os.path.join(artifacts["strategy"], TRADES_FILE),
+        panel=panel
     )
-    backtester.backtest()
+    backtester.load_results(os.path.join(artifacts["backtest"], PNL_FILE))
     backtester.plot_results()
     backtester.evaluate()
 
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+def tickers_path(path: str) -> str:
+    """Sidecar file holding the row/column tickers of a matrix saved at `path`."""
+    return os.path.splitext(path)[0] + ".tickers.npy"
+
+
+def save_npy(path: str, array: np.ndarray):
+    """np.save to a temporary file swapped in with os.replace: readers see the old or the new file."""
+    tmp = path + ".tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+def save_matrix(path: str, matrix: pd.DataFrame, csv_path: str = None):
+    """
+    Save a square ticker × ticker matrix as a raw float64 .npy plus a tickers sidecar,
+    so consumers can memory-map it instead of parsing text. `csv_path` adds a CSV copy.
+    Each file is replaced atomically; load_matrix rejects a pair left mismatched by a crash in between.
+    """
+    assert list(matrix.index) == list(matrix.columns), "matrix must be square with matching labels"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    save_npy(tickers_path(path), np.array([str(t) for t in matrix.index], dtype=str))
+    save_npy(path, np.ascontiguousarray(matrix.to_numpy(dtype=np.float64)))
+
+    if csv_path:
+        matrix.to_csv(csv_path)
+
+
+def load_matrix(path: str, mmap: bool = True) -> pd.DataFrame:
+    """Open a saved matrix zero-copy (memory-mapped, read-only); legacy .csv files are parsed."""
+    if path.endswith(".csv"):
+        return pd.read_csv(path, index_col=0)
+
+    values = np.load(path, mmap_mode="r" if mmap else None)
+    tickers = np.load(tickers_path(path)).tolist()
+    if values.shape != (len(tickers), len(tickers)):
+        raise ValueError(f"{path}: {values.shape} matrix doesn't match its {len(tickers)} tickers (interrupted save?)")
+    return pd.DataFrame(values, index=tickers, columns=tickers, copy=False)
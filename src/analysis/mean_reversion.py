@@ -1,8 +1,14 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
-from sklearn.linear_model import LinearRegression
 from tqdm import tqdm
 import numpy as np
-from analysis.utils import CORR_MATRIX_PATH, CLUSTER_LABELS_PATH, TRADE_PATH, load_close_price_via_api
+from analysis.rolling_ols import rolling_spread_zscore
+from analysis.matrix_store import load_matrix
+from analysis.price_panel import PricePanel
+from analysis.utils import CORR_MATRIX_PATH, CLUSTER_LABELS_PATH, TRADE_PATH
 
 
 # === Configuration for mean reversion strategy ===
@@ -10,113 +16,186 @@ Z_ENTRY = 2
 Z_EXIT = 0.5
 LOOKBACK = 60  # rolling window size
 CORR_LIMIT = 0.99
+N_WORKERS = 1  # > 1 evaluates pairs in a process pool
+PAIR_CHUNK_SIZE = 8  # pairs handed to a worker per task
+TRADE_COLUMNS = [
+    "ticker_a", "ticker_b", "direction", "entry_date", "exit_date", "entry_spread", "exit_spread", "spread_pnl"
+]
+
+# Strategy instance held by each pool worker (set by _init_worker)
+_worker_strategy = None
+
+
+def _init_worker(strategy):
+    global _worker_strategy
+    _worker_strategy = strategy
+
+
+def _evaluate_chunk(chunk):
+    """Pool task: evaluate a chunk of (index, t1, t2) pairs inside a worker process."""
+    return os.getpid(), [(idx, _worker_strategy.evaluate_pair(t1, t2)) for idx, t1, t2 in chunk]
 
 
 class MeanReversionStrategy:
     def __init__(
             self, corr_matrix_path, cluster_labels_path, output_path,
-                 z_entry=2.0, z_exit=0.5, lookback=60
+                 z_entry=2.0, z_exit=0.5, lookback=60, n_workers=1, chunksize=PAIR_CHUNK_SIZE,
+            panel: PricePanel = None, cluster_column="cluster", corr_limit=CORR_LIMIT
     ):
-        self.corr = pd.read_csv(corr_matrix_path, index_col=0)
-        self.cluster_map = self._load_cluster_map(cluster_labels_path)
+        self.corr = load_matrix(corr_matrix_path)
+        self.cluster_map = self._load_cluster_map(cluster_labels_path, cluster_column)
         self.output_path = output_path
         self.z_entry = z_entry
         self.z_exit = z_exit
         self.lookback = lookback
-
-
-    def _load_cluster_map(self, path):
+        self.corr_limit = corr_limit
+        self.n_workers = n_workers
+        self.chunksize = chunksize
+        self.panel = panel
+
+
+    def __getstate__(self):
+        # Pool workers only simulate pairs; don't pickle the correlation matrix into each one.
+        # Under spawn/forkserver the panel is pickled too: a cache panel travels as its mmap'd file,
+        # any other as a full copy per worker (fork shares it copy-on-write either way).
+        state = self.__dict__.copy()
+        state["corr"] = None
+        state["cluster_map"] = None
+        return state
+
+    def _load_cluster_map(self, path, cluster_column="cluster"):
         df = pd.read_csv(path)
         cluster_map = {}
         for _, row in df.iterrows():
-            cluster_map.setdefault(str(row["cluster"]), []).append(row["ticker"])
+            cluster_map.setdefault(str(row[cluster_column]), []).append(row["ticker"])
         return cluster_map
 
 
     def load_price_series(self, ticker):
-        return load_close_price_via_api(ticker)
+        return self.panel.series(ticker)
 
 
     def calculate_spread_and_zscore(self, x, y):
-        x = np.array(x)
-        y = np.array(y)
-        model = LinearRegression()
-        model.fit(x.reshape(-1, 1), y)
-        y_pred = model.predict(x.reshape(-1, 1))
-        spread = y - y_pred
-        if spread.std() == 0:
-            return spread, np.full_like(spread, fill_value=np.nan)
-        z = (spread - spread.mean()) / spread.std()
+        """Rolling hedge-ratio spread and z-score for every bar of an aligned pair."""
+        spread, z, _ = rolling_spread_zscore(x, y, self.lookback)
         return spread, z
 
 
-    def run(self):
+    def simulate_pair(self, t1, t2, df):
+        """Walk the z-score series of one pair and return its closed trades."""
         trades = []
-        for cluster_id, tickers in tqdm(self.cluster_map.items(), desc="Evaluating clusters"):
+        spread, z = self.calculate_spread_and_zscore(df["x"].values, df["y"].values)
+
+        position = None
+        entry_date = None
+        entry_spread = None
+
+        for end in range(self.lookback, len(df)):
+            z_score = z[end]
+            if np.isnan(z_score):
+                continue
+
+            date = df.index[end]
+
+            if position is None:
+                if z_score > self.z_entry:
+                    position = "short"
+                    entry_date = date
+                    entry_spread = spread[end]
+                elif z_score < -self.z_entry:
+                    position = "long"
+                    entry_date = date
+                    entry_spread = spread[end]
+            else:
+                if abs(z_score) < self.z_exit:
+                    exit_date = date
+                    exit_spread = spread[end]
+                    pnl = (entry_spread - exit_spread) if position == "short" else (exit_spread - entry_spread)
+                    trades.append({
+                        "ticker_a": t1,
+                        "ticker_b": t2,
+                        "direction": position,
+                        "entry_date": entry_date,
+                        "exit_date": exit_date,
+                        "entry_spread": entry_spread,
+                        "exit_spread": exit_spread,
+                        "spread_pnl": pnl
+                    })
+                    position = None
+
+        return trades
+
+
+    def candidate_pairs(self):
+        """Pairs inside each cluster that pass the correlation filter, in a fixed order."""
+        pairs = []
+        for cluster_id, tickers in self.cluster_map.items():
             for i in range(len(tickers)):
                 for j in range(i + 1, len(tickers)):
                     t1, t2 = tickers[i], tickers[j]
 
                     if t1 not in self.corr.columns or t2 not in self.corr.columns:
                         continue
-                    if self.corr.at[t1, t2] < CORR_LIMIT:
+                    if self.corr.at[t1, t2] < self.corr_limit:
                         continue
 
-                    print(f'Trying: {t1}, {t2} with corr: {self.corr.at[t1, t2]}')
+                    pairs.append((t1, t2))
+        return pairs
 
-                    s1 = self.load_price_series(t1)
-                    s2 = self.load_price_series(t2)
 
-                    print(f"Loaded price data: {t1} ({len(s1)} pts), {t2} ({len(s2)} pts)")
+    def evaluate_pair(self, t1, t2):
+        df = self.panel.pair(t1, t2)
+        if len(df) < self.lookback:
+            return []
 
-                    df = pd.concat([s1, s2], axis=1).dropna()
-                    df.columns = ["x", "y"]
-                    if len(df) < self.lookback:
-                        continue
+        return self.simulate_pair(t1, t2, df)
 
-                    position = None
-                    entry_date = None
-                    entry_spread = None
-
-                    for end in range(self.lookback, len(df)):
-                        window = df.iloc[end - self.lookback:end]
-                        x = window["x"].values
-                        y = window["y"].values
-
-                        spread, z = self.calculate_spread_and_zscore(x, y)
-                        if np.isnan(z[-1]):
-                            continue
-
-                        z_score = z[-1]
-                        date = df.index[end]
-
-                        if position is None:
-                            if z_score > self.z_entry:
-                                position = "short"
-                                entry_date = date
-                                entry_spread = spread[-1]
-                            elif z_score < -self.z_entry:
-                                position = "long"
-                                entry_date = date
-                                entry_spread = spread[-1]
-                        else:
-                            if abs(z_score) < self.z_exit:
-                                exit_date = date
-                                exit_spread = spread[-1]
-                                pnl = (entry_spread - exit_spread) if position == "short" else (exit_spread - entry_spread)
-                                trades.append({
-                                    "ticker_a": t1,
-                                    "ticker_b": t2,
-                                    "direction": position,
-                                    "entry_date": entry_date,
-                                    "exit_date": exit_date,
-                                    "entry_spread": entry_spread,
-                                    "exit_spread": exit_spread,
-                                    "spread_pnl": pnl
-                                })
-                                position = None
-
-        trades_df = pd.DataFrame(trades)
+
+    def _run_serial(self, tasks, results, pbar):
+        for idx, t1, t2 in tasks:
+            results[idx] = self.evaluate_pair(t1, t2)
+            pbar.update(1)
+
+
+    def _run_parallel(self, tasks, results, pbar):
+        chunks = [tasks[k:k + self.chunksize] for k in range(0, len(tasks), self.chunksize)]
+        per_worker = Counter()
+
+        try:
+            with ProcessPoolExecutor(
+                    max_workers=self.n_workers, initializer=_init_worker, initargs=(self,)
+            ) as executor:
+                futures = [executor.submit(_evaluate_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    pid, chunk_results = future.result()
+                    for idx, trades in chunk_results:
+                        results[idx] = trades
+                    per_worker[pid] += len(chunk_results)
+                    pbar.set_postfix({f"w{n}": c for n, (_, c) in enumerate(sorted(per_worker.items()))})
+                    pbar.update(len(chunk_results))
+        except BrokenProcessPool as e:
+            tqdm.write(f"⚠️ Worker pool failed ({e}), finishing remaining pairs serially")
+            self._run_serial([task for task in tasks if task[0] not in results], results, pbar)
+
+
+    def run(self):
+        pairs = self.candidate_pairs()
+        if self.panel is None:
+            self.panel = PricePanel.load(sorted({t for pair in pairs for t in pair}))
+
+        tasks = [(idx, t1, t2) for idx, (t1, t2) in enumerate(pairs)]
+        results = {}
+
+        with tqdm(total=len(tasks), desc="Evaluating pairs") as pbar:
+            if self.n_workers > 1 and len(tasks) > self.chunksize:
+                self._run_parallel(tasks, results, pbar)
+            else:
+                self._run_serial(tasks, results, pbar)
+
+        # Pair order (not completion order) fixes the row order of the output
+        trades = [trade for idx in range(len(tasks)) for trade in results[idx]]
+
+        trades_df = pd.DataFrame(trades, columns=TRADE_COLUMNS)  # keeps the header when no pair traded
         trades_df.to_csv(self.output_path, index=False)
         print("✅ Mean-reversion trades saved to:", self.output_path)
 
@@ -128,6 +207,7 @@ if __name__ == "__main__":
         output_path=TRADE_PATH,
         z_entry=Z_ENTRY,
         z_exit=Z_EXIT,
-        lookback=LOOKBACK
+        lookback=LOOKBACK,
+        n_workers=N_WORKERS
     )
     strategy.run()
@@ -0,0 +1,107 @@
+from itertools import product
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+from analysis.mean_reversion import MeanReversionStrategy
+from analysis.pnl_engine import performance_metrics, portfolio_pnl
+from analysis.price_cache import load_cached_panel
+from analysis.price_panel import PricePanel
+from analysis.rolling_ols import rolling_spread_zscore
+from analysis.signal_grid import LONG, simulate_grid
+from analysis.utils import CORR_MATRIX_PATH, CLUSTER_LABELS_PATH, SWEEP_PATH, TRADE_PATH
+
+# === Default parameter grid ===
+SWEEP_LOOKBACKS = (40, 60, 90, 120)
+SWEEP_Z_ENTRIES = (1.5, 2.0, 2.5, 3.0)
+SWEEP_Z_EXITS = (0.25, 0.5, 0.75, 1.0)
+
+
+class PairSignals:
+    """The aligned price frames of every candidate pair, loaded once and reused for every lookback."""
+
+    def __init__(self, pairs, panel: PricePanel):
+        self.pairs = pairs
+        self.frames = [panel.pair(t1, t2) for t1, t2 in pairs]
+        lengths = np.array([len(df) for df in self.frames], dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self.n_rows = int(lengths.max()) if len(lengths) else 0
+        # Dates of all pairs laid end to end: row r of pair p is dates[offsets[p] + r]
+        self.dates = pd.DatetimeIndex(np.concatenate([df.index.values for df in self.frames])) \
+            if self.frames else pd.DatetimeIndex([])
+
+    def zscores(self, lookback: int) -> np.ndarray:
+        """bars × pairs z-score matrix for one lookback, NaN-padded past each pair's last bar."""
+        z = np.full((self.n_rows, len(self.frames)), np.nan)
+        for p, df in enumerate(self.frames):
+            if len(df) >= lookback:
+                _, z[:len(df), p], _ = rolling_spread_zscore(df["x"].values, df["y"].values, lookback)
+        return z
+
+    def trades(self, pair, entry_row, exit_row, direction) -> pd.DataFrame:
+        """Trade list in the layout of `MeanReversionStrategy.run` (pair order, then exit date)."""
+        order = np.lexsort((exit_row, pair))
+        pair, entry_row, exit_row, direction = pair[order], entry_row[order], exit_row[order], direction[order]
+        tickers = np.array(self.pairs, dtype=object).reshape(-1, 2)
+        return pd.DataFrame({
+            "ticker_a": tickers[pair, 0],
+            "ticker_b": tickers[pair, 1],
+            "direction": np.where(direction == LONG, "long", "short"),
+            "entry_date": self.dates[self.offsets[pair] + entry_row],
+            "exit_date": self.dates[self.offsets[pair] + exit_row],
+        })
+
+
+def run_parameter_sweep(
+        strategy: MeanReversionStrategy, lookbacks=SWEEP_LOOKBACKS,
+        z_entries=SWEEP_Z_ENTRIES, z_exits=SWEEP_Z_EXITS, output_path=SWEEP_PATH
+) -> pd.DataFrame:
+    """
+    Backtest every (lookback, z_entry, z_exit) combination over the strategy's candidate pairs.
+
+    Pair frames are aligned once; z-scores are computed once per lookback and every
+    (z_entry, z_exit) pair is simulated for all pairs in one batched pass. The trades of a
+    configuration are identical to `MeanReversionStrategy.run` with those parameters.
+    Returns (and writes) one row of trade count, Sharpe, drawdown and total PnL per configuration.
+    """
+    pairs = strategy.candidate_pairs()
+    if strategy.panel is None:
+        strategy.panel = PricePanel.load(sorted({t for pair in pairs for t in pair}))
+    signals = PairSignals(pairs, strategy.panel)
+
+    thresholds = list(product(z_entries, z_exits))
+    z_entry = np.array([entry for entry, _ in thresholds], dtype=np.float64)
+    z_exit = np.array([exit_ for _, exit_ in thresholds], dtype=np.float64)
+
+    rows = []
+    for lookback in tqdm(lookbacks, desc="Sweeping lookbacks"):
+        pair, config, entry_row, exit_row, direction = simulate_grid(signals.zscores(lookback), z_entry, z_exit)
+
+        for k, (entry, exit_) in enumerate(thresholds):
+            mine = config == k
+            trades = signals.trades(pair[mine], entry_row[mine], exit_row[mine], direction[mine])
+            pnl = portfolio_pnl(strategy.panel.prices, trades)["pnl"]
+            rows.append({
+                "lookback": lookback,
+                "z_entry": entry,
+                "z_exit": exit_,
+                "trades": len(trades),
+                **performance_metrics(pnl),
+                "total_pnl": pnl.iloc[-1] if len(pnl) else 0.0,
+            })
+
+    results = pd.DataFrame(rows)
+    if output_path:
+        results.to_csv(output_path, index=False)
+        print("✅ Parameter sweep saved to:", output_path)
+    return results
+
+
+if __name__ == "__main__":
+    strategy = MeanReversionStrategy(
+        corr_matrix_path=CORR_MATRIX_PATH,
+        cluster_labels_path=CLUSTER_LABELS_PATH,
+        output_path=TRADE_PATH,
+        panel=load_cached_panel(),
+    )
+    results = run_parameter_sweep(strategy)
+    print(results.sort_values("sharpe", ascending=False).head(10).to_string(index=False))
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from tracing import span
+from analysis.utils import PIPELINE_CACHE_DIR
+
+MANIFEST = "manifest.json"
+
+
+def _digest(obj) -> str:
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def hash_files(directory: str) -> str:
+    """Content hash of every artifact file in a stage output directory."""
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(directory)):
+        if name == MANIFEST:
+            continue
+        h.update(name.encode())
+        with open(os.path.join(directory, name), "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def hash_panel(panel) -> str:
+    """Version of the price data: hash of the panel's dates, tickers and close values."""
+    h = hashlib.sha256()
+    h.update(np.asarray(panel.dates.values, dtype="datetime64[ns]").tobytes())
+    h.update("\0".join(map(str, panel.tickers)).encode())
+    values = panel.prices.to_numpy()
+    for k in range(0, len(values), 4096):
+        h.update(np.ascontiguousarray(values[k:k + 4096]).tobytes())
+    return h.hexdigest()
+
+
+class Stage:
+    """
+    One step of the analysis DAG.
+
+    `fn(out_dir, inputs, **params)` writes its artifacts into `out_dir`; `inputs` maps each
+    dependency name to that stage's artifact directory. A stage that reads prices names the
+    slice it reads in `data` (a key of the pipeline's `data_versions`) and is keyed on that
+    slice's version only. Bump `version` when the stage's code changes meaning.
+    """
+
+    def __init__(self, name, fn, params=None, deps=(), data=None, version=1, publish=None):
+        self.name = name
+        self.fn = fn
+        self.params = params or {}
+        self.deps = list(deps)
+        self.data = data
+        self.version = version
+        self.publish = publish or {}  # artifact file -> stable path it is copied to after a run
+
+
+class Pipeline:
+    """Runs stages in dependency order and skips any stage whose inputs hash to a cached artifact."""
+
+    def __init__(self, stages, cache_dir: str = PIPELINE_CACHE_DIR, data_versions: dict = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache_dir = cache_dir
+        self.data_versions = data_versions or {}  # data slice name -> version hash
+        self.artifacts = {}  # stage name -> (artifact dir, content hash)
+
+
+    def _order(self):
+        ordered, seen = [], set()
+
+        def visit(name, path=()):
+            if name in seen:
+                return
+            if name in path:
+                raise ValueError(f"Cycle in pipeline: {' -> '.join(path + (name,))}")
+            for dep in self.stages[name].deps:
+                visit(dep, path + (name,))
+            seen.add(name)
+            ordered.append(self.stages[name])
+
+        for name in self.stages:
+            visit(name)
+        return ordered
+
+
+    def input_key(self, stage: Stage) -> str:
+        return _digest({
+            "stage": stage.name,
+            "version": stage.version,
+            "params": stage.params,
+            "inputs": {dep: self.artifacts[dep][1] for dep in stage.deps},
+            "data": self.data_versions[stage.data] if stage.data else None,
+        })
+
+
+    def run_stage(self, stage: Stage, force: bool = False):
+        key = self.input_key(stage)
+        out_dir = os.path.join(self.cache_dir, stage.name, key[:16])
+        manifest_path = os.path.join(out_dir, MANIFEST)
+
+        if os.path.exists(manifest_path) and not force:
+            with open(manifest_path) as f:
+                content_hash = json.load(f)["content_hash"]
+            print(f"⏩ {stage.name}: inputs unchanged, using cached {key[:16]}")
+        else:
+            tmp_dir = out_dir + ".tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+            inputs = {dep: self.artifacts[dep][0] for dep in stage.deps}
+            with span(stage.name, "stage", input_key=key[:16]):
+                stage.fn(tmp_dir, inputs, **stage.params)
+
+            content_hash = hash_files(tmp_dir)
+            with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+                json.dump({
+                    "stage": stage.name, "input_key": key, "content_hash": content_hash,
+                    "params": stage.params, "deps": {d: self.artifacts[d][1] for d in stage.deps},
+                }, f, indent=2, default=str)
+            shutil.rmtree(out_dir, ignore_errors=True)
+            os.replace(tmp_dir, out_dir)
+            print(f"✅ {stage.name}: ran, artifact {content_hash[:16]}")
+
+        self.artifacts[stage.name] = (out_dir, content_hash)
+        for name, target in stage.publish.items():
+            os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+            shutil.copy2(os.path.join(out_dir, name), target)
+        return out_dir
+
+
+    def run(self, force=()):
+        """Run every stage (those named in `force` even if cached); returns {stage: artifact dir}."""
+        for stage in self._order():
+            self.run_stage(stage, force=stage.name in force)
+        return {name: artifact[0] for name, artifact in self.artifacts.items()}
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+
+def _trade_indices(prices: pd.DataFrame, trades: pd.DataFrame):
+    """Row/column positions of each trade's legs and dates in the panel (-1 when absent)."""
+    col_of = {t: k for k, t in enumerate(prices.columns)}
+    col_a = np.array([col_of.get(t, -1) for t in trades["ticker_a"]], dtype=np.int64)
+    col_b = np.array([col_of.get(t, -1) for t in trades["ticker_b"]], dtype=np.int64)
+    entry = prices.index.get_indexer(pd.DatetimeIndex(trades["entry_date"]))
+    exit_ = prices.index.get_indexer(pd.DatetimeIndex(trades["exit_date"]))
+    return col_a, col_b, entry, exit_
+
+
+def portfolio_pnl(prices: pd.DataFrame, trades: pd.DataFrame, weight: float = 1.0) -> dict:
+    """
+    Daily and cumulative PnL of a list of pair trades over a date × ticker close panel,
+    with array operations instead of a per-trade / per-day loop.
+
+    Each trade holds `weight` dollars long one leg and short the other from entry to exit
+    (long = long ticker_a / short ticker_b). A trade is skipped when either leg has no price
+    on its entry or exit date. A date on which one leg of an open trade has no price
+    contributes NaN, which zeroes that date's portfolio PnL, as the original dict loop did.
+
+    Returns {"pnl": cumulative PnL, "daily_pnl", "positions" (date × ticker dollar weights),
+    "exposure" (gross dollars), "turnover" (dollars traded)}.
+    """
+    dates = prices.index
+    values = prices.to_numpy(dtype=np.float64)
+
+    col_a, col_b, entry, exit_ = _trade_indices(prices, trades)
+    valid = (col_a >= 0) & (col_b >= 0) & (entry >= 0) & (exit_ >= entry)
+    idx = np.flatnonzero(valid)
+    idx = idx[
+        ~np.isnan(values[entry[idx], col_a[idx]]) & ~np.isnan(values[entry[idx], col_b[idx]])
+        & ~np.isnan(values[exit_[idx], col_a[idx]]) & ~np.isnan(values[exit_[idx], col_b[idx]])
+    ]
+    col_a, col_b, entry, exit_ = col_a[idx], col_b[idx], entry[idx], exit_[idx]
+    is_long = (trades["direction"].to_numpy()[idx] == "long")
+
+    # Flatten every (trade, held date) into one array, trades in order, dates ascending
+    lengths = np.maximum(exit_ - entry + 1, 0)
+    trade_of = np.repeat(np.arange(len(idx)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    rows = entry[trade_of] + offsets
+
+    price_a = values[rows, col_a[trade_of]]
+    price_b = values[rows, col_b[trade_of]]
+    ret_a = price_a / values[entry, col_a][trade_of] - 1
+    ret_b = price_b / values[entry, col_b][trade_of] - 1
+    pnl = np.where(is_long[trade_of], ret_a - ret_b, ret_b - ret_a) * weight
+
+    # Only dates on which at least one leg traded belong to the trade's series
+    traded = ~(np.isnan(price_a) & np.isnan(price_b))
+    rows, pnl = rows[traded], pnl[traded]
+
+    # np.add.at accumulates in array order, i.e. trade by trade, like the original loop
+    total = np.zeros(len(dates))
+    np.add.at(total, rows, pnl)
+    touched = np.zeros(len(dates), dtype=bool)
+    touched[rows] = True
+
+    daily_pnl = pd.Series(total[touched], index=dates[touched]).fillna(0)
+
+    # Signed dollar orders per (date, ticker): open at entry, close at exit; traded tickers only
+    traded_cols, leg = np.unique(np.concatenate([col_a, col_b]), return_inverse=True)
+    leg_a, leg_b = leg[:len(idx)], leg[len(idx):]
+    sign = np.where(is_long, weight, -weight)
+    orders = np.zeros((len(dates), len(traded_cols)))
+    np.add.at(orders, (entry, leg_a), sign)
+    np.add.at(orders, (entry, leg_b), -sign)
+    np.add.at(orders, (exit_, leg_a), -sign)
+    np.add.at(orders, (exit_, leg_b), sign)
+
+    # Held from entry through exit inclusive: the closing order only takes effect the next day
+    held = np.cumsum(orders, axis=0)
+    np.add.at(held, (exit_, leg_a), sign)
+    np.add.at(held, (exit_, leg_b), -sign)
+    positions = pd.DataFrame(held, index=dates, columns=prices.columns[traded_cols])
+
+    return {
+        "pnl": daily_pnl.cumsum(),
+        "daily_pnl": daily_pnl,
+        "positions": positions,
+        "exposure": pd.Series(np.abs(held).sum(axis=1), index=dates),
+        "turnover": pd.Series(np.abs(orders).sum(axis=1), index=dates),
+    }
+
+
+def performance_metrics(pnl_series: pd.Series) -> dict:
+    """Annualised Sharpe ratio and max drawdown of a cumulative PnL series."""
+    daily_ret = pnl_series.diff().dropna()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe = daily_ret.mean() / daily_ret.std() * np.sqrt(252)
+    drawdown = (pnl_series - pnl_series.cummax()).min()
+    return {"sharpe": sharpe, "max_drawdown": drawdown}
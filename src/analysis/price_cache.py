@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import shutil
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from analysis.price_panel import PricePanel
+from analysis.utils import PRICE_CACHE_DIR, get_all_tickers_via_api, load_all_close_price_via_api
+
+CURRENT_FILE = "CURRENT"
+COPY_BLOCK_ROWS = 512  # rows copied per step when rewriting the matrix
+VERSION_PATTERN = re.compile(r"v\d{20}")  # snapshot directory names: "v" + %Y%m%d%H%M%S%f
+
+
+class PriceCache:
+    """
+    On-disk, memory-mappable cache of the close-price panel.
+
+    Each snapshot lives in its own version directory holding plain .npy files:
+        dates.npy       datetime64[D], one entry per row
+        tickers.npy     ticker symbols, one entry per column
+        close.npy       float64 (dates × tickers) matrix, NaN where a ticker has no bar
+        last_dates.npy  datetime64[D], last cached bar of each ticker
+    and CURRENT names the live version, so a refresh never exposes a half-written snapshot.
+
+    Prices are forward-adjusted (qfq) upstream, so a corporate action can revise history;
+    use refresh(rebuild=True) to re-download everything into a new snapshot.
+
+    `fetch(tickers, start=None)` returns a dates × tickers close frame; the API by default.
+    """
+
+    def __init__(self, root: str = PRICE_CACHE_DIR, fetch=load_all_close_price_via_api):
+        self.root = root
+        self.fetch = fetch
+
+
+    def _current_dir(self):
+        path = os.path.join(self.root, CURRENT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return os.path.join(self.root, f.read().strip())
+
+
+    def exists(self) -> bool:
+        return self._current_dir() is not None
+
+
+    def _load_arrays(self):
+        version_dir = self._current_dir()
+        if version_dir is None:
+            return None
+        return {
+            name: np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r")
+            for name in ("dates", "tickers", "close", "last_dates")
+        }
+
+
+    def panel(self) -> PricePanel:
+        """Open the cached panel without reading it: the frame is backed by the mmap'd matrix."""
+        arrays = self._load_arrays()
+        if arrays is None:
+            return PricePanel(pd.DataFrame())
+        prices = pd.DataFrame(
+            arrays["close"],
+            index=pd.DatetimeIndex(np.asarray(arrays["dates"]).astype("datetime64[ns]"), name="date"),
+            columns=pd.Index(np.asarray(arrays["tickers"]), name="ticker"),
+            copy=False,
+        )
+        return PricePanel(prices)
+
+
+    def last_dates(self) -> dict:
+        arrays = self._load_arrays()
+        if arrays is None:
+            return {}
+        return dict(zip(arrays["tickers"].tolist(), pd.to_datetime(arrays["last_dates"])))
+
+
+    def _fetch_updates(self, tickers, last_dates) -> list[pd.DataFrame]:
+        """Fetch only the bars after each ticker's last cached date, one bulk call per distinct date."""
+        frames = []
+
+        new_tickers = [t for t in tickers if t not in last_dates or pd.isna(last_dates[t])]
+        if new_tickers:
+            frames.append(self.fetch(new_tickers))
+
+        by_last_date = {}
+        for t in tickers:
+            if t not in new_tickers:
+                by_last_date.setdefault(last_dates[t], []).append(t)
+
+        for last_date, group in sorted(by_last_date.items()):
+            frames.append(self.fetch(group, start=last_date + timedelta(days=1)))
+
+        return [f for f in frames if not f.empty]
+
+
+    def refresh(self, tickers: list[str] = None, rebuild: bool = False) -> PricePanel:
+        """Bring the cache up to date for `tickers` (default: all tickers) and return the panel."""
+        if tickers is None:
+            tickers = get_all_tickers_via_api()
+
+        # A rebuild writes a fresh snapshot from scratch; the old one stays live until it is published
+        old = None if rebuild else self._load_arrays()
+        frames = self._fetch_updates(tickers, {} if rebuild else self.last_dates())
+        if not frames:
+            print("✅ Price cache already up to date")
+            return self.panel()
+
+        # Each ticker comes from exactly one frame, so the columns never collide
+        update = pd.concat(frames, axis=1).sort_index()
+        self._write_snapshot(old, update)
+        print(f"✅ Price cache refreshed: {update.notna().values.sum()} new bars for {update.shape[1]} tickers")
+        return self.panel()
+
+
+    def _write_snapshot(self, old, update: pd.DataFrame):
+        update_dates = update.index.values.astype("datetime64[D]")
+        update_tickers = np.array(update.columns.tolist(), dtype=str)
+
+        if old is None:
+            old_dates = np.array([], dtype="datetime64[D]")
+            old_tickers = np.array([], dtype=str)
+            old_last = np.array([], dtype="datetime64[D]")
+        else:
+            old_dates, old_tickers, old_last = old["dates"], old["tickers"], np.asarray(old["last_dates"])
+
+        dates = np.union1d(old_dates, update_dates)
+        added = np.setdiff1d(update_tickers, old_tickers)
+        tickers = np.concatenate([np.asarray(old_tickers), added]).astype(str)
+        col_of = {t: k for k, t in enumerate(tickers.tolist())}
+
+        version = f"v{pd.Timestamp.now().strftime('%Y%m%d%H%M%S%f')}"
+        version_dir = os.path.join(self.root, version)
+        os.makedirs(version_dir)
+
+        close = np.lib.format.open_memmap(
+            os.path.join(version_dir, "close.npy"), mode="w+", dtype=np.float64,
+            shape=(len(dates), len(tickers))
+        )
+        close[:] = np.nan
+
+        if old is not None and len(old_tickers):
+            # Copy the previous snapshot block by block so it is never fully resident
+            rows = np.searchsorted(dates, old_dates)
+            n_old = len(old_tickers)
+            for k in range(0, len(old_dates), COPY_BLOCK_ROWS):
+                close[rows[k:k + COPY_BLOCK_ROWS], :n_old] = old["close"][k:k + COPY_BLOCK_ROWS]
+
+        rows = np.searchsorted(dates, update_dates)
+        cols = np.array([col_of[t] for t in update_tickers.tolist()])
+        values = update.to_numpy(dtype=np.float64)
+        has_value = ~np.isnan(values)
+        r, c = np.nonzero(has_value)
+        close[rows[r], cols[c]] = values[r, c]
+        close.flush()
+        del close
+
+        last_dates = np.full(len(tickers), np.datetime64("NaT"), dtype="datetime64[D]")
+        last_dates[:len(old_last)] = old_last
+        for k, t in enumerate(update_tickers.tolist()):
+            present = np.flatnonzero(has_value[:, k])
+            if len(present):
+                # Updates only ever cover dates after the previous last bar
+                last_dates[col_of[t]] = update_dates[present[-1]]
+
+        np.save(os.path.join(version_dir, "dates.npy"), dates)
+        np.save(os.path.join(version_dir, "tickers.npy"), tickers)
+        np.save(os.path.join(version_dir, "last_dates.npy"), last_dates)
+        with open(os.path.join(version_dir, "meta.json"), "w") as f:
+            json.dump({"n_dates": len(dates), "n_tickers": len(tickers), "created": version}, f)
+
+        # Publish atomically, then drop superseded snapshots (open mmaps stay valid on POSIX)
+        tmp = os.path.join(self.root, CURRENT_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            f.write(version)
+        os.replace(tmp, os.path.join(self.root, CURRENT_FILE))
+
+        # ... including any left half-written by an interrupted refresh; nothing else in root is touched
+        for name in os.listdir(self.root):
+            if VERSION_PATTERN.fullmatch(name) and name != version:
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+
+def load_cached_panel(tickers: list[str] = None, cache_dir: str = PRICE_CACHE_DIR) -> PricePanel:
+    """Refresh the local price cache incrementally and return the memory-mapped panel."""
+    return PriceCache(cache_dir).refresh(tickers)
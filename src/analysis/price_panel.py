@@ -0,0 +1,93 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from analysis.utils import get_all_tickers_via_api, load_all_close_price_via_api
+
+
+class PricePanel:
+    """Aligned date × ticker matrix of close prices, loaded once and shared by the analysis stages."""
+
+    def __init__(self, prices: pd.DataFrame):
+        # Only reorder when needed: a memory-mapped cache panel must not be copied on open
+        self.prices = prices if prices.index.is_monotonic_increasing else prices.sort_index()
+
+
+    def _mapped_file(self):
+        """Path of the .npy file this panel's whole matrix is memory-mapped from, if any."""
+        values = self.prices.to_numpy()
+        base = values
+        while isinstance(base, np.ndarray):
+            if isinstance(base, np.memmap):
+                mapped = base.filename and base.shape == values.shape and np.shares_memory(base, values)
+                return base.filename if mapped else None
+            base = base.base
+        return None
+
+
+    def __getstate__(self):
+        # A cache panel pickles as its file path, so pool workers map the same pages instead of
+        # each unpickling a private copy; sub-panels and in-memory panels are pickled in full.
+        path = self._mapped_file()
+        if path is None:
+            return {"prices": self.prices}
+        return {"path": path, "index": self.prices.index, "columns": self.prices.columns}
+
+
+    def __setstate__(self, state):
+        if "path" not in state:
+            self.prices = state["prices"]
+            return
+        values = np.load(state["path"], mmap_mode="r")
+        self.prices = pd.DataFrame(values, index=state["index"], columns=state["columns"], copy=False)
+
+
+    @classmethod
+    def load(cls, tickers: list[str] = None, start: datetime = None, end: datetime = None) -> "PricePanel":
+        """Fetch the whole panel with a single bulk API call (all tickers by default)."""
+        if tickers is None:
+            tickers = get_all_tickers_via_api()
+        return cls(load_all_close_price_via_api(tickers, start, end))
+
+
+    @property
+    def tickers(self) -> list[str]:
+        return list(self.prices.columns)
+
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return self.prices.index
+
+
+    def __contains__(self, ticker) -> bool:
+        return ticker in self.prices.columns
+
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+
+    def series(self, ticker: str) -> pd.Series:
+        """Close series of one ticker on the dates it traded (empty if unknown)."""
+        if ticker not in self.prices.columns:
+            return pd.Series(dtype=float)
+        return self.prices[ticker].dropna()
+
+
+    def pair(self, t1: str, t2: str) -> pd.DataFrame:
+        """Closes of two tickers on their common dates, as columns x and y."""
+        if t1 not in self.prices.columns or t2 not in self.prices.columns:
+            return pd.DataFrame(columns=["x", "y"], dtype=float)
+        df = self.prices[[t1, t2]].dropna()
+        df.columns = ["x", "y"]
+        return df
+
+
+    def window(self, start: datetime = None, end: datetime = None) -> "PricePanel":
+        """Sub-panel restricted to [start, end]; tickers with no data in the range are dropped."""
+        prices = self.prices.loc[start:end]
+        return PricePanel(prices.dropna(axis=1, how="all").dropna(axis=0, how="all"))
+
+
+    def subset(self, tickers: list[str]) -> "PricePanel":
+        return PricePanel(self.prices[[t for t in tickers if t in self.prices.columns]])
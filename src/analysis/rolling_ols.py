@@ -0,0 +1,62 @@
+import numpy as np
+
+
+def _window_sums(a: np.ndarray, lookback: int) -> np.ndarray:
+    """Sum of every trailing window a[end - lookback:end] for end in [lookback, n)."""
+    csum = np.concatenate(([0.0], np.cumsum(a)))
+    return csum[lookback:-1] - csum[:-lookback - 1]
+
+
+def rolling_spread_zscore(x, y, lookback: int, tol: float = 1e-12):
+    """
+    Rolling OLS of y on x (with intercept) over trailing windows, in one O(n) pass.
+
+    For every end in [lookback, n) the regression is fitted on x[end - lookback:end],
+    y[end - lookback:end] -- the same window `MeanReversionStrategy.run` used to slice --
+    and the spread / z-score of the window's last observation are stored at index `end`.
+    Entries before `lookback` are NaN, as are windows whose residual spread has no variance.
+
+    Returns (spread, zscore, beta) arrays aligned with the inputs.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+
+    spread = np.full(n, np.nan)
+    zscore = np.full(n, np.nan)
+    beta = np.full(n, np.nan)
+    if n <= lookback:
+        return spread, zscore, beta
+
+    # Centre once so the running sums of squares don't cancel catastrophically
+    xc = x - x.mean()
+    yc = y - y.mean()
+
+    sx = _window_sums(xc, lookback)
+    sy = _window_sums(yc, lookback)
+    sxx = _window_sums(xc * xc, lookback)
+    syy = _window_sums(yc * yc, lookback)
+    sxy = _window_sums(xc * yc, lookback)
+
+    mx = sx / lookback
+    my = sy / lookback
+    var_x = np.maximum(sxx / lookback - mx * mx, 0.0)
+    var_y = np.maximum(syy / lookback - my * my, 0.0)
+    cov_xy = sxy / lookback - mx * my
+
+    # A flat x has no slope: the fit degenerates to the window mean of y
+    flat_x = var_x <= tol * np.maximum(sxx / lookback, 1.0)
+    b = np.where(flat_x, 0.0, cov_xy / np.where(flat_x, 1.0, var_x))
+
+    # Population variance of the residuals (OLS residuals have zero mean)
+    resid_var = np.maximum(var_y - b * cov_xy, 0.0)
+
+    last = slice(lookback - 1, n - 1)
+    s = yc[last] - my - b * (xc[last] - mx)
+    std = np.sqrt(resid_var)
+    degenerate = resid_var <= tol * np.maximum(syy / lookback, 1.0)
+
+    spread[lookback:] = s
+    zscore[lookback:] = np.where(degenerate, np.nan, s / np.where(degenerate, 1.0, std))
+    beta[lookback:] = b
+    return spread, zscore, beta
@@ -0,0 +1,49 @@
+import numpy as np
+
+LONG, FLAT, SHORT = 1, 0, -1
+
+
+def simulate_grid(z: np.ndarray, z_entries, z_exits):
+    """
+    The entry/exit state machine of `MeanReversionStrategy.simulate_pair`, run for many
+    pairs and many (z_entry, z_exit) configurations at once.
+
+    `z` is a bars × pairs matrix of z-scores (NaN = no signal, e.g. before the lookback or
+    past the end of a shorter pair). Configuration k uses z_entries[k] / z_exits[k].
+    The loop is over bars only; every step updates all pairs × configs with array operations.
+
+    Returns the closed trades as parallel arrays (pair, config, entry_row, exit_row, direction)
+    ordered by exit row, with direction LONG / SHORT.
+    """
+    z = np.asarray(z, dtype=np.float64)
+    z_entry = np.asarray(z_entries, dtype=np.float64)[None, :]
+    z_exit = np.asarray(z_exits, dtype=np.float64)[None, :]
+    n_pairs, n_configs = z.shape[1], z_entry.shape[1]
+
+    position = np.full((n_pairs, n_configs), FLAT, dtype=np.int8)
+    entry_row = np.zeros((n_pairs, n_configs), dtype=np.int64)
+    closed = []
+
+    for row in range(z.shape[0]):
+        z_row = z[row][:, None]
+        seen = ~np.isnan(z_row)
+        flat = position == FLAT
+
+        go_short = seen & flat & (z_row > z_entry)
+        go_long = seen & flat & (z_row < -z_entry)
+        close = seen & ~flat & (np.abs(z_row) < z_exit)
+
+        if close.any():
+            pair, config = np.nonzero(close)
+            closed.append((pair, config, entry_row[pair, config], np.full(len(pair), row), position[pair, config]))
+            position[close] = FLAT
+
+        opened = go_short | go_long
+        position[go_short] = SHORT
+        position[go_long] = LONG
+        entry_row[opened] = row
+
+    if not closed:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, empty, np.array([], dtype=np.int8)
+    return tuple(np.concatenate(parts) for parts in zip(*closed))
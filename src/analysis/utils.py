@@ -1,18 +1,44 @@
+import io
+import os
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+import numpy as np
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
-API_URL = "http://localhost:8000"
-CORR_MATRIX_PATH = "../output/correlation_matrix.csv"
+API_URL = os.getenv("API_URL", "http://localhost:8000")  # also where ingestion sends cache invalidations
+CORR_MATRIX_PATH = "../output/correlation_matrix.npy"
+CORR_MATRIX_CSV_PATH = None  # edit (e.g. "../output/correlation_matrix.csv") or pass csv_path to also export a CSV
+CORR_STATS_PATH = "../output/correlation_stats.npz"
 CLUSTER_LABELS_PATH = "../output/cluster_labels.csv"
+LINKAGE_PATH = "../output/cluster_linkage.npy"
 TRADE_PATH = "../output/mean_reversion_trades.csv"
+PRICE_CACHE_DIR = "../output/price_cache"
+PIPELINE_CACHE_DIR = "../output/stage_cache"
+SWEEP_PATH = "../output/parameter_sweep.csv"
+TRACE_PATH = "../output/trace_analysis.json"  # stage spans of the last analysis.main run
 
 TEST_PATH = "../output/test.csv"
 
+NPZ_MEDIA_TYPE = "application/x-npz"  # columnar bundle served by /historical_data_bulk
+NPZ_STREAM_MEDIA_TYPE = "application/x-npz-stream"  # same bundles, streamed as length-prefixed frames
+FRAME_HEADER = struct.Struct(">Q")
+
+BULK_CHUNK_SIZE = 200  # tickers per POST /historical_data_bulk request
+BULK_WORKERS = 4  # chunk requests in flight at once
+BULK_RETRIES = 3
+BULK_RETRY_DELAY = 1.0  # seconds, doubled on every retry
+BULK_TIMEOUT = 300  # seconds per chunk request
+
+_sessions = {}  # pid -> requests.Session
+
 
 def get_all_tickers_via_api() -> list[str]:
-    response = requests.get(f"{API_URL}/all_tickers")
+    response = api_session().get(f"{API_URL}/all_tickers")
     response.raise_for_status()
 
     return response.json()["tickers"]
@@ -28,7 +54,7 @@ def load_close_price_via_api(ticker: str, start: datetime = None, end: datetime
     if end:
         params["end"] = end.strftime("%Y-%m-%d")
 
-    response = requests.get(f"{API_URL}/historical_data", params=params)
+    response = api_session().get(f"{API_URL}/historical_data", params=params)
     response.raise_for_status()
     data = response.json()
 
@@ -43,23 +69,173 @@ def load_close_price_via_api(ticker: str, start: datetime = None, end: datetime
     return df["close"]
 
 
-def load_all_close_price_via_api(tickers: list[str], start: datetime, end: datetime) -> pd.DataFrame:
-    params = {
-        "tickers": tickers,
-        "fields": ["date", "close"],
-        "start": start.strftime("%Y-%m-%d"),
-        "end": end.strftime("%Y-%m-%d"),
-    }
+def _read_npz_columns(content: bytes):
+    with np.load(io.BytesIO(content)) as bundle:
+        return bundle["ticker_names"], bundle["ticker"], bundle["date"], bundle["close"]
 
-    response = requests.get(f"{API_URL}/historical_data_bulk", params=params)
-    response.raise_for_status()
-    data = response.json()
 
-    if not data:
+def _close_panel_from_columns(names, codes, dates, close) -> pd.DataFrame:
+    """Scatter (ticker code, date, close) columns straight into a date × ticker matrix."""
+    if len(codes) == 0:
         return pd.DataFrame()
 
-    df = pd.DataFrame(data)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.pivot(index="date", columns="ticker", values="close")
-    df = df.sort_index()
-    return df
+    unique_dates, rows = np.unique(dates, return_inverse=True)
+    # Keep the first bar of a duplicated (ticker, date), as drop_duplicates does on the JSON path
+    _, first = np.unique(rows.astype(np.int64) * len(names) + codes, return_index=True)
+    matrix = np.full((len(unique_dates), len(names)), np.nan)
+    matrix[rows[first], codes[first]] = close[first]
+
+    order = np.argsort(names)
+    return pd.DataFrame(
+        matrix[:, order],
+        index=pd.DatetimeIndex(unique_dates.astype("datetime64[ns]"), name="date"),
+        columns=pd.Index(names[order].tolist(), name="ticker"),
+    )
+
+
+def close_panel_from_npz(content: bytes) -> pd.DataFrame:
+    return _close_panel_from_columns(*_read_npz_columns(content))
+
+
+def iter_npz_frames(chunks):
+    """Reassemble length-prefixed .npz frames from an iterable of byte chunks."""
+    buf = bytearray()
+    for chunk in chunks:
+        buf.extend(chunk)
+        while len(buf) >= FRAME_HEADER.size:
+            (size,) = FRAME_HEADER.unpack_from(buf)
+            if len(buf) < FRAME_HEADER.size + size:
+                break
+            yield bytes(buf[FRAME_HEADER.size:FRAME_HEADER.size + size])
+            del buf[:FRAME_HEADER.size + size]
+    if buf:
+        raise ValueError("Truncated frame in streamed response")
+
+
+class PanelAssembler:
+    """
+    Collects (ticker names, ticker codes, dates, close) column blocks, each with its own ticker
+    table, remapped onto one shared table; `panel()` scatters them into a date × ticker matrix.
+    """
+
+    def __init__(self):
+        self.ticker_ids = {}
+        self.codes, self.dates, self.closes = [], [], []
+
+
+    def add(self, names, codes, dates, close):
+        remap = np.array([self.ticker_ids.setdefault(n, len(self.ticker_ids)) for n in names.tolist()], dtype=np.int32)
+        self.codes.append(remap[codes] if len(codes) else codes)
+        self.dates.append(dates)
+        self.closes.append(close)
+
+
+    def panel(self) -> pd.DataFrame:
+        if not self.codes:
+            return pd.DataFrame()
+        names = np.array(list(self.ticker_ids), dtype=str)
+        return _close_panel_from_columns(
+            names, np.concatenate(self.codes), np.concatenate(self.dates), np.concatenate(self.closes)
+        )
+
+
+def close_panel_from_npz_stream(chunks) -> pd.DataFrame:
+    """Decode streamed frames as they arrive; each frame has its own ticker table, remapped to a shared one."""
+    assembler = PanelAssembler()
+    for frame in iter_npz_frames(chunks):
+        assembler.add(*_read_npz_columns(frame))
+    return assembler.panel()
+
+
+def _json_columns(data: list[dict]):
+    """The JSON response of a bulk query as (ticker names, codes, dates, close) columns."""
+    df = pd.DataFrame(data, columns=["ticker", "date", "close"])
+    names, codes = np.unique(df["ticker"].astype(str).to_numpy(), return_inverse=True)
+    return names, codes.astype(np.int32), pd.to_datetime(df["date"]).to_numpy(), df["close"].to_numpy(dtype=float)
+
+
+def api_session() -> requests.Session:
+    """Process-wide Session keeping up to BULK_WORKERS keep-alive connections to the API."""
+    pid = os.getpid()
+    if pid not in _sessions:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=BULK_WORKERS)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _sessions[pid] = session
+    return _sessions[pid]
+
+
+def _fetch_chunk(tickers: list[str], start: datetime = None, end: datetime = None, stream: bool = False) -> list:
+    """One POST /historical_data_bulk; returns its column blocks (one per streamed frame)."""
+    body = {"tickers": tickers, "fields": ["date", "close"]}
+    if start:
+        body["start"] = start.strftime("%Y-%m-%d")
+    if end:
+        body["end"] = end.strftime("%Y-%m-%d")
+
+    if stream:
+        with api_session().post(
+                f"{API_URL}/historical_data_bulk",
+                json=body,
+                headers={"Accept": NPZ_STREAM_MEDIA_TYPE},
+                stream=True,
+                timeout=BULK_TIMEOUT
+        ) as response:
+            response.raise_for_status()
+            return [_read_npz_columns(frame) for frame in iter_npz_frames(response.iter_content(chunk_size=1 << 20))]
+
+    response = api_session().post(
+        f"{API_URL}/historical_data_bulk",
+        json=body,
+        headers={"Accept": f"{NPZ_MEDIA_TYPE}, application/json;q=0.5"},
+        timeout=BULK_TIMEOUT
+    )
+    response.raise_for_status()
+
+    if response.headers.get("content-type", "").startswith(NPZ_MEDIA_TYPE):
+        return [_read_npz_columns(response.content)]
+    return [_json_columns(response.json())]
+
+
+def _fetch_chunk_with_retry(tickers: list[str], start: datetime = None, end: datetime = None, stream: bool = False):
+    """Retry a chunk on connection errors, timeouts and 5xx with exponential backoff; 4xx fail at once."""
+    for attempt in range(BULK_RETRIES + 1):
+        try:
+            return _fetch_chunk(tickers, start, end, stream)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code < 500:
+                raise
+            error = e
+        except requests.RequestException as e:
+            error = e
+        if attempt < BULK_RETRIES:
+            tqdm.write(f"⚠️ Chunk of {len(tickers)} tickers failed ({error}), retrying")
+            time.sleep(BULK_RETRY_DELAY * 2 ** attempt)
+    raise error
+
+
+def load_all_close_price_via_api(
+        tickers: list[str], start: datetime = None, end: datetime = None, stream: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE, workers: int = BULK_WORKERS
+) -> pd.DataFrame:
+    """
+    Close-price panel of `tickers`, fetched as POST /historical_data_bulk chunks of `chunk_size`
+    tickers, `workers` at a time over the pooled session. Chunks are decoded on the worker threads
+    and added to the panel in completion order; a chunk that still fails after its retries fails
+    the whole load rather than leaving its tickers out.
+    """
+    chunks = [tickers[k:k + chunk_size] for k in range(0, len(tickers), chunk_size)]
+    assembler = PanelAssembler()
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [pool.submit(_fetch_chunk_with_retry, chunk, start, end, stream) for chunk in chunks]
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Fetching price chunks",
+                           disable=len(futures) < 2):
+            for block in future.result():
+                assembler.add(*block)
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    return assembler.panel()
@@ -0,0 +1,131 @@
+"""
+Size-bounded LRU cache of serialized price-query responses.
+
+Entries are keyed by the normalized query (sorted unique tickers, date range, sorted fields,
+ticker column, media type) and hold the exact response body, so a hit skips Mongo, decoding
+and serialization. Every entry is indexed under each of its tickers: `invalidate(tickers)`
+drops only the entries that could contain those tickers' bars. A per-ticker generation
+counter makes a response whose query started before an invalidation uncacheable, so a write
+racing a slow query can't leave stale bars behind.
+
+The cache lives in one API process and is only touched from its event loop. That assumes a
+single uvicorn worker: with several, each holds its own cache and a POST /cache/invalidate
+reaches only the worker that accepts it, so the others serve stale bars until the TTL expires.
+POST /cache/invalidate takes the API_CACHE_TOKEN shared secret, or only loopback clients when no
+token is configured.
+"""
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from src.api.metrics import REGISTRY
+
+CACHE_EVENTS = REGISTRY.counter("api_cache_events_total", "Result cache events", ["event"])
+
+
+def query_key(tickers, start_date: Optional[datetime], end_date: Optional[datetime], fields, include_ticker: bool,
+              media_type: str) -> tuple:
+    tickers = (tickers,) if isinstance(tickers, str) else tuple(sorted(set(tickers)))
+    return (
+        tickers,
+        start_date.isoformat() if start_date else None,
+        end_date.isoformat() if end_date else None,
+        tuple(sorted(set(fields))),
+        include_ticker,
+        media_type,
+    )
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int, max_entry_bytes: int, ttl: float = 0):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl  # seconds; 0 keeps entries until evicted or invalidated
+        self.entries = OrderedDict()  # key -> (payload, media type, stored at), least recent first
+        self.by_ticker = {}  # ticker -> keys of the entries holding it
+        self.generations = {}  # ticker -> number of invalidations so far
+        self.epoch = 0  # bumped by invalidating everything
+        self.size = 0
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "invalidations": 0}
+
+
+    def _count(self, event: str):
+        self.stats[event] += 1
+        CACHE_EVENTS.inc(event=event)
+
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        """(payload, media type) of a live entry, refreshed as most recently used; None on a miss."""
+        entry = self.entries.get(key)
+        if entry is not None and self.ttl and time.monotonic() - entry[2] > self.ttl:
+            self._drop(key)
+            entry = None
+        if entry is None:
+            self._count("misses")
+            return None
+        self.entries.move_to_end(key)
+        self._count("hits")
+        return entry[0], entry[1]
+
+
+    def generation(self, tickers) -> tuple:
+        """Snapshot to take before running a query and hand back to `put`."""
+        return (self.epoch,) + tuple(self.generations.get(t, 0) for t in tickers)
+
+
+    def put(self, key: tuple, payload: bytes, media_type: str, generation: tuple = None):
+        tickers = key[0]
+        if len(payload) > self.max_entry_bytes:
+            return
+        if generation is not None and generation != self.generation(tickers):
+            return  # a ticker was written while the query ran: this payload may be stale
+        if key in self.entries:
+            self._drop(key)
+
+        self.entries[key] = (payload, media_type, time.monotonic())
+        self.size += len(payload)
+        for ticker in tickers:
+            self.by_ticker.setdefault(ticker, set()).add(key)
+        self._count("stores")
+
+        while self.size > self.max_bytes:
+            self._drop(next(iter(self.entries)))
+            self._count("evictions")
+
+
+    def _drop(self, key: tuple):
+        payload, _, _ = self.entries.pop(key)
+        self.size -= len(payload)
+        for ticker in key[0]:
+            keys = self.by_ticker.get(ticker)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.by_ticker[ticker]
+
+
+    def invalidate(self, tickers=None) -> int:
+        """Drop every entry holding any of `tickers` (all entries if None); returns how many went."""
+        if tickers is None:
+            keys = list(self.entries)
+            self.epoch += 1
+        else:
+            keys = {key for t in set(tickers) for key in self.by_ticker.get(t, ())}
+            for t in set(tickers):
+                self.generations[t] = self.generations.get(t, 0) + 1
+        for key in keys:
+            self._drop(key)
+        self.stats["invalidations"] += len(keys)
+        CACHE_EVENTS.inc(len(keys), event="invalidations")
+        return len(keys)
+
+
+    def info(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,112 @@
+import asyncio
+import io
+import json
+import struct
+from datetime import datetime
+from itertools import islice
+import numpy as np
+
+NPZ_MEDIA_TYPE = "application/x-npz"
+NPZ_STREAM_MEDIA_TYPE = "application/x-npz-stream"  # length-prefixed .npz frames
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_SIZE = 20_000  # documents per cursor batch / streamed frame
+FRAME_HEADER = struct.Struct(">Q")
+
+
+def negotiate(accept: str | None) -> str:
+    """Pick the response format from the Accept header (JSON unless a binary/stream type is asked for)."""
+    accept = accept or ""
+    for media_type in (NPZ_STREAM_MEDIA_TYPE, NDJSON_MEDIA_TYPE, NPZ_MEDIA_TYPE):
+        if media_type in accept:
+            return media_type
+    return "application/json"
+
+
+def _column_array(values: list) -> np.ndarray:
+    if all(v is None or isinstance(v, (int, float)) for v in values):
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.array(["" if v is None else str(v) for v in values], dtype=str)
+
+
+def encode_npz(docs, fields: list[str]) -> bytes:
+    """
+    Pack price documents into a compressed NumPy column bundle.
+
+    The bundle holds `ticker_names` (unique symbols), `ticker` (int32 code into ticker_names),
+    `date` (datetime64[ms]) and one array per requested field, all row-aligned.
+    """
+    codes = {}
+    ticker_col, date_col = [], []
+    field_cols = {f: [] for f in fields if f not in ("ticker", "date")}
+
+    for doc in docs:
+        ticker_col.append(codes.setdefault(doc.get("ticker"), len(codes)))
+        date_col.append(doc["date"])
+        for f, col in field_cols.items():
+            col.append(doc.get(f))
+
+    arrays = {
+        "ticker_names": np.array([str(t) for t in codes], dtype=str),
+        "ticker": np.array(ticker_col, dtype=np.int32),
+        "date": np.array(date_col, dtype="datetime64[ms]"),
+    }
+    for f, col in field_cols.items():
+        arrays[f] = _column_array(col)
+
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+
+def iter_batches(cursor, batch_size: int = STREAM_BATCH_SIZE):
+    """Walk a cursor in lists of at most batch_size documents."""
+    cursor = iter(cursor)
+    while batch := list(islice(cursor, batch_size)):
+        yield batch
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_ndjson(batch: list[dict]) -> bytes:
+    return "".join(json.dumps(doc, default=_json_default) + "\n" for doc in batch).encode()
+
+
+def stream_ndjson(cursor, batch_size: int = STREAM_BATCH_SIZE):
+    """One JSON document per line, flushed a batch at a time."""
+    for batch in iter_batches(cursor, batch_size):
+        yield encode_ndjson(batch)
+
+
+def stream_npz_frames(cursor, fields: list[str], batch_size: int = STREAM_BATCH_SIZE):
+    """Each batch becomes a self-contained .npz bundle prefixed by its 8-byte big-endian length."""
+    for batch in iter_batches(cursor, batch_size):
+        frame = encode_npz(batch, fields)
+        yield FRAME_HEADER.pack(len(frame)) + frame
+
+
+async def aiter_batches(cursor, batch_size: int = STREAM_BATCH_SIZE):
+    """Async counterpart of iter_batches for async cursors / generators."""
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def astream_ndjson(cursor, batch_size: int = STREAM_BATCH_SIZE):
+    async for batch in aiter_batches(cursor, batch_size):
+        yield encode_ndjson(batch)
+
+
+async def astream_npz_frames(cursor, fields: list[str], batch_size: int = STREAM_BATCH_SIZE):
+    async for batch in aiter_batches(cursor, batch_size):
+        # Compression is CPU work: keep it off the event loop
+        frame = await asyncio.to_thread(encode_npz, batch, fields)
+        yield FRAME_HEADER.pack(len(frame)) + frame
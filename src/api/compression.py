@@ -0,0 +1,66 @@
+"""
+Response compression: zstd for clients that accept it, gzip otherwise.
+
+zstd needs `compression.zstd` (Python 3.14+) or the `backports.zstd` package, the same
+modules urllib3 (and so requests) decodes it with; without either only gzip is offered.
+The npz media types are never recompressed: their arrays are already deflated inside the bundle.
+"""
+import asyncio
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import DEFAULT_EXCLUDED_CONTENT_TYPES, GZipMiddleware, IdentityResponder
+from src.api.columnar import NPZ_MEDIA_TYPE, NPZ_STREAM_MEDIA_TYPE
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:  # optional: gzip only
+        zstd = None
+
+COMPRESS_MIN_BYTES = 1024  # smaller bodies go out as they are
+GZIP_LEVEL = 5  # level 9 costs several times the CPU for a few percent on price JSON
+ZSTD_LEVEL = 3
+THREAD_MIN_BYTES = 128 << 10  # compress larger chunks off the event loop
+EXCLUDED_CONTENT_TYPES = DEFAULT_EXCLUDED_CONTENT_TYPES + (NPZ_MEDIA_TYPE, NPZ_STREAM_MEDIA_TYPE)
+
+
+class ZstdResponder(IdentityResponder):
+    content_encoding = "zstd"
+
+    def __init__(self, app, minimum_size: int, level: int, *, exclude_content_types):
+        super().__init__(app, minimum_size, exclude_content_types=exclude_content_types)
+        self.compressor = zstd.ZstdCompressor(level=level)
+
+
+    def _compress(self, body: bytes, more_body: bool) -> bytes:
+        # A streamed chunk is flushed as a whole block, so the client can decode it on arrival
+        mode = zstd.ZstdCompressor.FLUSH_BLOCK if more_body else zstd.ZstdCompressor.FLUSH_FRAME
+        return self.compressor.compress(body, mode)
+
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MIN_BYTES:
+            return await asyncio.to_thread(self._compress, body, more_body)
+        return self._compress(body, more_body)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def __init__(
+            self, app, minimum_size: int = COMPRESS_MIN_BYTES, compresslevel: int = GZIP_LEVEL,
+            zstd_level: int = ZSTD_LEVEL, exclude_content_types=EXCLUDED_CONTENT_TYPES
+    ):
+        super().__init__(
+            app, minimum_size, compresslevel, THREAD_MIN_BYTES, exclude_content_types=exclude_content_types
+        )
+        self.zstd_level = zstd_level
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and zstd is not None and "zstd" in Headers(scope=scope).get("Accept-Encoding", ""):
+            responder = ZstdResponder(
+                self.app, self.minimum_size, self.zstd_level, exclude_content_types=self.exclude_content_types
+            )
+            await responder(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -1,89 +1,169 @@
-from fastapi import FastAPI, Query
-from typing import List, Optional
+import asyncio
+import secrets
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi.responses import JSONResponse
-from src.config.settings import get_collection
-
-app = FastAPI()
-collection = get_collection()
+from fastapi import Body, FastAPI, Query, Header, Request
+from fastapi.encoders import jsonable_encoder
+from typing import List, Optional
+from pydantic import BaseModel
+from pymongo.errors import PyMongoError
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from src.api.cache import ResultCache, query_key
+from src.api.columnar import (
+    NDJSON_MEDIA_TYPE, NPZ_MEDIA_TYPE, NPZ_STREAM_MEDIA_TYPE, STREAM_BATCH_SIZE,
+    astream_ndjson, astream_npz_frames, encode_npz, negotiate
+)
+from src.api.compression import CompressionMiddleware
+from src.api.metrics import METRICS_MEDIA_TYPE, REGISTRY, MetricsMiddleware, Phase, counted, drain
+from src.config.settings import (
+    API_CACHE_MAX_BYTES, API_CACHE_MAX_ENTRY_BYTES, API_CACHE_TOKEN, API_CACHE_TTL, ENSURE_INDEXES
+)
+from src.db.queries import parse_date
+from src.db.storage import get_async_store
+
+# Async store on the process-wide pooled AsyncMongoClient, created by `lifespan` on the serving
+# event loop (tests and the benchmark may assign one first): handlers never block the event loop
+store = None
+
+# Serialized responses of recent queries; writers invalidate the tickers they touch
+cache = ResultCache(API_CACHE_MAX_BYTES, API_CACHE_MAX_ENTRY_BYTES, API_CACHE_TTL)
+LOOPBACK_HOSTS = {"127.0.0.1", "::1", "localhost"}  # may invalidate the cache when no API_CACHE_TOKEN is set
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global store
+    if store is None:
+        store = get_async_store()
+    if ENSURE_INDEXES:
+        try:
+            await store.ensure_indexes()
+        except PyMongoError as e:
+            # Usually duplicate bars blocking the unique index: python -m src.db.indexes --dedupe
+            print(f"⚠️ Index bootstrap failed: {e}")
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)  # added last = outermost, so it counts the compressed bytes sent
+
+
+async def cache_stream(body, key: tuple, media_type: str, generation: tuple):
+    """Pass a streamed body through, caching it once complete unless it outgrows a cache entry."""
+    chunks, size = [], 0
+    async for chunk in body:
+        if chunks is not None:
+            size += len(chunk)
+            if size > cache.max_entry_bytes:
+                chunks = None  # too big to cache: stop copying
+            else:
+                chunks.append(chunk)
+        yield chunk
+    if chunks is not None:
+        cache.put(key, b"".join(chunks), media_type, generation)
+
+
+async def respond(
+        tickers, start_date, end_date, fields: List[str], include_ticker: bool, accept: Optional[str], endpoint: str
+):
+    """Serialize a price query in the format negotiated from the Accept header, or serve it from the cache."""
+    media_type = negotiate(accept)
+    key = query_key(tickers, start_date, end_date, fields, include_ticker, media_type)
+    hit = cache.get(key)
+    if hit is not None:
+        payload, media_type = hit
+        return Response(content=payload, media_type=media_type)
+    generation = cache.generation(key[0])  # taken before querying, so a concurrent write voids the result
+
+    if media_type in (NDJSON_MEDIA_TYPE, NPZ_STREAM_MEDIA_TYPE):
+        # Stream straight off the cursor: server memory stays at one batch (plus the copy being cached)
+        cursor = counted(
+            store.find_bars(tickers, start_date, end_date, fields, include_ticker, batch_size=STREAM_BATCH_SIZE),
+            endpoint
+        )
+        if media_type == NDJSON_MEDIA_TYPE:
+            body = astream_ndjson(cursor)
+        else:
+            body = astream_npz_frames(cursor, fields)
+        return StreamingResponse(cache_stream(body, key, media_type, generation), media_type=media_type)
+
+    bars = await drain(store.find_bars(tickers, start_date, end_date, fields, include_ticker), endpoint)
+
+    with Phase(endpoint, "serialize"):
+        if media_type == NPZ_MEDIA_TYPE:
+            # Columnar bundle: no per-row JSON objects on either side
+            response = Response(content=await asyncio.to_thread(encode_npz, bars, fields), media_type=NPZ_MEDIA_TYPE)
+        else:
+            # Encoding a large result is CPU-bound as well
+            response = JSONResponse(content=await asyncio.to_thread(jsonable_encoder, bars))
+
+    cache.put(key, response.body, media_type, generation)
+    return response
 
 
 @app.get("/historical_data_bulk")
-def get_historical_data_bulk(
+async def get_historical_data_bulk(
     tickers: List[str] = Query(...),
     start: Optional[str] = None,
     end: Optional[str] = None,
-    fields: List[str] = Query(default=["date", "close"])
+    fields: List[str] = Query(default=["date", "close"]),
+    accept: Optional[str] = Header(default=None)
 ):
-    start_date = None
-    end_date = None
-
     try:
-        if start:
-            start_date = datetime.strptime(start, "%Y-%m-%d")
-        if end:
-            end_date = datetime.strptime(end, "%Y-%m-%d")
+        start_date = parse_date(start)
+        end_date = parse_date(end)
     except ValueError:
         return JSONResponse(status_code=400, content={"error": "Invalid date format"})
 
-    query = {
-        "ticker": {"$in": tickers}
-    }
-    if start_date and end_date:
-        query["date"] = {"$gte": start_date, "$lte": end_date}
-    elif start_date:
-        query["date"] = {"$gte": start_date}
-    elif end_date:
-        query["date"] = {"$lte": end_date}
+    return await respond(tickers, start_date, end_date, fields, True, accept, "/historical_data_bulk")
 
-    projection = {field: 1 for field in fields}
-    projection["ticker"] = 1
-    projection["date"] = 1
-    projection["_id"] = 0
 
-    results = list(collection.find(query, projection))
-    return results
+class BulkQuery(BaseModel):
+    tickers: List[str]
+    start: Optional[str] = None
+    end: Optional[str] = None
+    fields: List[str] = ["date", "close"]
+
+
+@app.post("/historical_data_bulk")
+async def post_historical_data_bulk(query: BulkQuery, accept: Optional[str] = Header(default=None)):
+    """Same query as GET /historical_data_bulk, with the tickers in a JSON body instead of the URL."""
+    try:
+        start_date = parse_date(query.start)
+        end_date = parse_date(query.end)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid date format"})
+
+    return await respond(query.tickers, start_date, end_date, query.fields, True, accept, "/historical_data_bulk")
 
 
 @app.get("/historical_data")
-def get_historical_data(
+async def get_historical_data(
         ticker: str,
         start: Optional[str] = None,
         end: Optional[str] = None,
-        fields: List[str] = Query(default=["date", "close", "volume"])
+        fields: List[str] = Query(default=["date", "close", "volume"]),
+        accept: Optional[str] = Header(default=None)
 ):
-    query = {"ticker": ticker}
-    start_date = None
-    end_date = None
-
     try:
-        if start:
-            start_date = datetime.strptime(start, "%Y-%m-%d")
-        if end:
-            end_date = datetime.strptime(end, "%Y-%m-%d")
+        start_date = parse_date(start)
+        end_date = parse_date(end)
     except ValueError:
         return JSONResponse(status_code=400, content={"error": "Invalid date format"})
 
-    if start and end:
-        query["date"] = {"$gte": start_date, "$lte": end_date}
-    elif start:
-        query["date"] = {"$gte": start_date}
-    elif end:
-        query["date"] = {"$lte": end_date}
-
-    projection = {field: 1 for field in fields}
-    projection["date"] = 1
-    projection["_id"] = 0
-
-    results = list(collection.find(query, projection))
-    return results
+    return await respond(ticker, start_date, end_date, fields, False, accept, "/historical_data")
 
 
 @app.get("/all_tickers")
-def get_all_tickers():
+async def get_all_tickers(min_history: Optional[int] = None, active_since: Optional[str] = None):
+    """Tickers from the `tickers` metadata, optionally with >= min_history bars and a bar since active_since."""
     try:
-        tickers = collection.distinct("ticker")
-        return {"tickers": sorted(tickers)}
+        active_date = parse_date(active_since)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid date format"})
+    try:
+        return {"tickers": await store.list_tickers(min_history, active_date)}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
@@ -93,8 +173,42 @@ async def upload_bulk(data: List[dict]):
     if not data:
         return {"message": "No data provided"}
     try:
-        collection.insert_many(data, ordered=False)
+        for record in data:
+            if isinstance(record.get("date"), str):
+                record["date"] = datetime.fromisoformat(record["date"])
+        await store.write_bars(data)
         return {"message": f"{len(data)} records inserted."}
     except Exception as e:
         return {"error": str(e)}
+    finally:
+        # Even a failed bulk write may have stored some of the bars
+        cache.invalidate({record["ticker"] for record in data if "ticker" in record})
 
+
+@app.post("/cache/invalidate")
+async def invalidate_cache(
+        request: Request, tickers: Optional[List[str]] = Body(default=None, embed=True),
+        x_cache_token: Optional[str] = Header(default=None)
+):
+    """
+    Called by the ingestion writers after they touch `tickers`; no tickers clears the whole cache.
+    Needs the X-Cache-Token header when API_CACHE_TOKEN is set, and a loopback client otherwise.
+    It only reaches this worker's cache (see src.api.cache).
+    """
+    if API_CACHE_TOKEN:
+        allowed = x_cache_token is not None and secrets.compare_digest(x_cache_token, API_CACHE_TOKEN)
+    else:
+        allowed = request.client is not None and request.client.host in LOOPBACK_HOSTS
+    if not allowed:
+        return JSONResponse(status_code=403, content={"error": "Cache invalidation not allowed"})
+    return {"invalidated": cache.invalidate(tickers)}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return cache.info()
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type=METRICS_MEDIA_TYPE)
@@ -0,0 +1,212 @@
+"""
+In-process request metrics, served in the Prometheus text format on GET /metrics.
+
+    api_request_seconds{endpoint}          histogram, whole request including a streamed body
+    api_phase_seconds{endpoint,phase}      histogram, phase = query | decode | serialize
+    api_requests_total{endpoint,status}    counter
+    api_rows_total{endpoint}               counter, bars returned
+    api_response_bytes_total{endpoint}     counter, body bytes sent
+
+`query` is the wait for the cursor's first batch (Mongo executing the find), `decode` is
+draining the rest of the cursor into Python rows, `serialize` is JSON / npz encoding.
+Values live in this process only; with several uvicorn workers each serves its own.
+"""
+import time
+from bisect import bisect_left
+from threading import Lock
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+UNMATCHED_ENDPOINT = "other"  # unknown paths share one label so 404 scans can't grow the series
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _number(value) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.series = {}  # label values -> count
+        self.lock = Lock()
+
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+
+    def value(self, **labels) -> float:
+        return self.series.get(tuple(labels[n] for n in self.labelnames), 0)
+
+
+    def samples(self):
+        with self.lock:
+            series = sorted(self.series.items())
+        for key, value in series:
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [per-bucket counts (last one is +Inf), sum]
+        self.lock = Lock()
+
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels[n] for n in self.labelnames)
+        slot = bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.series.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[slot] += 1
+            self.series[key] = (counts, total + value)
+
+
+    def count(self, **labels) -> int:
+        counts, _ = self.series.get(tuple(labels[n] for n in self.labelnames), ((), 0.0))
+        return sum(counts)
+
+
+    def samples(self):
+        with self.lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self.series.items())
+        names = self.labelnames + ("le",)
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                le = bound if bound == "+Inf" else _number(bound)
+                yield f"{self.name}_bucket{_labels(names, key + (le,))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+
+    def histogram(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.histogram("api_request_seconds", "Request latency until the last body byte", ["endpoint"])
+PHASE_SECONDS = REGISTRY.histogram("api_phase_seconds", "Request time by phase", ["endpoint", "phase"])
+REQUESTS = REGISTRY.counter("api_requests_total", "Requests by response status", ["endpoint", "status"])
+ROWS = REGISTRY.counter("api_rows_total", "Bars returned", ["endpoint"])
+RESPONSE_BYTES = REGISTRY.counter("api_response_bytes_total", "Response body bytes sent", ["endpoint"])
+
+
+class Phase:
+    """`with Phase(endpoint, "serialize"):` adds the block's wall time to api_phase_seconds."""
+
+    def __init__(self, endpoint: str, name: str):
+        self.endpoint = endpoint
+        self.name = name
+
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+
+    def __exit__(self, *exc):
+        PHASE_SECONDS.observe(time.perf_counter() - self.started, endpoint=self.endpoint, phase=self.name)
+
+
+async def drain(cursor, endpoint: str) -> list:
+    """Collect a cursor, timing the first batch as `query` and the rest as `decode`."""
+    started = time.perf_counter()
+    rows = []
+    async for row in cursor:
+        if not rows:
+            first = time.perf_counter()
+            PHASE_SECONDS.observe(first - started, endpoint=endpoint, phase="query")
+        rows.append(row)
+    PHASE_SECONDS.observe(time.perf_counter() - (first if rows else started), endpoint=endpoint,
+                          phase="decode" if rows else "query")
+    ROWS.inc(len(rows), endpoint=endpoint)
+    return rows
+
+
+async def counted(cursor, endpoint: str):
+    """Pass a streamed cursor through, recording its `query` phase and the rows it yields."""
+    started = time.perf_counter()
+    n = 0
+    try:
+        async for row in cursor:
+            if not n:
+                PHASE_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, phase="query")
+            n += 1
+            yield row
+    finally:
+        ROWS.inc(n, endpoint=endpoint)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: latency until the response body is complete, status and bytes per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status, sent = 500, 0
+
+        async def send_counted(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_counted)
+        finally:
+            route = scope.get("route")  # set by the router once a path matched
+            endpoint = getattr(route, "path", UNMATCHED_ENDPOINT)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+            REQUESTS.inc(endpoint=endpoint, status=str(status))
+            RESPONSE_BYTES.inc(sent, endpoint=endpoint)
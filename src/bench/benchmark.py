@@ -0,0 +1,251 @@
+"""
+End-to-end benchmark on a seeded synthetic market.
+
+    python -m src.bench.benchmark --tickers 20 --backend mongomock
+    python -m src.bench.benchmark --backend uri --mongo-uri mongodb://localhost:27017
+    python -m src.bench.benchmark --compare bench_results/<older>.json
+
+Times the backfill (upload_all), the incremental update (update_all_insert), the API
+endpoints (uri backend only: the API runs on the async driver) and every analysis.main
+stage, and writes one JSON result file per run (commit, config, timings) to compare
+across commits, plus the run's span trace (<result>.trace.json, see src.tracing).
+The benchmark database is dropped and rebuilt on every run.
+mongomock has no indexes or query planner: every upsert scans the collection, so the
+in-process backend defaults to a small market and its numbers only compare runs with each
+other; use a local mongod (--backend uri) for absolute throughput.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+from src.db.fetcher import AdaptiveLimiter, FetchScheduler, RetryQueue
+from src.db.load_data import Checkpoint, upload_all
+from src.db.sources import SyntheticSource
+from src.db.storage import FlatStore
+from src.db.update_data import update_all_insert
+from src.db.writer import BulkWriter
+from src.tracing import tracer
+
+BENCH_RESULTS_DIR = "bench_results"
+BENCH_DATABASE = "oakcean_bench"
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Market size per backend unless given on the command line (mongomock upserts are O(stored bars))
+BACKEND_DEFAULTS = {
+    "mongomock": {"tickers": 12, "start": "2023-01-01", "clusters": 3},
+    "uri": {"tickers": 60, "start": "2015-01-01", "clusters": 10},
+}
+
+
+class Bench:
+    """Collects timing entries: {group, name, seconds, ...extra fields}."""
+
+    def __init__(self):
+        self.results = []
+
+
+    @contextmanager
+    def measure(self, group: str, name: str, **extra):
+        entry = {"group": group, "name": name, **extra}
+        started = time.perf_counter()
+        yield entry
+        entry["seconds"] = time.perf_counter() - started
+        self.results.append(entry)
+        rows = f", {entry['rows']} rows" if "rows" in entry else ""
+        print(f"⏱️ {group}/{name}: {entry['seconds']:.3f}s{rows}")
+
+
+    def repeat(self, group: str, name: str, fn, repeats: int, setup=None, **extra):
+        """
+        Run `fn()` `repeats` times, each after an untimed `setup()` if given; records the median
+        and every run. fn returns extra fields.
+        """
+        runs, fields = [], {}
+        for _ in range(repeats):
+            if setup is not None:
+                setup()
+            started = time.perf_counter()
+            fields = fn() or {}
+            runs.append(time.perf_counter() - started)
+        entry = {"group": group, "name": name, "seconds": statistics.median(runs), "runs": runs, **extra, **fields}
+        self.results.append(entry)
+        print(f"⏱️ {group}/{name}: median {entry['seconds']:.3f}s over {repeats} runs")
+
+
+def in_process_store() -> FlatStore:
+    """FlatStore on a fresh mongomock database (optional dependency)."""
+    from src.db.in_memory import in_memory_client
+    database = in_memory_client()[BENCH_DATABASE]
+    return FlatStore(database["daily_prices"], database["tickers"])
+
+
+def git_commit() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True, cwd=SRC_DIR).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def fast_scheduler() -> FetchScheduler:
+    """No rate limit, so the numbers measure our code rather than the token bucket."""
+    return FetchScheduler(
+        rate=1e6, burst=10_000, limiter=AdaptiveLimiter(initial=16, maximum=32),
+        backoff_base=0.01, retry_queue=RetryQueue(None)
+    )
+
+
+def bench_ingestion(bench: Bench, store, source: SyntheticSource, update_days: int):
+    cut = source.dates[-update_days - 1]
+    source.as_of = cut
+    with bench.measure("ingestion", "upload_all", tickers=len(source.tickers)) as entry:
+        upload_all(source, fast_scheduler(), Checkpoint(None), start_date=source.dates[0].strftime("%Y%m%d"),
+                   store=store, on_write=None)
+    entry["rows"] = backfilled = store.collection.count_documents({})
+
+    source.as_of = None
+    with bench.measure("ingestion", "update_all_insert", days=update_days) as entry:
+        update_all_insert(source, fast_scheduler(), BulkWriter(store, on_write=None), store=store)
+    entry["rows"] = store.collection.count_documents({}) - backfilled
+
+
+def bench_api(bench: Bench, uri: str, tickers: list[str], repeats: int):
+    from fastapi.testclient import TestClient
+    from pymongo import AsyncMongoClient
+    import src.api.main as api
+    from src.api.columnar import NDJSON_MEDIA_TYPE, NPZ_MEDIA_TYPE, NPZ_STREAM_MEDIA_TYPE
+    from src.db.storage import AsyncFlatStore
+
+    api.store = AsyncFlatStore(AsyncMongoClient(uri)[BENCH_DATABASE]["daily_prices"])
+    with TestClient(api.app) as client:
+        def call(path, params=None, accept="application/json"):
+            def fn():
+                response = client.get(path, params=params, headers={"Accept": accept})
+                response.raise_for_status()
+                return {"bytes": len(response.content)}
+            return fn
+
+        def cached(name, fn, **extra):
+            # Misses time the endpoint itself (the cache is emptied before each run); hits time the result cache
+            bench.repeat("api", name, fn, repeats, setup=api.cache.invalidate, **extra)
+            bench.repeat("api", f"{name}[cached]", fn, repeats, **extra)
+
+        bench.repeat("api", "/all_tickers", call("/all_tickers"), repeats)
+        cached("/historical_data", call("/historical_data", {"ticker": tickers[0]}))
+        bulk = {"tickers": tickers, "fields": ["close"]}
+        for label, accept in [
+            ("json", "application/json"), ("npz", NPZ_MEDIA_TYPE),
+            ("npz-stream", NPZ_STREAM_MEDIA_TYPE), ("ndjson", NDJSON_MEDIA_TYPE),
+        ]:
+            cached(f"/historical_data_bulk[{label}]", call("/historical_data_bulk", bulk, accept), tickers=len(tickers))
+
+
+def bench_analysis(bench: Bench, store, tickers: list[str], corr_limit: float):
+    # analysis modules import each other as `analysis.*` (they run from src/)
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    from analysis.main import build_pipeline
+    from analysis.price_panel import PricePanel
+
+    with bench.measure("analysis", "load_panel") as entry:
+        bars = pd.DataFrame(list(store.find_bars(tickers, fields=("date", "close"), include_ticker=True)))
+        panel = PricePanel(bars.pivot(index="date", columns="ticker", values="close"))
+    entry["rows"] = len(bars)
+
+    pipeline = build_pipeline(panel, corr_limit=corr_limit)
+    for stage in pipeline.stages.values():
+        stage.publish = {}  # leave ../output untouched
+
+        def timed(out_dir, inputs, _fn=stage.fn, _name=stage.name, **params):
+            with bench.measure("analysis", _name):
+                _fn(out_dir, inputs, **params)
+        stage.fn = timed
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        pipeline.cache_dir = cache_dir
+        pipeline.run()
+
+
+def compare(old_path: str, new: dict):
+    with open(old_path) as f:
+        old = json.load(f)
+    before = {(r["group"], r["name"]): r["seconds"] for r in old["results"]}
+    print(f"\n{'benchmark':<45}{'before':>10}{'after':>10}{'ratio':>8}   ({old['commit'][:8]} -> {new['commit'][:8]})")
+    for r in new["results"]:
+        key = (r["group"], r["name"])
+        if key in before:
+            print(f"{'/'.join(key):<45}{before[key]:>10.3f}{r['seconds']:>10.3f}{r['seconds'] / before[key]:>8.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, API and analysis on synthetic data")
+    parser.add_argument("--tickers", type=int, help="default depends on --backend (BACKEND_DEFAULTS)")
+    parser.add_argument("--start", help="default depends on --backend")
+    parser.add_argument("--end", default="2023-12-29")
+    parser.add_argument("--clusters", type=int, help="default depends on --backend")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--update-days", type=int, default=20, help="trading days left for update_all_insert")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per data-source call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="simulated transient failure rate")
+    parser.add_argument("--corr-limit", type=float, default=0.9, help="pair filter of the strategy stage")
+    parser.add_argument("--backend", choices=["mongomock", "uri"], default="mongomock")
+    parser.add_argument("--mongo-uri", default=os.getenv("MONGO_URI", "mongodb://localhost:27017"))
+    parser.add_argument("--groups", default="ingestion,api,analysis")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output-dir", default=BENCH_RESULTS_DIR)
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    args = parser.parse_args(argv)
+    for name, value in BACKEND_DEFAULTS[args.backend].items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+    groups = set(args.groups.split(","))
+
+    source = SyntheticSource(
+        n_tickers=args.tickers, start=args.start, end=args.end, n_clusters=args.clusters, seed=args.seed,
+        latency=args.latency, error_rate=args.error_rate
+    )
+    if args.backend == "uri":
+        from pymongo import MongoClient
+        client = MongoClient(args.mongo_uri)
+        client.drop_database(BENCH_DATABASE)
+        store = FlatStore(client[BENCH_DATABASE]["daily_prices"])
+        store.ensure_indexes()
+    else:
+        store = in_process_store()
+
+    bench = Bench()
+    bench_ingestion(bench, store, source, args.update_days)  # also loads the data the other groups read
+    if "api" in groups:
+        if args.backend == "uri":
+            bench_api(bench, args.mongo_uri, source.tickers, args.repeats)
+        else:
+            print("⏩ api: skipped (needs --backend uri; the API runs on the async driver)")
+    if "analysis" in groups:
+        bench_analysis(bench, store, source.tickers, args.corr_limit)
+
+    report = {
+        **git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "results": [r for r in bench.results if r["group"] in groups],
+    }
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"{datetime.now():%Y%m%d-%H%M%S}-{report['commit'][:8]}.json")
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Benchmark results saved to: {path}")
+    print("🧭 Span trace saved to:", tracer.dump(path.replace(".json", ".trace.json")))
+
+    if args.compare:
+        compare(args.compare, report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
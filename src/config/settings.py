@@ -1,4 +1,5 @@
 import certifi
+from pymongo import AsyncMongoClient
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
@@ -9,17 +10,73 @@ import os
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
+ENSURE_INDEXES = os.getenv("ENSURE_INDEXES", "1") == "1"  # create required indexes on API startup
+STORAGE_LAYOUT = os.getenv("STORAGE_LAYOUT", "flat")  # "flat": one doc per bar, "bucket": one doc per ticker-year
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+RETRY_QUEUE_PATH = os.getenv("RETRY_QUEUE_PATH", "failed_fetches.json")  # tickers whose fetch kept failing
+BACKFILL_CHECKPOINT_PATH = os.getenv("BACKFILL_CHECKPOINT_PATH", "backfill_checkpoint.json")  # tickers fully loaded
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")  # ingestion runs dump their timing/memory spans here
+API_CACHE_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", str(512 << 20)))  # serialized responses kept by the API
+API_CACHE_MAX_ENTRY_BYTES = int(os.getenv("API_CACHE_MAX_ENTRY_BYTES", str(128 << 20)))  # larger responses aren't cached
+# Seconds a cached response may be served. Writers outside the API only invalidate it through
+# API_CACHE_INVALIDATE_URL, so the TTL bounds staleness when that is unreachable; 0 = until evicted or invalidated
+API_CACHE_TTL = float(os.getenv("API_CACHE_TTL", "900"))
+API_URL = os.getenv("API_URL", "http://localhost:8000")  # the API the analysis client reads from
+# Where ingestion writers report the tickers they touched; set it empty to turn invalidation off
+API_CACHE_INVALIDATE_URL = os.getenv("API_CACHE_INVALIDATE_URL", f"{API_URL}/cache/invalidate")
+# Shared secret for POST /cache/invalidate; without one the API only accepts it from loopback clients
+API_CACHE_TOKEN = os.getenv("API_CACHE_TOKEN")
+
+# One pooled client per process, keyed by pid so a forked worker never reuses its parent's sockets
+_clients = {}
+_async_clients = {}
 
 
 def get_mongo_client():
     # return MongoClient(MONGO_URI, server_api=ServerApi('1'), tls=True, tlsCAFile=certifi.where())
-    return MongoClient(MONGO_URI)
+    pid = os.getpid()
+    if pid not in _clients:
+        _clients[pid] = MongoClient(
+            MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE, minPoolSize=MONGO_MIN_POOL_SIZE
+        )
+    return _clients[pid]
 
 
-def get_collection(use_yfinance=False):
-    client = get_mongo_client()
+def get_async_mongo_client():
+    pid = os.getpid()
+    if pid not in _async_clients:
+        _async_clients[pid] = AsyncMongoClient(
+            MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE, minPoolSize=MONGO_MIN_POOL_SIZE
+        )
+    return _async_clients[pid]
+
+
+def _select_database(client, use_yfinance=False):
     if use_yfinance:
-        db = client["sse_yfinance"]
-    else:
-        db = client["sse_local"]
-    return db["daily_prices"]
+        return client["sse_yfinance"]
+    return client["sse_local"]
+
+
+def get_database(use_yfinance=False):
+    return _select_database(get_mongo_client(), use_yfinance)
+
+
+def get_async_database(use_yfinance=False):
+    return _select_database(get_async_mongo_client(), use_yfinance)
+
+
+def get_collection(use_yfinance=False):
+    return get_database(use_yfinance)["daily_prices"]
+
+
+def get_bucket_collection(use_yfinance=False):
+    return get_database(use_yfinance)["daily_prices_buckets"]
+
+
+def get_async_collection(use_yfinance=False):
+    return get_async_database(use_yfinance)["daily_prices"]
+
+
+def get_async_bucket_collection(use_yfinance=False):
+    return get_async_database(use_yfinance)["daily_prices_buckets"]
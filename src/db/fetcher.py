@@ -0,0 +1,208 @@
+import asyncio
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+from src.config.settings import RETRY_QUEUE_PATH
+
+FETCH_RATE = 5.0  # data-source calls per second (token refill rate)
+FETCH_BURST = 10  # token bucket capacity
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+INITIAL_CONCURRENCY = 4
+TARGET_LATENCY = 3.0  # seconds; slower calls count as congestion
+MAX_RETRIES = 4  # attempts after the first one
+BACKOFF_BASE = 1.0  # seconds, doubled on every retry
+BACKOFF_MAX = 60.0
+
+
+class TokenBucket:
+    """Async token bucket: at most `rate` acquisitions per second on average, bursts up to `capacity`."""
+
+    def __init__(self, rate: float = FETCH_RATE, capacity: int = FETCH_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+    async def acquire(self):
+        async with self.lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit adjusted AIMD-style from what the data source reports back:
+    every fast success raises the limit by 1/limit (about +1 per round of calls),
+    an error or a call slower than `target_latency` halves it.
+    """
+
+    def __init__(
+            self, initial: int = INITIAL_CONCURRENCY, minimum: int = MIN_CONCURRENCY,
+            maximum: int = MAX_CONCURRENCY, target_latency: float = TARGET_LATENCY
+    ):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return self
+
+
+    async def __aexit__(self, *exc):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+
+    def record(self, latency: float, ok: bool):
+        if ok and latency <= self.target_latency:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        else:
+            self.limit = max(self.minimum, self.limit / 2)
+
+
+class RetryQueue:
+    """Tickers whose fetch still failed after all retries, persisted as JSON so the next run can pick them up."""
+
+    def __init__(self, path: str = RETRY_QUEUE_PATH):
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self.entries
+
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+    def tickers(self) -> list[str]:
+        return sorted(self.entries)
+
+
+    def first(self, tickers) -> list[str]:
+        """`tickers` with the queued ones moved to the front, each group keeping its order."""
+        return sorted(tickers, key=lambda t: t not in self.entries)
+
+
+    def add(self, ticker: str, error: str, attempts: int):
+        previous = self.entries.get(ticker, {})
+        self.entries[ticker] = {
+            "error": error,
+            "attempts": previous.get("attempts", 0) + attempts,
+            "failed_at": datetime.now().isoformat(timespec="seconds"),
+        }
+
+
+    def discard(self, ticker: str):
+        self.entries.pop(ticker, None)
+
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+class FetchScheduler:
+    """
+    Runs blocking data-source calls (one per ticker) on worker threads under a
+    token-bucket rate limit and an adaptive concurrency limit, retrying each failure with
+    exponential backoff + jitter. Tickers that exhaust their retries go to the RetryQueue;
+    tickers that succeed are removed from it.
+    """
+
+    def __init__(
+            self, rate: float = FETCH_RATE, burst: int = FETCH_BURST, limiter: Optional[AdaptiveLimiter] = None,
+            max_retries: int = MAX_RETRIES, backoff_base: float = BACKOFF_BASE, backoff_max: float = BACKOFF_MAX,
+            retry_queue: Optional[RetryQueue] = None
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.limiter = limiter
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_queue = retry_queue if retry_queue is not None else RetryQueue(None)
+        self.stats = {"calls": 0, "errors": 0, "retried": 0, "failed": 0}
+
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0.5, 1.0) * min(self.backoff_max, self.backoff_base * 2 ** attempt)
+
+
+    async def _fetch_one(self, ticker: str, fetch: Callable, bucket: TokenBucket, executor, on_result: Callable):
+        loop = asyncio.get_running_loop()
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.stats["retried"] += 1
+                await asyncio.sleep(self.backoff(attempt - 1))
+
+            await bucket.acquire()
+            async with self.limiter:
+                started = time.monotonic()
+                try:
+                    result = await loop.run_in_executor(executor, fetch, ticker)
+                    error = None
+                except Exception as e:
+                    error = e
+                self.stats["calls"] += 1
+                self.limiter.record(time.monotonic() - started, ok=error is None)
+
+            if error is None:
+                self.retry_queue.discard(ticker)
+                return on_result(ticker, result, None)
+            self.stats["errors"] += 1
+
+        self.stats["failed"] += 1
+        self.retry_queue.add(ticker, f"{type(error).__name__}: {error}", attempts=self.max_retries + 1)
+        return on_result(ticker, None, error)
+
+
+    async def run(self, tickers, fetch: Callable, on_result: Callable) -> dict:
+        """
+        Call `fetch(ticker)` (blocking; runs in a worker thread) for every ticker and
+        `on_result(ticker, result, error)` on the event loop as each one finishes
+        (error is None on success). Returns call / error / retry / failure counts.
+        """
+        bucket = TokenBucket(self.rate, self.burst)
+        if self.limiter is None:
+            self.limiter = AdaptiveLimiter()
+        # Own thread pool sized to the limiter's ceiling (the default executor may be smaller)
+        with ThreadPoolExecutor(max_workers=self.limiter.maximum) as executor:
+            try:
+                await asyncio.gather(*(self._fetch_one(t, fetch, bucket, executor, on_result) for t in tickers))
+            finally:
+                self.retry_queue.save()
+        return {**self.stats, "concurrency": int(self.limiter.limit)}
@@ -0,0 +1,22 @@
+"""
+In-memory MongoDB (mongomock, a test/benchmark dependency) usable by the stores as they are.
+
+mongomock has no indexes, so every upsert scans its collection: fine for tests and small
+benchmark runs, quadratic in the number of stored bars beyond that.
+"""
+
+
+def in_memory_client():
+    """Fresh mongomock client whose bulk writes accept what pymongo's write models send."""
+    import mongomock
+
+    # pymongo >= 4.11 passes UpdateOne/ReplaceOne(sort=...) to the bulk builder, which mongomock predates
+    builder = mongomock.collection.BulkOperationBuilder
+    for method in ("add_update", "add_replace"):
+        original = getattr(builder, method)
+        if not getattr(original, "drops_sort", False):
+            def without_sort(self, *args, _method=original, sort=None, **kwargs):
+                return _method(self, *args, **kwargs)
+            without_sort.drops_sort = True
+            setattr(builder, method, without_sort)
+    return mongomock.MongoClient()
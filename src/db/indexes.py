@@ -0,0 +1,127 @@
+import argparse
+from datetime import datetime
+from pymongo import ASCENDING
+from src.config.settings import get_collection
+from src.db.queries import latest_bar_query, price_projection, price_query
+
+# Indexes every daily_prices collection must carry
+REQUIRED_INDEXES = [
+    {
+        # One bar per ticker per day; serves every ticker filter + date sort/range
+        "name": "ticker_date_unique",
+        "keys": [("ticker", ASCENDING), ("date", ASCENDING)],
+        "unique": True,
+    },
+    {
+        # Covers the (ticker, date, close) projection of the bulk close-price reads
+        "name": "ticker_date_close",
+        "keys": [("ticker", ASCENDING), ("date", ASCENDING), ("close", ASCENDING)],
+        "unique": False,
+    },
+]
+
+
+def ensure_indexes(collection) -> list[str]:
+    """Create any missing required index (no-op for existing ones); returns the index names."""
+    return [
+        collection.create_index(spec["keys"], name=spec["name"], unique=spec["unique"])
+        for spec in REQUIRED_INDEXES
+    ]
+
+
+def missing_indexes(collection) -> list[str]:
+    """Required indexes that are absent or whose keys / uniqueness differ."""
+    existing = collection.index_information()
+    missing = []
+    for spec in REQUIRED_INDEXES:
+        info = existing.get(spec["name"])
+        if (
+                info is None
+                or [tuple(k) for k in info["key"]] != spec["keys"]
+                or bool(info.get("unique", False)) != spec["unique"]
+        ):
+            missing.append(spec["name"])
+    return missing
+
+
+def find_duplicate_bars(collection, limit: int = 100) -> list[dict]:
+    """(ticker, date) pairs stored more than once -- these block the unique index."""
+    pipeline = [
+        {"$group": {"_id": {"ticker": "$ticker", "date": "$date"}, "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+        {"$limit": limit},
+    ]
+    return list(collection.aggregate(pipeline, allowDiskUse=True))
+
+
+def drop_duplicate_bars(collection) -> int:
+    """Keep the first stored document of each duplicated (ticker, date), delete the rest."""
+    removed = 0
+    while duplicates := find_duplicate_bars(collection, limit=10_000):
+        extra_ids = [_id for dup in duplicates for _id in sorted(dup["ids"])[1:]]
+        removed += collection.delete_many({"_id": {"$in": extra_ids}}).deleted_count
+    return removed
+
+
+def endpoint_queries(sample_ticker: str = "600000.SS") -> dict:
+    """Representative query of each read path, as (filter, projection, sort)."""
+    start, end = datetime(2010, 1, 1), datetime(2023, 12, 31)
+    return {
+        "/historical_data": (
+            price_query(sample_ticker, start, end), price_projection(["date", "close", "volume"]), None
+        ),
+        "/historical_data_bulk": (
+            price_query([sample_ticker], start, end), price_projection(["date", "close"], include_ticker=True), None
+        ),
+        "store.latest_bar": latest_bar_query(sample_ticker),
+    }
+
+
+def _plan_stages(plan: dict):
+    yield plan.get("stage")
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+def winning_plan_stages(explain: dict) -> list[str]:
+    planner = explain.get("queryPlanner", {})
+    return [stage for stage in _plan_stages(planner.get("winningPlan", {})) if stage]
+
+
+def verify_query_plans(collection, sample_ticker: str = "600000.SS") -> dict:
+    """
+    Explain every endpoint query and raise if any winning plan contains a COLLSCAN.
+    Returns {endpoint: [stages]} for inspection.
+    """
+    plans = {}
+    for endpoint, (query, projection, sort) in endpoint_queries(sample_ticker).items():
+        cursor = collection.find(query, projection)
+        if sort:
+            cursor = cursor.sort(sort).limit(1)
+        plans[endpoint] = winning_plan_stages(cursor.explain())
+    # /all_tickers reads the small `tickers` metadata collection, not the bars
+
+    scans = [endpoint for endpoint, stages in plans.items() if "COLLSCAN" in stages]
+    if scans:
+        raise RuntimeError(f"Collection scan in query plan for: {', '.join(scans)}")
+    return plans
+
+
+def bootstrap(collection, dedupe: bool = False) -> dict:
+    """Ensure indexes (optionally removing duplicate bars first), then verify query plans."""
+    if dedupe:
+        print(f"🧹 Removed {drop_duplicate_bars(collection)} duplicate bars")
+    ensure_indexes(collection)
+    return verify_query_plans(collection)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create and verify daily_prices indexes")
+    parser.add_argument("--dedupe", action="store_true", help="delete duplicate (ticker, date) bars first")
+    args = parser.parse_args()
+
+    for endpoint, stages in bootstrap(get_collection(), dedupe=args.dedupe).items():
+        print(f"✅ {endpoint}: {' <- '.join(stages)}")
@@ -1,47 +1,109 @@
-import pandas as pd
-import akshare as ak
-from src.config.settings import get_collection
+import asyncio
+import json
+import os
+from datetime import datetime
+from tqdm import tqdm
+from src.tracing import span, tracer
+from src.config.settings import BACKFILL_CHECKPOINT_PATH, TRACE_DIR
+from src.db.fetcher import FetchScheduler, RetryQueue
+from src.db.sources import AkshareSource, DataSource, bar_records
+from src.db.storage import get_store
+from src.db.writer import invalidate_api_cache
 
+BACKFILL_START = "20100101"
+CHECKPOINT_EVERY = 20  # completed tickers between checkpoint saves
 
-def upload_all():
-    collection = get_collection()
-    stock_list = ak.stock_info_a_code_name()
-    sse_stocks = stock_list[stock_list["code"].str.startswith("6")].reset_index(drop=True)
-    bulk_records = []
 
-    for i, row in sse_stocks.iterrows():
-        code, name = row["code"], row["name"]
-        ticker = f"{code}.SS"
-        if collection.find_one({"ticker": ticker}): continue
+class Checkpoint:
+    """Tickers a backfill has completely written, persisted so an interrupted run resumes after them."""
+
+    def __init__(self, path: str = BACKFILL_CHECKPOINT_PATH):
+        self.path = path
+        self.done = set()
+        self.exists = bool(path) and os.path.exists(path)
+        if self.exists:
+            with open(path, encoding="utf-8") as f:
+                self.done = set(json.load(f)["done"])
+
+
+    def mark(self, ticker: str):
+        self.done.add(ticker)
+
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"done": sorted(self.done)}, f)
+        os.replace(tmp, self.path)
+
+
+def upload_all(
+        source: DataSource = None, scheduler: FetchScheduler = None,
+        checkpoint: Checkpoint = None, start_date: str = BACKFILL_START, store=None,
+        on_write=invalidate_api_cache
+) -> dict:
+    """
+    Backfill every listed ticker that isn't checkpointed, fetching in parallel through the
+    FetchScheduler. Each ticker's bars are written by the worker that fetched them; only then
+    is the ticker checkpointed. A ticker with some bars stored but no checkpoint (a run stopped
+    mid-write) is fetched again in full; the upserts make rewriting its stored bars harmless.
+    `on_write([ticker])` follows every write, as in BulkWriter.
+
+    Without a checkpoint file (a database filled before checkpoints existed), tickers whose
+    stored history already reaches back to `start_date` count as loaded.
+    """
+    store = store or get_store()
+    source = source or AkshareSource()
+    scheduler = scheduler or FetchScheduler(retry_queue=RetryQueue())
+    checkpoint = checkpoint or Checkpoint()
+
+    if not checkpoint.exists:
+        start = datetime.strptime(start_date, "%Y%m%d")
+        checkpoint.done |= {t for t, summary in store.ticker_summary().items() if summary["first"] <= start}
+
+    listing = source.list_tickers()
+    names = dict(zip(listing["ticker"], listing["name"]))
+    # Tickers whose fetch failed last run go first
+    tickers = scheduler.retry_queue.first(t for t in listing["ticker"] if t not in checkpoint.done)
+    print(f"🚀 Backfilling {len(tickers)} tickers ({len(listing) - len(tickers)} already loaded)...")
+
+    def fetch_and_write(ticker: str) -> int:
+        with span("fetch", "fetch", ticker=ticker) as info:
+            records = bar_records(source.fetch_daily(ticker, start_date=start_date), ticker, names[ticker])
+            info["rows"] = len(records)
+        with span("write_bars", "write", bars=len(records)):
+            try:
+                store.write_bars(records)
+            finally:
+                if on_write is not None:
+                    on_write([ticker])
+        return len(records)
+
+    with tqdm(total=len(tickers), desc="Backfilling tickers") as pbar:
+        def on_result(ticker, written, error):
+            if error is not None:
+                tqdm.write(f"❌ {ticker} failed: {error}")
+            else:
+                checkpoint.mark(ticker)
+                if len(checkpoint.done) % CHECKPOINT_EVERY == 0:
+                    checkpoint.save()
+            pbar.update(1)
 
         try:
-            df = ak.stock_zh_a_hist(symbol=code, period="daily", start_date="20100101", adjust="qfq")
-            for _, r in df.iterrows():
-                bulk_records.append({
-                    "ticker": ticker,
-                    "name": name,
-                    "date": pd.to_datetime(r["日期"]),
-                    "open": float(r["开盘"]),
-                    "high": float(r["最高"]),
-                    "low": float(r["最低"]),
-                    "close": float(r["收盘"]),
-                    "volume": int(r["成交量"]),
-                    "amount": float(r["成交额"])
-                })
-
-            if len(bulk_records) >= 10_000:
-                collection.insert_many(bulk_records)
-                bulk_records.clear()
-
-        except Exception as e:
-            print(f"❌ {ticker} failed: {e}")
-
-    if bulk_records:
-        collection.insert_many(bulk_records)
+            with span("upload_all", "ingestion", tickers=len(tickers)):
+                stats = asyncio.run(scheduler.run(tickers, fetch_and_write, on_result))
+        finally:
+            checkpoint.save()
+
+    print(f"✅ Backfill done: {len(tickers) - stats['failed']} tickers written, {stats['failed']} queued for retry")
+    return stats
 
 
 if __name__ == "__main__":
     upload = False
 
     if upload:
-        upload_all()
\ No newline at end of file
+        upload_all()
+        print("🧭 Trace saved to:", tracer.dump(os.path.join(TRACE_DIR, "backfill.json")))
@@ -0,0 +1,85 @@
+from datetime import datetime
+from typing import Optional
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Parse a YYYY-MM-DD query parameter (raises ValueError on bad input)."""
+    return datetime.strptime(value, DATE_FORMAT) if value else None
+
+
+def date_filter(start_date: Optional[datetime], end_date: Optional[datetime]) -> Optional[dict]:
+    if start_date and end_date:
+        return {"$gte": start_date, "$lte": end_date}
+    elif start_date:
+        return {"$gte": start_date}
+    elif end_date:
+        return {"$lte": end_date}
+    return None
+
+
+def price_query(tickers, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> dict:
+    """Filter for one ticker (str) or several (list) over an optional date range."""
+    query = {"ticker": tickers if isinstance(tickers, str) else {"$in": list(tickers)}}
+    date_range = date_filter(start_date, end_date)
+    if date_range:
+        query["date"] = date_range
+    return query
+
+
+def price_projection(fields, include_ticker: bool = False) -> dict:
+    projection = {field: 1 for field in fields}
+    if include_ticker:
+        projection["ticker"] = 1
+    projection["date"] = 1
+    projection["_id"] = 0
+    return projection
+
+
+def latest_bar_query(ticker: str):
+    """(filter, projection, sort) of the newest bar of a ticker."""
+    return {"ticker": ticker}, {"date": 1}, [("date", -1)]
+
+
+def ticker_summary_pipeline() -> list[dict]:
+    """Aggregation yielding one {_id: ticker, first, last, name, count} document per ticker."""
+    return [
+        {"$sort": {"ticker": 1, "date": 1}},
+        {"$group": {
+            "_id": "$ticker",
+            "first": {"$first": "$date"},
+            "last": {"$last": "$date"},
+            "name": {"$last": "$name"},
+            "count": {"$sum": 1},
+        }},
+    ]
+
+
+def summary_by_ticker(docs) -> dict:
+    """{ticker: {"first", "last", "name", "count"}} from ticker summary documents."""
+    return {
+        doc["_id"]: {"first": doc["first"], "last": doc["last"], "name": doc.get("name") or "", "count": doc["count"]}
+        for doc in docs
+    }
+
+
+def ticker_filter(min_history: Optional[int] = None, active_since: Optional[datetime] = None) -> dict:
+    """Filter on the `tickers` metadata: at least `min_history` bars, and a bar on or after `active_since`."""
+    query = {}
+    if min_history:
+        query["count"] = {"$gte": min_history}
+    if active_since:
+        query["last"] = {"$gte": active_since}
+    return query
+
+
+def summary_from_meta(docs) -> dict:
+    """{ticker: {"first", "last", "name", "count", "last_updated"}} from `tickers` metadata documents."""
+    return {
+        doc["ticker"]: {
+            "first": doc["first"], "last": doc["last"], "name": doc.get("name") or "", "count": doc["count"],
+            "last_updated": doc.get("last_updated"),
+        }
+        for doc in docs
+    }
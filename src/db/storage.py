@@ -0,0 +1,656 @@
+import argparse
+import asyncio
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Iterable, Iterator, Optional
+from pymongo import ASCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from src.config.settings import (
+    STORAGE_LAYOUT, get_async_bucket_collection, get_async_collection, get_bucket_collection, get_collection
+)
+from src.db.indexes import REQUIRED_INDEXES
+from src.db.queries import (
+    latest_bar_query, price_projection, price_query, summary_by_ticker, summary_from_meta, ticker_filter,
+    ticker_summary_pipeline
+)
+
+BAR_FIELDS = ["open", "high", "low", "close", "volume", "amount"]
+BUCKET_READ_BATCH = 200  # bucket documents (~250 bars each) per cursor batch
+BUCKET_WRITE_RETRIES = 5
+TICKERS_COLLECTION = "tickers"  # per-ticker metadata of daily_prices, in the same database
+BUCKET_TICKERS_COLLECTION = "tickers_buckets"  # ... and of daily_prices_buckets
+TICKERS_INDEX = {"name": "ticker_unique", "keys": [("ticker", ASCENDING)], "unique": True}
+BUCKET_INDEX = {"name": "ticker_year_unique", "keys": [("ticker", ASCENDING), ("year", ASCENDING)], "unique": True}
+
+
+class PartialWriteError(PyMongoError):
+    """Some records of a write_bars call failed; `failed` holds exactly those, safe to write again."""
+
+    def __init__(self, failed: list[dict], errors: list):
+        super().__init__(f"{len(failed)} records failed to write: {errors[:3]}")
+        self.failed = failed
+        self.errors = errors
+
+
+def bar_upserts(records: list[dict]) -> list[UpdateOne]:
+    """Idempotent writes keyed on (ticker, date): rerunning a load never duplicates a bar."""
+    return [UpdateOne({"ticker": r["ticker"], "date": r["date"]}, {"$set": r}, upsert=True) for r in records]
+
+
+def failed_records(records: list[dict], error: BulkWriteError) -> PartialWriteError:
+    write_errors = error.details.get("writeErrors", [])
+    return PartialWriteError([records[e["index"]] for e in write_errors], write_errors)
+
+
+def flat_write_outcome(records: list[dict], upserted: Iterable[int], failed: Iterable[int]):
+    """(records stored, Counter of newly inserted bars per ticker) from bulk-write result indexes."""
+    failed = set(failed)
+    return [r for k, r in enumerate(records) if k not in failed], Counter(records[k]["ticker"] for k in upserted)
+
+
+def ticker_meta_updates(written: list[dict], inserted: Counter) -> list[UpdateOne]:
+    """
+    One upsert per ticker folding stored bars into its `tickers` metadata document. $min, $max
+    and $inc commute, so concurrent writers of a ticker compose in any order, and each update is
+    atomic on its document. Only `inserted` bars count: rewriting a stored bar leaves `count` alone.
+    """
+    spans = {}
+    for r in written:
+        span = spans.get(r["ticker"])
+        if span is None:
+            spans[r["ticker"]] = [r["date"], r["date"], r.get("name") or ""]
+        else:
+            span[0] = min(span[0], r["date"])
+            span[1] = max(span[1], r["date"])
+            span[2] = r.get("name") or span[2]
+
+    updates = []
+    for ticker, (first, last, name) in spans.items():
+        update = {
+            "$min": {"first": first},
+            "$max": {"last": last},
+            "$inc": {"count": inserted.get(ticker, 0)},
+            "$currentDate": {"last_updated": True},
+            "$set" if name else "$setOnInsert": {"name": name},
+        }
+        updates.append(UpdateOne({"ticker": ticker}, update, upsert=True))
+    return updates
+
+
+def ticker_meta_replacements(summaries: dict) -> list[ReplaceOne]:
+    """Metadata documents rebuilt from a ticker_summary aggregation."""
+    now = datetime.now(timezone.utc)
+    return [
+        ReplaceOne({"ticker": ticker}, {"ticker": ticker, **summary, "last_updated": now}, upsert=True)
+        for ticker, summary in summaries.items()
+    ]
+
+
+def flat_meta_updates(records: list[dict], result=None, error: Optional[BulkWriteError] = None) -> list[UpdateOne]:
+    """Metadata updates for a flat bulk write that returned `result` or raised `error`."""
+    if error is None:
+        upserted, failed = result.upserted_ids, ()
+    else:
+        upserted = [u["index"] for u in error.details.get("upserted", [])]
+        failed = [w["index"] for w in error.details.get("writeErrors", [])]
+    return ticker_meta_updates(*flat_write_outcome(records, upserted, failed))
+
+
+class BucketWriteOutcome:
+    """Per-bucket results of a bucketed write_bars, folded into metadata updates and the error to raise."""
+
+    def __init__(self):
+        self.written, self.inserted = [], Counter()
+        self.failed, self.errors = [], []
+
+
+    def stored(self, ticker: str, records: list[dict], added: int):
+        self.written.extend(records)
+        self.inserted[ticker] += added
+
+
+    def lost(self, ticker: str, year: int, records: list[dict], error: Exception):
+        self.failed.extend(records)
+        self.errors.append(f"{ticker}/{year}: {error}")
+
+
+    def meta_updates(self) -> list[UpdateOne]:
+        return ticker_meta_updates(self.written, self.inserted)
+
+
+    def raise_failures(self):
+        if self.failed:
+            raise PartialWriteError(self.failed, self.errors)
+
+
+class StoreLayout:
+    """
+    The I/O-free half of a price store: collections, index specs and the query / update
+    builders of one storage layout, shared by its sync and async stores.
+
+    Every write also folds its bars into the layout's metadata collection (name, first / last
+    date, bar count, last_updated per ticker), which serves the ticker listing and summary reads
+    without scanning the bars. A database that predates it is indexed on first use.
+
+    The bar write and the metadata write are separate, non-transactional bulk writes: a process
+    killed between them leaves that ticker's metadata behind its bars, and rewriting the bars
+    later doesn't recount them. `python -m src.db.storage --rebuild-tickers` (writers stopped)
+    recomputes the metadata from the bars and is the repair for that drift.
+    """
+
+    layout = None
+    meta_collection = None  # name of the metadata collection, next to the bars
+    indexes = []  # specs ({"name", "keys", "unique"}) the bars collection must carry
+
+    def __init__(self, collection, tickers=None):
+        self.collection = collection
+        self.tickers = tickers if tickers is not None else collection.database[self.meta_collection]
+        self.meta_ready = False
+
+
+    def summary_aggregation(self) -> tuple[list[dict], dict]:
+        """(pipeline, aggregate options) computing every ticker's summary from the bars."""
+        raise NotImplementedError
+
+
+    def latest_query(self, ticker: str) -> tuple[dict, dict, list]:
+        """(filter, projection, sort) of the document holding a ticker's newest bar."""
+        raise NotImplementedError
+
+
+    @staticmethod
+    def latest_from_doc(doc: Optional[dict]) -> Optional[dict]:
+        return doc
+
+
+class FlatLayout(StoreLayout):
+    """Current layout: one `daily_prices` document per ticker per day."""
+
+    layout = "flat"
+    meta_collection = TICKERS_COLLECTION
+    indexes = REQUIRED_INDEXES
+
+    def summary_aggregation(self) -> tuple[list[dict], dict]:
+        return ticker_summary_pipeline(), {"allowDiskUse": True}
+
+
+    def latest_query(self, ticker: str) -> tuple[dict, dict, list]:
+        query, projection, sort = latest_bar_query(ticker)
+        return query, {**projection, "name": 1}, sort
+
+
+    @staticmethod
+    def find_args(tickers, start_date=None, end_date=None, fields=("date", "close"), include_ticker=False):
+        return price_query(tickers, start_date, end_date), price_projection(fields, include_ticker=include_ticker)
+
+
+class BucketLayout(StoreLayout):
+    """
+    Bucketed layout: one `daily_prices_buckets` document per ticker per calendar year,
+    holding date-sorted parallel arrays {date: [...], open: [...], ..., amount: [...]}.
+    A full-history read of the SSE universe touches ~30k documents instead of ~7M.
+    """
+
+    layout = "bucket"
+    meta_collection = BUCKET_TICKERS_COLLECTION
+    indexes = [BUCKET_INDEX]
+
+    @staticmethod
+    def bucket_query(tickers, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> dict:
+        query = {"ticker": tickers if isinstance(tickers, str) else {"$in": list(tickers)}}
+        years = {}
+        if start_date:
+            years["$gte"] = start_date.year
+        if end_date:
+            years["$lte"] = end_date.year
+        if years:
+            query["year"] = years
+        return query
+
+
+    @staticmethod
+    def bucket_projection(fields) -> dict:
+        projection = {f: 1 for f in fields if f != "name"}
+        projection.update({"ticker": 1, "date": 1, "name": 1, "_id": 0})
+        return projection
+
+
+    @staticmethod
+    def expand(bucket: dict, fields, start_date=None, end_date=None, include_ticker=False) -> Iterator[dict]:
+        """Unpack one bucket into flat bar rows, restricted to [start_date, end_date]."""
+        dates = bucket["date"]
+        lo = bisect_left(dates, start_date) if start_date else 0
+        hi = bisect_right(dates, end_date) if end_date else len(dates)
+        columns = [f for f in fields if f in bucket and f not in ("ticker", "date", "name")]
+        with_name = "name" in fields
+
+        for k in range(lo, hi):
+            row = {"ticker": bucket["ticker"]} if include_ticker else {}
+            if with_name:
+                row["name"] = bucket.get("name", "")
+            row["date"] = dates[k]
+            for f in columns:
+                row[f] = bucket[f][k]
+            yield row
+
+
+    def latest_query(self, ticker: str) -> tuple[dict, dict, list]:
+        return {"ticker": ticker}, {"last": 1, "name": 1}, [("year", -1)]
+
+
+    @staticmethod
+    def latest_from_doc(bucket: Optional[dict]) -> Optional[dict]:
+        if not bucket:
+            return None
+        return {"date": bucket["last"], "name": bucket.get("name", "")}
+
+
+    @staticmethod
+    def summary_pipeline() -> list[dict]:
+        """Per-ticker summary folded from the buckets' first / last / count header fields."""
+        return [
+            {"$sort": {"ticker": 1, "year": 1}},
+            {"$group": {
+                "_id": "$ticker",
+                "first": {"$first": "$first"},
+                "last": {"$last": "$last"},
+                "name": {"$last": "$name"},
+                "count": {"$sum": "$count"},
+            }},
+        ]
+
+
+    def summary_aggregation(self) -> tuple[list[dict], dict]:
+        return self.summary_pipeline(), {}
+
+
+    @staticmethod
+    def build_bucket(ticker: str, year: int, bars: dict, name: str = "") -> dict:
+        """Bucket document from {date: bar} (bars keyed by date, any order)."""
+        dates = sorted(bars)
+        bucket = {
+            "ticker": ticker,
+            "year": year,
+            "name": name,
+            "first": dates[0],
+            "last": dates[-1],
+            "count": len(dates),
+            "date": dates,
+        }
+        for f in BAR_FIELDS:
+            bucket[f] = [bars[d].get(f) for d in dates]
+        return bucket
+
+
+    @classmethod
+    def merged_bucket(cls, ticker: str, year: int, existing: Optional[dict], records: list[dict]) -> dict:
+        """New version of a bucket with `records` merged in (a rewritten bar replaces the stored one)."""
+        bars = {}
+        name = ""
+        if existing:
+            name = existing.get("name", "")
+            for k, d in enumerate(existing["date"]):
+                bars[d] = {f: existing[f][k] for f in BAR_FIELDS if f in existing}
+        for r in records:
+            bars[r["date"]] = {f: r.get(f) for f in BAR_FIELDS}
+            name = r.get("name") or name
+
+        bucket = cls.build_bucket(ticker, year, bars, name)
+        bucket["version"] = (existing.get("version", 0) if existing else 0) + 1
+        return bucket
+
+
+    @staticmethod
+    def version_filter(existing: dict) -> dict:
+        """Matches `existing` only while no other writer has replaced it (optimistic concurrency)."""
+        return {"_id": existing["_id"], "version": existing.get("version", 0)}
+
+
+    @staticmethod
+    def group_by_bucket(records: list[dict]) -> dict:
+        groups = defaultdict(list)
+        for r in records:
+            groups[(r["ticker"], r["date"].year)].append(r)
+        return groups
+
+
+class SyncStore(StoreLayout):
+    """Index, lookup and metadata I/O of either layout on the sync driver."""
+
+    def __init__(self, collection, tickers=None):
+        super().__init__(collection, tickers)
+        self.meta_lock = Lock()
+
+
+    def ensure_indexes(self):
+        return [
+            self.collection.create_index(spec["keys"], name=spec["name"], unique=spec["unique"])
+            for spec in self.indexes
+        ] + [self.tickers.create_index(TICKERS_INDEX["keys"], name=TICKERS_INDEX["name"], unique=True)]
+
+
+    def latest_bar(self, ticker: str) -> Optional[dict]:
+        """Newest bar of a ticker as {"date", "name"}, or None if the ticker has no data."""
+        query, projection, sort = self.latest_query(ticker)
+        return self.latest_from_doc(self.collection.find_one(query, projection, sort=sort))
+
+
+    def has_ticker(self, ticker: str) -> bool:
+        return self.collection.find_one({"ticker": ticker}, {"_id": 1}) is not None
+
+
+    def _bootstrap_meta(self):
+        """Build the metadata of a database that predates it; callers wait for a rebuild in progress."""
+        if self.meta_ready:
+            return
+        with self.meta_lock:
+            if self.meta_ready:
+                return
+            if self.tickers.find_one({}, {"_id": 1}) is None and self.collection.find_one({}, {"_id": 1}) is not None:
+                self.rebuild_ticker_meta()
+            self.meta_ready = True  # only once it succeeded: a failed rebuild is retried by the next call
+
+
+    def rebuild_ticker_meta(self) -> int:
+        """Recompute every ticker's metadata from the bars (one aggregation); a repair, run with writers stopped."""
+        pipeline, options = self.summary_aggregation()
+        summaries = summary_by_ticker(self.collection.aggregate(pipeline, **options))
+        if summaries:
+            self.tickers.bulk_write(ticker_meta_replacements(summaries), ordered=False)
+        self.tickers.delete_many({"ticker": {"$nin": list(summaries)}})
+        return len(summaries)
+
+
+    def list_tickers(self, min_history: Optional[int] = None, active_since: Optional[datetime] = None) -> list[str]:
+        """Sorted tickers with at least `min_history` bars and a bar on or after `active_since`."""
+        self._bootstrap_meta()
+        docs = self.tickers.find(ticker_filter(min_history, active_since), {"ticker": 1, "_id": 0})
+        return sorted(doc["ticker"] for doc in docs)
+
+
+    def ticker_summary(self) -> dict:
+        """{ticker: {"first", "last", "name", "count", "last_updated"}} for every stored ticker."""
+        self._bootstrap_meta()
+        return summary_from_meta(self.tickers.find({}, {"_id": 0}))
+
+
+class AsyncStore(StoreLayout):
+    """SyncStore on the async driver, for the API's event loop."""
+
+    def __init__(self, collection, tickers=None):
+        super().__init__(collection, tickers)
+        self.meta_lock = asyncio.Lock()
+
+
+    async def ensure_indexes(self):
+        return [
+            await self.collection.create_index(spec["keys"], name=spec["name"], unique=spec["unique"])
+            for spec in self.indexes
+        ] + [await self.tickers.create_index(TICKERS_INDEX["keys"], name=TICKERS_INDEX["name"], unique=True)]
+
+
+    async def latest_bar(self, ticker: str) -> Optional[dict]:
+        query, projection, sort = self.latest_query(ticker)
+        return self.latest_from_doc(await self.collection.find_one(query, projection, sort=sort))
+
+
+    async def has_ticker(self, ticker: str) -> bool:
+        return await self.collection.find_one({"ticker": ticker}, {"_id": 1}) is not None
+
+
+    async def _bootstrap_meta(self):
+        if self.meta_ready:
+            return
+        async with self.meta_lock:  # concurrent requests wait for one rebuild instead of reading a partial one
+            if self.meta_ready:
+                return
+            if await self.tickers.find_one({}, {"_id": 1}) is None and \
+                    await self.collection.find_one({}, {"_id": 1}) is not None:
+                await self.rebuild_ticker_meta()
+            self.meta_ready = True
+
+
+    async def rebuild_ticker_meta(self) -> int:
+        pipeline, options = self.summary_aggregation()
+        cursor = await self.collection.aggregate(pipeline, **options)
+        summaries = summary_by_ticker(await cursor.to_list())
+        if summaries:
+            await self.tickers.bulk_write(ticker_meta_replacements(summaries), ordered=False)
+        await self.tickers.delete_many({"ticker": {"$nin": list(summaries)}})
+        return len(summaries)
+
+
+    async def list_tickers(
+            self, min_history: Optional[int] = None, active_since: Optional[datetime] = None
+    ) -> list[str]:
+        await self._bootstrap_meta()
+        cursor = self.tickers.find(ticker_filter(min_history, active_since), {"ticker": 1, "_id": 0})
+        return sorted([doc["ticker"] async for doc in cursor])
+
+
+    async def ticker_summary(self) -> dict:
+        await self._bootstrap_meta()
+        return summary_from_meta(await self.tickers.find({}, {"_id": 0}).to_list())
+
+
+class FlatStore(FlatLayout, SyncStore):
+    def find_bars(
+            self, tickers, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+            fields: Iterable[str] = ("date", "close"), include_ticker: bool = False, batch_size: int = 0
+    ) -> Iterator[dict]:
+        query, projection = self.find_args(tickers, start_date, end_date, fields, include_ticker)
+        return self.collection.find(query, projection, batch_size=batch_size)
+
+
+    def write_bars(self, records: list[dict]):
+        """Upsert bars on (ticker, date); raises PartialWriteError listing only the records that failed."""
+        if not records:
+            return
+        self._bootstrap_meta()
+        try:
+            result, error = self.collection.bulk_write(bar_upserts(records), ordered=False), None
+        except BulkWriteError as e:
+            result, error = None, e
+
+        updates = flat_meta_updates(records, result, error)
+        if updates:
+            self.tickers.bulk_write(updates, ordered=False)
+        if error is not None:
+            raise failed_records(records, error) from error
+
+
+class BucketStore(BucketLayout, SyncStore):
+    def find_bars(
+            self, tickers, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+            fields: Iterable[str] = ("date", "close"), include_ticker: bool = False, batch_size: int = 0
+    ) -> Iterator[dict]:
+        fields = list(fields)
+        cursor = self.collection.find(
+            self.bucket_query(tickers, start_date, end_date), self.bucket_projection(fields),
+            batch_size=BUCKET_READ_BATCH
+        ).sort([("ticker", ASCENDING), ("year", ASCENDING)])
+
+        for bucket in cursor:
+            yield from self.expand(bucket, fields, start_date, end_date, include_ticker)
+
+
+    def _merge_bucket(self, ticker: str, year: int, records: list[dict]) -> int:
+        """Read-merge-replace one bucket, retrying if another writer changed it in between; returns bars added."""
+        for _ in range(BUCKET_WRITE_RETRIES):
+            existing = self.collection.find_one({"ticker": ticker, "year": year})
+            bucket = self.merged_bucket(ticker, year, existing, records)
+            try:
+                if existing:
+                    if self.collection.replace_one(self.version_filter(existing), bucket).matched_count:
+                        return bucket["count"] - existing.get("count", 0)
+                else:
+                    self.collection.insert_one(bucket)
+                    return bucket["count"]
+            except DuplicateKeyError:
+                pass  # a concurrent writer created the bucket first
+        raise RuntimeError(f"Bucket {ticker}/{year} kept changing under concurrent writes")
+
+
+    def write_bars(self, records: list[dict]):
+        """Merge flat bar records into their buckets; rewriting an existing bar replaces it.
+        Buckets that could not be written are reported together in one PartialWriteError."""
+        self._bootstrap_meta()
+        outcome = BucketWriteOutcome()
+        for (ticker, year), group in self.group_by_bucket(records).items():
+            try:
+                outcome.stored(ticker, group, self._merge_bucket(ticker, year, group))
+            except (PyMongoError, RuntimeError) as e:
+                outcome.lost(ticker, year, group, e)
+
+        updates = outcome.meta_updates()
+        if updates:
+            self.tickers.bulk_write(updates, ordered=False)
+        outcome.raise_failures()
+
+
+class AsyncFlatStore(FlatLayout, AsyncStore):
+    def find_bars(
+            self, tickers, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+            fields: Iterable[str] = ("date", "close"), include_ticker: bool = False, batch_size: int = 0
+    ):
+        """Async iterator over the matching bars."""
+        query, projection = self.find_args(tickers, start_date, end_date, fields, include_ticker)
+        return self.collection.find(query, projection, batch_size=batch_size)
+
+
+    async def write_bars(self, records: list[dict]):
+        if not records:
+            return
+        await self._bootstrap_meta()
+        try:
+            result, error = await self.collection.bulk_write(bar_upserts(records), ordered=False), None
+        except BulkWriteError as e:
+            result, error = None, e
+
+        updates = flat_meta_updates(records, result, error)
+        if updates:
+            await self.tickers.bulk_write(updates, ordered=False)
+        if error is not None:
+            raise failed_records(records, error) from error
+
+
+class AsyncBucketStore(BucketLayout, AsyncStore):
+    async def find_bars(
+            self, tickers, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+            fields: Iterable[str] = ("date", "close"), include_ticker: bool = False, batch_size: int = 0
+    ):
+        fields = list(fields)
+        cursor = self.collection.find(
+            self.bucket_query(tickers, start_date, end_date), self.bucket_projection(fields),
+            batch_size=BUCKET_READ_BATCH
+        ).sort([("ticker", ASCENDING), ("year", ASCENDING)])
+
+        async for bucket in cursor:
+            for row in self.expand(bucket, fields, start_date, end_date, include_ticker):
+                yield row
+
+
+    async def _merge_bucket(self, ticker: str, year: int, records: list[dict]) -> int:
+        for _ in range(BUCKET_WRITE_RETRIES):
+            existing = await self.collection.find_one({"ticker": ticker, "year": year})
+            bucket = self.merged_bucket(ticker, year, existing, records)
+            try:
+                if existing:
+                    if (await self.collection.replace_one(self.version_filter(existing), bucket)).matched_count:
+                        return bucket["count"] - existing.get("count", 0)
+                else:
+                    await self.collection.insert_one(bucket)
+                    return bucket["count"]
+            except DuplicateKeyError:
+                pass
+        raise RuntimeError(f"Bucket {ticker}/{year} kept changing under concurrent writes")
+
+
+    async def write_bars(self, records: list[dict]):
+        await self._bootstrap_meta()
+        outcome = BucketWriteOutcome()
+        for (ticker, year), group in self.group_by_bucket(records).items():
+            try:
+                outcome.stored(ticker, group, await self._merge_bucket(ticker, year, group))
+            except (PyMongoError, RuntimeError) as e:
+                outcome.lost(ticker, year, group, e)
+
+        updates = outcome.meta_updates()
+        if updates:
+            await self.tickers.bulk_write(updates, ordered=False)
+        outcome.raise_failures()
+
+
+def migrate_to_buckets(source, target, overwrite: bool = False) -> int:
+    """
+    Copy the flat `daily_prices` layout into per-ticker-year buckets; returns buckets written.
+    A rerun resumes: a ticker counts as migrated only once its buckets hold as many bars as
+    it has distinct dates in `source`, so one interrupted partway through is copied again.
+    """
+    store = BucketStore(target)
+    store.ensure_indexes()
+    source_counts = {
+        doc["_id"]: doc["count"] for doc in source.aggregate([
+            {"$group": {"_id": {"ticker": "$ticker", "date": "$date"}}},
+            {"$group": {"_id": "$_id.ticker", "count": {"$sum": 1}}},
+        ], allowDiskUse=True)
+    }
+    migrated = {} if overwrite else {
+        doc["_id"]: doc["count"]
+        for doc in target.aggregate([{"$group": {"_id": "$ticker", "count": {"$sum": "$count"}}}])
+    }
+    written = 0
+
+    for ticker in sorted(source_counts):
+        if migrated.get(ticker) == source_counts[ticker]:
+            continue
+
+        by_year = defaultdict(dict)
+        name = ""
+        for doc in source.find({"ticker": ticker}, {"_id": 0}).sort("date", ASCENDING):
+            by_year[doc["date"].year].setdefault(doc["date"], doc)  # first copy of a duplicated bar wins
+            name = doc.get("name") or name
+
+        buckets = [store.build_bucket(ticker, year, bars, name) for year, bars in sorted(by_year.items())]
+        for bucket in buckets:
+            bucket["version"] = 1
+            target.replace_one({"ticker": ticker, "year": bucket["year"]}, bucket, upsert=True)
+        written += len(buckets)
+        print(f"✅ {ticker}: {len(buckets)} buckets")
+
+    store.rebuild_ticker_meta()  # the buckets were written directly, bypassing write_bars
+    return written
+
+
+def get_store(use_yfinance=False, layout: str = STORAGE_LAYOUT):
+    """Price store for the configured layout (STORAGE_LAYOUT env var)."""
+    if layout == "bucket":
+        return BucketStore(get_bucket_collection(use_yfinance))
+    if layout == "flat":
+        return FlatStore(get_collection(use_yfinance))
+    raise ValueError(f"Unknown storage layout: {layout}")
+
+
+def get_async_store(use_yfinance=False, layout: str = STORAGE_LAYOUT):
+    """Async price store (one pooled AsyncMongoClient per process) for the configured layout."""
+    if layout == "bucket":
+        return AsyncBucketStore(get_async_bucket_collection(use_yfinance))
+    if layout == "flat":
+        return AsyncFlatStore(get_async_collection(use_yfinance))
+    raise ValueError(f"Unknown storage layout: {layout}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate daily_prices to buckets, or repair the tickers metadata")
+    parser.add_argument("--rebuild-tickers", action="store_true",
+                        help="recompute the configured layout's tickers metadata from its bars instead "
+                             "(repairs drift left by a write interrupted between bars and metadata)")
+    args = parser.parse_args()
+
+    if args.rebuild_tickers:
+        print(f"✅ Ticker metadata rebuilt for {get_store().rebuild_ticker_meta()} tickers")
+    else:
+        migrated = migrate_to_buckets(get_collection(), get_bucket_collection())
+        print(f"✅ Migration done: {migrated} buckets written")
@@ -1,122 +1,79 @@
+import asyncio
+import os
 import pandas as pd
-import akshare as ak
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from queue import Queue
-from threading import Thread
 from tqdm import tqdm
-from src.config.settings import get_collection
-
-# Constants
-INSERT_BATCH_SIZE = 5000
-INSERT_WORKER_DELAY = 0.5  # seconds
-MAX_WORKERS = 10
-
-# Shared queue for passing records between threads
-record_queue = Queue()
-collection = get_collection()
-
-
-def update_ticker_to_queue(ticker: str) -> str:
-    code = ticker.split(".")[0]
-    name_doc = collection.find_one({"ticker": ticker}, {"name": 1})
-    name = name_doc.get("name", "") if name_doc else ""
-
-    latest_doc = collection.find_one(
-        {"ticker": ticker},
-        sort=[("date", -1)],
-        projection={"date": 1}
-    )
-
-    if not latest_doc:
-        return f"⚠️ {ticker}: no existing data, skipping"
-
-    latest_date = latest_doc["date"].strftime("%Y%m%d")
+from src.tracing import span, tracer
+from src.config.settings import TRACE_DIR
+from src.db.fetcher import FetchScheduler, RetryQueue
+from src.db.sources import AkshareSource, DataSource, bar_records
+from src.db.storage import get_store
+from src.db.writer import BulkWriter
+
+
+def fetch_new_bars(source: DataSource, ticker: str, summary: dict) -> list[dict]:
+    """Bars after the ticker's stored latest date (`summary` from store.ticker_summary); raises on fetch errors."""
+    last_date = summary["last"]
+    df = source.fetch_daily(ticker, start_date=last_date.strftime("%Y%m%d"))
+    df = df[df["date"] > pd.Timestamp(last_date.strftime("%Y-%m-%d"))]
+    return bar_records(df, ticker, summary["name"])
+
+
+def update_all_insert(
+        source: DataSource = None, scheduler: FetchScheduler = None, writer: BulkWriter = None, store=None
+):
+    store = store or get_store()
+    source = source or AkshareSource()
+    scheduler = scheduler or FetchScheduler(retry_queue=RetryQueue())
+    writer = writer or BulkWriter(store)
+
+    # Latest date, name and bar count of every ticker from the `tickers` metadata, before fanning out
+    with span("ticker_summary", "ingestion") as info:
+        summaries = store.ticker_summary()
+        info["tickers"] = len(summaries)
     today = datetime.today().strftime("%Y%m%d")
-
-    if latest_date >= today:
-        return f"⏩ {ticker} is already up-to-date"
-
-    try:
-        df = ak.stock_zh_a_hist(
-            symbol=code,
-            period="daily",
-            start_date=latest_date,
-            adjust="qfq"
-        )
-        df = df[pd.to_datetime(df["日期"]) > latest_doc["date"].strftime("%Y-%m-%d")]
-
-        if df.empty:
-            return f"✅ {ticker}: no new data"
-
-        records = []
-        for _, r in df.iterrows():
-            records.append({
-                "ticker": ticker,
-                "name": name,
-                "date": pd.to_datetime(r["日期"]),
-                "open": float(r["开盘"]),
-                "high": float(r["最高"]),
-                "low": float(r["最低"]),
-                "close": float(r["收盘"]),
-                "volume": int(r["成交量"]),
-                "amount": float(r["成交额"]),
-            })
-
-        record_queue.put(records)
-        return f"✅ {ticker}: {len(records)} rows fetched"
-
-    except Exception as e:
-        return f"❌ {ticker} error: {e}"
-
-
-def mongo_insert_worker():
-    buffer = []
-    while True:
-        records = record_queue.get()
-        if records == "STOP":
-            break
-
-        buffer.extend(records)
-
-        if len(buffer) >= INSERT_BATCH_SIZE:
-            try:
-                collection.insert_many(buffer, ordered=False)
-                buffer.clear()
-            except Exception as e:
-                print(f"❌ Bulk insert failed: {e}")
-                buffer.clear()
-
-    # Insert remaining records
-    if buffer:
-        try:
-            collection.insert_many(buffer, ordered=False)
-            print(f"📝 Final flush: Inserted {len(buffer)} records")
-        except Exception as e:
-            print(f"❌ Final insert failed: {e}")
-
-
-def update_all_insert():
-    tickers = collection.distinct("ticker")
-    print(f"🚀 Starting threaded update for {len(tickers)} tickers...")
-
-    # Start insert worker thread
-    insert_thread = Thread(target=mongo_insert_worker)
-    insert_thread.start()
-
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {executor.submit(update_ticker_to_queue, ticker): ticker for ticker in tickers}
-        with tqdm(total=len(tickers), desc="Updating tickers") as pbar:
-            for future in as_completed(futures):
-                result = future.result()
-                tqdm.write(result)
-                pbar.update(1)
-
-    # Stop the insert worker
-    record_queue.put("STOP")
-    insert_thread.join()
+    # Tickers that failed last run first, then the furthest behind, so an interrupted run has
+    # closed the largest gaps
+    tickers = scheduler.retry_queue.first(sorted(
+        (t for t in summaries if summaries[t]["last"].strftime("%Y%m%d") < today),
+        key=lambda t: (summaries[t]["last"], t)
+    ))
+    print(f"⏩ {len(summaries) - len(tickers)} tickers already up-to-date")
+    print(f"🚀 Starting update for {len(tickers)} tickers "
+          f"({sum(s['count'] for s in summaries.values())} stored bars, "
+          f"{sum(t in scheduler.retry_queue for t in tickers)} retried from the last run)...")
+
+    def fetch_and_queue(ticker: str) -> int:
+        # Runs on a fetch thread: a full writer queue blocks here, throttling the fetchers
+        with span("fetch", "fetch", ticker=ticker) as info:
+            records = fetch_new_bars(source, ticker, summaries[ticker])
+            info["rows"] = len(records)
+        with span("queue_put", "write", rows=len(records)):
+            writer.put(records)
+        return len(records)
+
+    with writer, tqdm(total=len(tickers), desc="Updating tickers") as pbar:
+        def on_result(ticker, n_rows, error):
+            if error is not None:
+                tqdm.write(f"❌ {ticker} error: {error}")
+            elif n_rows:
+                tqdm.write(f"✅ {ticker}: {n_rows} rows fetched")
+            else:
+                tqdm.write(f"✅ {ticker}: no new data")
+            pbar.update(1)
+
+        with span("update_all_insert", "ingestion", tickers=len(tickers)):
+            stats = asyncio.run(scheduler.run(tickers, fetch_and_queue, on_result))
+
+    print(f"📝 {writer.stats['written']} bars written in {writer.stats['batches']} batches, "
+          f"{writer.stats['failed']} failed")
+    print(f"📊 {stats['calls']} calls, {stats['errors']} errors, {stats['retried']} retries, "
+          f"final concurrency {stats['concurrency']}")
+    if stats["failed"]:
+        print(f"⚠️ {stats['failed']} tickers queued for retry in {scheduler.retry_queue.path}")
     print("✅ All done.")
 
 
 if __name__ == "__main__":
     update_all_insert()
+    print("🧭 Trace saved to:", tracer.dump(os.path.join(TRACE_DIR, "update.json")))
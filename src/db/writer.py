@@ -0,0 +1,172 @@
+import time
+from queue import Empty, Queue
+from threading import Lock, Thread
+import requests
+from pymongo.errors import PyMongoError
+from src.tracing import span
+from src.config import settings
+from src.db.storage import PartialWriteError
+
+WRITE_BATCH_SIZE = 5000  # bars per bulk write
+WRITE_FLUSH_INTERVAL = 0.5  # seconds a buffered bar may wait before it is flushed anyway
+WRITE_QUEUE_SIZE = 64  # record lists waiting for a writer; put() blocks beyond this
+WRITER_THREADS = 2
+WRITE_RETRIES = 3
+WRITE_RETRY_DELAY = 0.5  # seconds, doubled on every retry
+
+_STOP = object()
+
+
+_invalidation_warned = False
+
+
+def invalidate_api_cache(tickers, url: str = None):
+    """
+    Tell the API to drop cached responses holding `tickers` (at API_CACHE_INVALIDATE_URL by
+    default). An unreachable API only gets one warning per process: ingestion goes on, and the
+    API's TTL bounds how long it may serve the old bars.
+    """
+    global _invalidation_warned
+    url = settings.API_CACHE_INVALIDATE_URL if url is None else url
+    if not url:
+        return
+    headers = {"X-Cache-Token": settings.API_CACHE_TOKEN} if settings.API_CACHE_TOKEN else {}
+    try:
+        requests.post(url, json={"tickers": sorted(tickers)}, headers=headers, timeout=5).raise_for_status()
+    except requests.RequestException as e:
+        if not _invalidation_warned:
+            _invalidation_warned = True
+            print(f"⚠️ API cache invalidation at {url} failed ({e}); further failures are not reported")
+
+
+class BulkWriter:
+    """
+    Background writers between the fetchers and the store.
+
+    Fetchers `put` lists of bar records onto a bounded queue (blocking when it is full, so
+    fetching can't outrun Mongo). Each writer thread buffers records and flushes them with
+    `store.write_bars` once WRITE_BATCH_SIZE bars are buffered or the oldest buffered bar is
+    WRITE_FLUSH_INTERVAL old. Writes are (ticker, date) upserts, so a retry only resubmits
+    the records the store reported as failed and never duplicates a bar.
+
+        with BulkWriter(store) as writer:
+            writer.put(records)
+
+    After every batch, `on_write(tickers)` gets the tickers it touched (written or not, as a
+    failed batch may still have stored part of them); by default that invalidates them in the
+    API's result cache.
+    """
+
+    def __init__(
+            self, store, n_threads: int = WRITER_THREADS, batch_size: int = WRITE_BATCH_SIZE,
+            flush_interval: float = WRITE_FLUSH_INTERVAL, max_queue: int = WRITE_QUEUE_SIZE,
+            retries: int = WRITE_RETRIES, retry_delay: float = WRITE_RETRY_DELAY, on_write=invalidate_api_cache
+    ):
+        self.store = store
+        self.on_write = on_write
+        self.n_threads = n_threads
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.queue = Queue(maxsize=max_queue)
+        self.threads = []
+        self.lock = Lock()
+        self.stats = {"written": 0, "batches": 0, "retried": 0, "failed": 0}
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+    def start(self):
+        self.threads = [Thread(target=self._run, name=f"bulk-writer-{k}", daemon=True) for k in range(self.n_threads)]
+        for thread in self.threads:
+            thread.start()
+
+
+    def put(self, records: list[dict]):
+        """Queue records for writing; blocks while the queue is full."""
+        if records:
+            self.queue.put(records)
+
+
+    def close(self) -> dict:
+        """Flush everything still queued or buffered, stop the writer threads and return the stats."""
+        for _ in self.threads:
+            self.queue.put(_STOP)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        return self.stats
+
+
+    def _count(self, key: str, n: int):
+        with self.lock:
+            self.stats[key] += n
+
+
+    def _run(self):
+        buffer = []
+        oldest = None
+        while True:
+            timeout = None if oldest is None else max(0.0, oldest + self.flush_interval - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except Empty:
+                item = None
+
+            if item is _STOP:
+                break
+            if item is not None:
+                if not buffer:
+                    oldest = time.monotonic()
+                buffer.extend(item)
+
+            if buffer and (len(buffer) >= self.batch_size or time.monotonic() - oldest >= self.flush_interval):
+                self._flush(buffer)
+                buffer, oldest = [], None
+
+        if buffer:
+            self._flush(buffer)
+
+
+    def _flush(self, records: list[dict]):
+        for start in range(0, len(records), self.batch_size):
+            batch = records[start:start + self.batch_size]
+            try:
+                with span("write_bars", "write", bars=len(batch)):
+                    self._write(batch)
+            except Exception as e:  # not a database error: retrying won't help, but keep the thread alive
+                self._count("failed", len(batch))
+                print(f"❌ Bulk write of {len(batch)} bars failed: {e}")
+            if self.on_write is not None:
+                self.on_write({record["ticker"] for record in batch})
+
+
+    def _write(self, batch: list[dict]):
+        pending = batch
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count("retried", len(pending))
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            try:
+                self.store.write_bars(pending)
+                break
+            except PartialWriteError as e:
+                pending, error = e.failed, e  # only the failed sub-batch goes round again
+            except PyMongoError as e:
+                error = e  # whole batch unacknowledged; upserts make resending it safe
+        else:
+            self._count("written", len(batch) - len(pending))
+            self._count("failed", len(pending))
+            print(f"❌ Bulk write gave up on {len(pending)} of {len(batch)} bars: {error}")
+            return
+
+        self._count("written", len(batch))
+        self._count("batches", 1)
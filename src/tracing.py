@@ -0,0 +1,123 @@
+"""
+Structured timing and memory spans for the ingestion and analysis stages.
+
+    with span("correlation", "stage") as info:
+        ...
+        info["rows"] = n  # extra fields land in the span's args
+    tracer.dump(path)
+
+Every span records wall time, the thread's CPU time, and resident memory before and after
+(plus the process peak), and `dump` writes them in the Chrome trace-event format: open the
+file in https://ui.perfetto.dev or chrome://tracing to see stages and worker threads on a
+timeline. Standard library only, and outside both packages: the analysis stages (run from
+src/) import it as `tracing`, the db package (run from the repo root) as `src.tracing`, and
+it registers itself under both names so a process mixing the two still has one tracer.
+
+Spans are recorded in the process that runs them. Spans opened inside ProcessPoolExecutor
+workers (e.g. the mean-reversion pair pool) stay in the worker's copy and are lost; only the
+parent's span around the whole pool reaches the trace.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MB = 1 << 20
+
+
+def rss_bytes() -> int:
+    """Current resident set size; 0 where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def peak_rss_bytes() -> int:
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024  # bytes on macOS, KiB on Linux
+
+
+class Tracer:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args):
+        rss_before = rss_bytes()
+        cpu = time.thread_time()
+        started = time.perf_counter()
+        try:
+            yield args
+        finally:
+            elapsed = time.perf_counter() - started
+            rss_after = rss_bytes()
+            args.update({
+                "cpu_s": round(time.thread_time() - cpu, 6),
+                "rss_mb": round(rss_after / MB, 1),
+                "rss_delta_mb": round((rss_after - rss_before) / MB, 1),
+                "peak_rss_mb": round(peak_rss_bytes() / MB, 1),
+            })
+            event = {
+                "name": name, "cat": category, "ph": "X",
+                "ts": round((started - self.origin) * 1e6), "dur": round(elapsed * 1e6),
+                "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+            }
+            with self.lock:
+                self.events.append(event)
+
+
+    def summary(self) -> dict:
+        """{span name: {count, seconds, cpu_s, max_rss_delta_mb}} over every recorded span."""
+        totals = {}
+        with self.lock:
+            events = list(self.events)
+        for event in events:
+            entry = totals.setdefault(
+                event["name"], {"count": 0, "seconds": 0.0, "cpu_s": 0.0, "max_rss_delta_mb": 0.0}
+            )
+            entry["count"] += 1
+            entry["seconds"] += event["dur"] / 1e6
+            entry["cpu_s"] += event["args"]["cpu_s"]
+            entry["max_rss_delta_mb"] = max(entry["max_rss_delta_mb"], event["args"]["rss_delta_mb"])
+        return totals
+
+
+    def dump(self, path: str) -> str:
+        """Write the spans recorded so far as a trace-event JSON file (atomically) and return its path."""
+        with self.lock:
+            events = list(self.events)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+        os.replace(tmp, path)
+        return path
+
+
+    def reset(self):
+        with self.lock:
+            self.events = []
+
+
+# Process-wide tracer: stages and worker threads of one run share a timeline
+tracer = Tracer()
+span = tracer.span
+
+# Whichever name imported this file first, the other one now finds the same module
+for _name in ("tracing", "src.tracing"):
+    sys.modules.setdefault(_name, sys.modules[__name__])
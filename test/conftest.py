@@ -0,0 +1,104 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# analysis modules import each other as `analysis.*` (they run from src/)
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+
+@pytest.fixture
+def mongo_db():
+    """Fresh in-memory mongomock database usable by the stores' bulk writes."""
+    pytest.importorskip("mongomock")
+    from src.db.in_memory import in_memory_client
+    return in_memory_client().db
+
+
+class FakePriceStore:
+    """In-memory stand-in for the async price store, counting the queries that reach it."""
+
+    def __init__(self, bars):
+        self.bars = list(bars)
+        self.queries = 0
+
+
+    async def find_bars(self, tickers, start_date=None, end_date=None, fields=("date", "close"),
+                        include_ticker=False, batch_size=0):
+        self.queries += 1
+        tickers = {tickers} if isinstance(tickers, str) else set(tickers)
+        for bar in sorted(self.bars, key=lambda b: (b["ticker"], b["date"])):
+            if bar["ticker"] in tickers and (start_date is None or bar["date"] >= start_date) \
+                    and (end_date is None or bar["date"] <= end_date):
+                row = {f: bar[f] for f in fields}
+                if include_ticker:
+                    row["ticker"] = bar["ticker"]
+                yield row
+
+
+    async def write_bars(self, records):
+        self.bars.extend(records)
+
+
+@pytest.fixture
+def api_client(monkeypatch):
+    """Factory of (TestClient, store): the API over a FakePriceStore holding `bars`, with an empty result cache."""
+    from fastapi.testclient import TestClient
+    import src.api.main as api
+    from src.api.cache import ResultCache
+
+    def make(bars, **client_kwargs):
+        store = FakePriceStore(bars)
+        monkeypatch.setattr(api, "store", store)
+        monkeypatch.setattr(api, "cache", ResultCache(1 << 20, 1 << 20))
+        return TestClient(api.app, **client_kwargs), store
+    return make
+
+
+@pytest.fixture(autouse=True)
+def no_api_cache_invalidation(monkeypatch):
+    """Ingestion under test must not POST invalidations to whatever API runs on this machine."""
+    settings = sys.modules.get("src.config.settings")
+    if settings is not None:
+        monkeypatch.setattr(settings, "API_CACHE_INVALIDATE_URL", "")
+
+
+@pytest.fixture
+def random_walk_prices():
+    """Factory of date × ticker random-walk closes with a late listing (column 1) and a suspension (column 3)."""
+    def make(n_days=300, n_tickers=6, seed=0) -> pd.DataFrame:
+        rng = np.random.default_rng(seed)
+        values = np.cumsum(rng.normal(0, 1, (n_days, n_tickers)), axis=0) + 50
+        df = pd.DataFrame(values, index=pd.bdate_range("2020-01-01", periods=n_days),
+                          columns=[f"60000{i}.SS" for i in range(n_tickers)])
+        df.iloc[:30, 1] = np.nan
+        df.iloc[80:90, 3] = np.nan
+        return df
+    return make
+
+
+@pytest.fixture
+def synthetic_closes():
+    """Factory of close panels (date × ticker) from the seeded SyntheticSource market."""
+    from src.db.sources import SyntheticSource
+
+    def make(n_tickers=12, end="2024-03-29") -> pd.DataFrame:
+        source = SyntheticSource(n_tickers=n_tickers, start="2022-06-01", end=end, n_clusters=3, seed=3)
+        return pd.DataFrame({t: source.frame(t).set_index("date")["close"] for t in source.tickers})
+    return make
+
+
+@pytest.fixture
+def strategy_inputs(tmp_path):
+    """Factory: writes a panel's return-correlation matrix and a one-cluster label file; returns both paths."""
+    from analysis.matrix_store import save_matrix
+
+    def make(panel):
+        corr_path, labels_path = tmp_path / "corr.npy", tmp_path / "labels.csv"
+        save_matrix(str(corr_path), panel.prices.pct_change().corr())
+        pd.DataFrame({"ticker": panel.tickers, "cluster": 0}).to_csv(labels_path, index=False)
+        return str(corr_path), str(labels_path)
+    return make
@@ -1,9 +1,16 @@
+import pytest
 from fastapi.testclient import TestClient
 from src.api.main import app
 
-client = TestClient(app)
 
-def test_api_response_fields():
+@pytest.fixture(scope="module")
+def client():
+    # Entering the client runs the app's lifespan, which creates the store
+    with TestClient(app) as client:
+        yield client
+
+
+def test_api_response_fields(client):
     resp = client.get(
         "/historical_data",
         params={
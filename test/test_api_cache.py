@@ -0,0 +1,47 @@
+from datetime import datetime
+import pytest
+from fastapi.testclient import TestClient
+import src.api.main as api
+from src.api.cache import query_key
+
+
+@pytest.fixture
+def client(api_client):
+    return api_client([
+        {"ticker": "600000.SS", "date": datetime(2024, 1, 2), "close": 1.0},
+        {"ticker": "600001.SS", "date": datetime(2024, 1, 2), "close": 2.0},
+    ])
+
+
+def test_upload_invalidates_only_the_written_ticker(client):
+    client, store = client
+
+    def closes(ticker):
+        resp = client.get("/historical_data", params={"ticker": ticker, "fields": ["date", "close"]})
+        assert resp.status_code == 200
+        return [row["close"] for row in resp.json()]
+
+    assert closes("600000.SS") == [1.0] and closes("600001.SS") == [2.0]
+    assert closes("600000.SS") == [1.0] and closes("600001.SS") == [2.0]
+    assert store.queries == 2  # second round served from the cache
+
+    resp = client.post("/upload_bulk", json=[{"ticker": "600000.SS", "date": "2024-01-03", "close": 1.5}])
+    assert resp.json() == {"message": "1 records inserted."}
+
+    assert closes("600000.SS") == [1.0, 1.5]  # miss: reads the new bar
+    assert closes("600001.SS") == [2.0]  # untouched ticker is still a hit
+    assert store.queries == 3
+
+
+def test_cache_invalidation_needs_a_loopback_client_or_the_token(client, monkeypatch):
+    client, _ = client
+    api.cache.put(query_key(["600000.SS"], None, None, ["close"], False, "application/json"), b"[]", "application/json")
+
+    assert client.post("/cache/invalidate", json={"tickers": ["600000.SS"]}).status_code == 403
+    local = TestClient(api.app, client=("127.0.0.1", 50000))
+    assert local.post("/cache/invalidate", json={"tickers": ["600000.SS"]}).json() == {"invalidated": 1}
+
+    monkeypatch.setattr(api, "API_CACHE_TOKEN", "s3cret")
+    assert local.post("/cache/invalidate", json={}).status_code == 403  # a token, once set, is always required
+    assert client.post("/cache/invalidate", json={}, headers={"X-Cache-Token": "wrong"}).status_code == 403
+    assert client.post("/cache/invalidate", json={}, headers={"X-Cache-Token": "s3cret"}).status_code == 200
@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime
+from src.db.storage import AsyncBucketStore, AsyncFlatStore, BucketStore, FlatStore
+
+FIELDS = ("date", "close", "volume")
+
+
+class AsyncCursor:
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+
+    def sort(self, *args, **kwargs):
+        self.cursor = self.cursor.sort(*args, **kwargs)
+        return self
+
+
+    def __aiter__(self):
+        return self
+
+
+    async def __anext__(self):
+        await asyncio.sleep(0)  # yield to the loop like a real batch fetch
+        try:
+            return next(self.cursor)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+    async def to_list(self):
+        return list(self.cursor)
+
+
+class AsyncCollection:
+    """The slice of pymongo's async collection API the stores use, over a mongomock collection."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+
+    def find(self, *args, batch_size=0, **kwargs):
+        return AsyncCursor(self.collection.find(*args, **kwargs))
+
+
+    async def aggregate(self, pipeline, **kwargs):
+        await asyncio.sleep(0)
+        return AsyncCursor(self.collection.aggregate(pipeline))
+
+
+    def __getattr__(self, name):
+        method = getattr(self.collection, name)
+
+        async def call(*args, **kwargs):
+            await asyncio.sleep(0)
+            return method(*args, **kwargs)
+        return call
+
+
+def bars(ticker, year, *days, name=""):
+    return [{"ticker": ticker, "date": datetime(year, 1, d), "name": name, "close": float(d), "volume": 100 * d}
+            for d in days]
+
+
+RECORDS = bars("600000.SS", 2023, 2, 3, name="PFB") + bars("600000.SS", 2024, 2) + bars("600001.SS", 2024, 2, 4)
+
+
+def without_timestamps(summary: dict) -> dict:
+    return {t: {k: v for k, v in s.items() if k != "last_updated"} for t, s in summary.items()}
+
+
+def test_async_stores_read_and_write_like_the_sync_ones(mongo_db):
+    pairs = [
+        (FlatStore(mongo_db.flat, mongo_db.flat_meta),
+         AsyncFlatStore(AsyncCollection(mongo_db.async_flat), AsyncCollection(mongo_db.async_flat_meta))),
+        (BucketStore(mongo_db.bucket, mongo_db.bucket_meta),
+         AsyncBucketStore(AsyncCollection(mongo_db.async_bucket), AsyncCollection(mongo_db.async_bucket_meta))),
+    ]
+
+    async def run(store):
+        await store.write_bars(RECORDS)
+        await store.write_bars(bars("600000.SS", 2024, 2, 3))  # one rewrite, one new bar
+        rows = [row async for row in store.find_bars(["600000.SS", "600001.SS"], datetime(2023, 1, 3), None, FIELDS,
+                                                     include_ticker=True)]
+        return rows, await store.list_tickers(min_history=3), await store.ticker_summary(), \
+            await store.latest_bar("600000.SS")
+
+    for sync, async_ in pairs:
+        sync.write_bars(RECORDS)
+        sync.write_bars(bars("600000.SS", 2024, 2, 3))
+        rows, listed, summary, latest = asyncio.run(run(async_))
+
+        key = lambda r: (r["ticker"], r["date"])  # noqa: E731
+        expected = list(sync.find_bars(["600000.SS", "600001.SS"], datetime(2023, 1, 3), None, FIELDS,
+                                       include_ticker=True))
+        assert sorted(rows, key=key) == sorted(expected, key=key)
+        assert listed == sync.list_tickers(min_history=3) == ["600000.SS"]
+        assert without_timestamps(summary) == without_timestamps(sync.ticker_summary())
+        assert latest["date"] == datetime(2024, 1, 3)
+        assert latest["name"] == sync.latest_bar("600000.SS")["name"]
+
+
+def test_concurrent_requests_wait_for_one_bootstrap(mongo_db):
+    mongo_db.daily_prices.insert_many(RECORDS)
+    store = AsyncFlatStore(AsyncCollection(mongo_db.daily_prices), AsyncCollection(mongo_db.tickers))
+    rebuild, rebuilds = store.rebuild_ticker_meta, []
+
+    async def counted_rebuild():
+        rebuilds.append(1)
+        return await rebuild()
+    store.rebuild_ticker_meta = counted_rebuild
+
+    async def requests():
+        return await asyncio.gather(*(store.list_tickers() for _ in range(5)))
+
+    assert asyncio.run(requests()) == [["600000.SS", "600001.SS"]] * 5  # none saw a half-built listing
+    assert len(rebuilds) == 1
@@ -0,0 +1,123 @@
+from datetime import datetime
+import pytest
+from src.db.storage import BucketStore, FlatStore, PartialWriteError, migrate_to_buckets
+
+FIELDS = ("date", "open", "high", "low", "close", "volume", "amount")
+
+
+def bar(ticker, date, close, name=""):
+    return {"ticker": ticker, "date": date, "name": name, "open": close, "high": close, "low": close,
+            "close": close, "volume": 100, "amount": 100.0 * close}
+
+
+def without_timestamps(summary: dict) -> dict:
+    return {t: {k: v for k, v in s.items() if k != "last_updated"} for t, s in summary.items()}
+
+
+class RacingCollection:
+    """Collection proxy that lets a concurrent write land between a bucket's read and its replace."""
+
+    def __init__(self, collection, races, concurrent_write):
+        self.collection = collection
+        self.races = races
+        self.concurrent_write = concurrent_write
+
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+    def find_one(self, *args, **kwargs):
+        doc = self.collection.find_one(*args, **kwargs)
+        if self.races:
+            self.races -= 1
+            self.concurrent_write()
+        return doc
+
+
+def test_migration_round_trip_matches_flat_reads(mongo_db):
+    flat = FlatStore(mongo_db.daily_prices)
+    flat.write_bars([bar("600000.SS", datetime(2023, 12, d), d, "PFB") for d in (27, 28, 29)] +
+                    [bar("600000.SS", datetime(2024, 1, d), d, "PFB") for d in (2, 3)] +
+                    [bar("600001.SS", datetime(2024, 1, d), 10 + d) for d in (2, 4)])
+
+    assert migrate_to_buckets(mongo_db.daily_prices, mongo_db.daily_prices_buckets) == 3
+    buckets = BucketStore(mongo_db.daily_prices_buckets)
+
+    tickers = ["600000.SS", "600001.SS"]
+    for start, end in ((None, None), (datetime(2023, 12, 28), datetime(2024, 1, 2))):
+        expected = sorted(flat.find_bars(tickers, start, end, FIELDS, include_ticker=True),
+                          key=lambda r: (r["ticker"], r["date"]))
+        assert [{k: r[k] for k in ("ticker",) + FIELDS} for r in expected] == \
+            list(buckets.find_bars(tickers, start, end, FIELDS, include_ticker=True))
+    assert without_timestamps(buckets.ticker_summary()) == without_timestamps(flat.ticker_summary())
+
+
+def test_interrupted_migration_recopies_the_partial_ticker(mongo_db):
+    FlatStore(mongo_db.daily_prices).write_bars(
+        [bar("600000.SS", datetime(2023, 12, d), d) for d in (28, 29)] +
+        [bar("600000.SS", datetime(2024, 1, d), d) for d in (2, 3)] +
+        [bar("600001.SS", datetime(2024, 1, 2), 1.0)]
+    )
+    migrate_to_buckets(mongo_db.daily_prices, mongo_db.daily_prices_buckets)
+    # a run stopped after the first of 600000.SS's two buckets
+    mongo_db.daily_prices_buckets.delete_one({"ticker": "600000.SS", "year": 2024})
+
+    assert migrate_to_buckets(mongo_db.daily_prices, mongo_db.daily_prices_buckets) == 2  # 600001.SS is skipped
+    assert BucketStore(mongo_db.daily_prices_buckets).ticker_summary()["600000.SS"]["count"] == 4
+
+
+def test_merge_overwrites_a_stored_bar_and_splits_at_the_year_boundary(mongo_db):
+    store = BucketStore(mongo_db.daily_prices_buckets)
+    store.write_bars([bar("600000.SS", datetime(2023, 12, 29), 1.0), bar("600000.SS", datetime(2024, 1, 2), 2.0)])
+    store.write_bars([bar("600000.SS", datetime(2024, 1, 2), 2.5), bar("600000.SS", datetime(2024, 1, 3), 3.0)])
+
+    buckets = {b["year"]: b for b in mongo_db.daily_prices_buckets.find()}
+    assert sorted(buckets) == [2023, 2024]
+    assert buckets[2023]["date"] == [datetime(2023, 12, 29)] and buckets[2023]["version"] == 1
+    assert buckets[2024]["date"] == [datetime(2024, 1, 2), datetime(2024, 1, 3)]
+    assert buckets[2024]["close"] == [2.5, 3.0]
+    assert (buckets[2024]["count"], buckets[2024]["version"]) == (2, 2)
+    assert store.ticker_summary()["600000.SS"]["count"] == 3
+
+
+def test_merged_bucket_keeps_dates_sorted_and_bumps_the_version():
+    stored = {d: bar("600000.SS", d, close) for d, close in ((datetime(2024, 1, 3), 3.0), (datetime(2024, 1, 5), 5.0))}
+    existing = BucketStore.build_bucket("600000.SS", 2024, stored, "PFB")
+    existing["version"] = 4
+    records = [bar("600000.SS", datetime(2024, 1, 4), 4.0), bar("600000.SS", datetime(2024, 1, 5), 5.5)]
+    merged = BucketStore.merged_bucket("600000.SS", 2024, existing, records)
+
+    assert merged["date"] == [datetime(2024, 1, 3), datetime(2024, 1, 4), datetime(2024, 1, 5)]
+    assert merged["close"] == [3.0, 4.0, 5.5]
+    assert (merged["first"], merged["last"], merged["count"]) == (datetime(2024, 1, 3), datetime(2024, 1, 5), 3)
+    assert (merged["name"], merged["version"]) == ("PFB", 5)  # a batch without a name keeps the stored one
+
+
+def test_concurrent_write_between_read_and_replace_is_retried(mongo_db):
+    collection = mongo_db.daily_prices_buckets
+    BucketStore(collection).write_bars([bar("600000.SS", datetime(2024, 1, 2), 2.0)])
+
+    other = BucketStore(collection)
+    racing = RacingCollection(
+        collection, races=1, concurrent_write=lambda: other.write_bars([bar("600000.SS", datetime(2024, 1, 3), 3.0)])
+    )
+    BucketStore(racing).write_bars([bar("600000.SS", datetime(2024, 1, 4), 4.0)])
+
+    bucket = collection.find_one({"ticker": "600000.SS", "year": 2024})
+    assert bucket["close"] == [2.0, 3.0, 4.0]  # neither writer's bar was lost
+    assert bucket["version"] == 3
+
+
+def test_bucket_that_never_settles_is_reported_as_failed(mongo_db):
+    collection = mongo_db.daily_prices_buckets
+    BucketStore(collection).write_bars([bar("600000.SS", datetime(2024, 1, 2), 2.0)])
+
+    other = BucketStore(collection)
+    racing = RacingCollection(
+        collection, races=100, concurrent_write=lambda: other.write_bars([bar("600000.SS", datetime(2024, 1, 3), 3.0)])
+    )
+    records = [bar("600000.SS", datetime(2024, 1, 4), 4.0)]
+    with pytest.raises(PartialWriteError) as info:
+        BucketStore(racing).write_bars(records)
+    assert info.value.failed == records
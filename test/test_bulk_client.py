@@ -0,0 +1,102 @@
+import json
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+import requests
+import src.analysis.utils as utils
+from src.api.columnar import NDJSON_MEDIA_TYPE, NPZ_MEDIA_TYPE, NPZ_STREAM_MEDIA_TYPE, encode_npz
+from src.api.compression import COMPRESS_MIN_BYTES
+
+DOCS = [
+    {"ticker": f"60000{k}.SS", "date": datetime(2020, 1, 1 + d), "close": float(10 * k + d)}
+    for k in range(5) for d in range(4)
+]
+
+# Enough bars that every format is past the compression threshold
+API_BARS = [
+    {"ticker": f"60000{k}.SS", "date": datetime(2020, 1, 1) + timedelta(days=d), "close": float(10 * k + d)}
+    for k in range(5) for d in range(60)
+]
+BULK_QUERY = {"tickers": ["600001.SS", "600003.SS"], "start": "2020-01-11", "fields": ["date", "close"]}
+
+
+def _expected_closes() -> pd.DataFrame:
+    bars = [b for b in API_BARS if b["ticker"] in BULK_QUERY["tickers"] and b["date"] >= datetime(2020, 1, 11)]
+    return pd.DataFrame(bars).pivot(index="date", columns="ticker", values="close")
+
+
+def _chunk_blocks(tickers, start=None, end=None, stream=False):
+    docs = [doc for doc in DOCS if doc["ticker"] in tickers]
+    if stream:  # same bars as JSON, to cover the fallback decoder
+        return [utils._json_columns([{**doc, "date": doc["date"].isoformat()} for doc in docs])]
+    return [utils._read_npz_columns(encode_npz(docs, ["date", "close"]))]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_chunks_assemble_into_one_panel(monkeypatch, stream):
+    monkeypatch.setattr(utils, "_fetch_chunk", _chunk_blocks)
+    tickers = sorted({doc["ticker"] for doc in DOCS})
+
+    panel = utils.load_all_close_price_via_api(tickers, stream=stream, chunk_size=2, workers=3)
+
+    expected = pd.DataFrame(DOCS).pivot(index="date", columns="ticker", values="close")
+    pd.testing.assert_frame_equal(panel, expected, check_index_type=False, check_column_type=False, check_names=False)
+
+
+def test_chunk_retries_server_errors_but_not_client_errors(monkeypatch):
+    monkeypatch.setattr(utils, "BULK_RETRY_DELAY", 0)
+    calls = []
+
+    def flaky(tickers, start=None, end=None, stream=False):
+        calls.append(tickers)
+        if len(calls) < 3:
+            raise requests.ConnectionError("reset")
+        return _chunk_blocks(tickers)
+
+    monkeypatch.setattr(utils, "_fetch_chunk", flaky)
+    assert utils.load_all_close_price_via_api(["600001.SS"]).shape == (4, 1)
+    assert len(calls) == 3
+
+    def rejected(tickers, start=None, end=None, stream=False):
+        calls.append(tickers)
+        response = requests.Response()
+        response.status_code = 422
+        raise requests.HTTPError("unprocessable", response=response)
+
+    calls.clear()
+    monkeypatch.setattr(utils, "_fetch_chunk", rejected)
+    with pytest.raises(requests.HTTPError):
+        utils.load_all_close_price_via_api(["600001.SS"])
+    assert len(calls) == 1
+
+
+@pytest.mark.parametrize("media_type", [NPZ_MEDIA_TYPE, NPZ_STREAM_MEDIA_TYPE])
+def test_post_bulk_npz_is_served_uncompressed_and_decodes(api_client, media_type):
+    client, _ = api_client(API_BARS)
+    response = client.post("/historical_data_bulk", json=BULK_QUERY,
+                           headers={"Accept": media_type, "Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == media_type
+    assert len(response.content) > COMPRESS_MIN_BYTES
+    assert "content-encoding" not in response.headers  # already deflated inside the bundle
+    if media_type == NPZ_MEDIA_TYPE:
+        panel = utils.close_panel_from_npz(response.content)
+    else:
+        panel = utils.close_panel_from_npz_stream([response.content])
+    pd.testing.assert_frame_equal(panel, _expected_closes(), check_index_type=False, check_column_type=False,
+                                  check_names=False)
+
+
+def test_post_bulk_ndjson_is_gzipped_and_decodes(api_client):
+    client, _ = api_client(API_BARS)
+    response = client.post("/historical_data_bulk", json=BULK_QUERY,
+                           headers={"Accept": NDJSON_MEDIA_TYPE, "Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    assert response.headers["content-encoding"] == "gzip"
+    rows = [json.loads(line) for line in response.text.splitlines() if line]
+    panel = pd.DataFrame(rows).assign(date=lambda df: pd.to_datetime(df["date"]))
+    pd.testing.assert_frame_equal(panel.pivot(index="date", columns="ticker", values="close"), _expected_closes(),
+                                  check_index_type=False, check_column_type=False, check_names=False)
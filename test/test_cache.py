@@ -0,0 +1,44 @@
+from datetime import datetime
+from src.api.cache import ResultCache, query_key
+
+
+def _key(tickers, media_type="application/json"):
+    return query_key(tickers, datetime(2020, 1, 1), None, ["date", "close"], True, media_type)
+
+
+def test_key_normalizes_ticker_and_field_order():
+    assert query_key(["B", "A", "A"], None, None, ["close", "date"], True, "application/json") == \
+        query_key(["A", "B"], None, None, ["date", "close"], True, "application/json")
+
+
+def test_lru_eviction_and_per_ticker_invalidation():
+    cache = ResultCache(max_bytes=30, max_entry_bytes=20)
+    cache.put(_key(["A"]), b"a" * 10, "application/json")
+    cache.put(_key(["A", "B"]), b"b" * 10, "application/json")
+    cache.put(_key(["C"]), b"c" * 10, "application/json")
+    assert cache.get(_key(["A"])) == (b"a" * 10, "application/json")  # now most recently used
+
+    cache.put(_key(["D"]), b"d" * 10, "application/json")  # evicts ["A", "B"], the least recent
+    cache.put(_key(["E"]), b"e" * 21, "application/json")  # over max_entry_bytes: not cached
+
+    assert cache.get(_key(["A", "B"])) is None
+    assert cache.get(_key(["E"])) is None
+    assert cache.invalidate(["A", "Z"]) == 1
+    assert cache.get(_key(["A"])) is None
+    assert cache.get(_key(["C"])) is not None
+    assert cache.info()["entries"] == 2 and cache.info()["bytes"] == 20
+    assert cache.stats["evictions"] == 1
+
+
+def test_write_during_query_voids_its_result():
+    cache = ResultCache(max_bytes=100, max_entry_bytes=100)
+    key = _key(["A", "B"])
+    generation = cache.generation(key[0])
+    cache.invalidate(["B"])  # a writer touched B while the query ran
+    cache.put(key, b"stale", "application/json", generation)
+    assert cache.get(key) is None
+
+    generation = cache.generation(key[0])
+    cache.invalidate()
+    cache.put(key, b"stale", "application/json", generation)
+    assert cache.get(key) is None
@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.cluster.hierarchy import fcluster, linkage
+from scipy.spatial.distance import squareform
+from analysis import matrix_store
+from analysis.clustering_model import load_linkage, recut_clusters, run_clustering_model, save_linkage
+from analysis.matrix_store import save_matrix
+
+# Tickers listed out of group order, so a label shifted against its ticker shows up
+GROUPS = {"600000.SS": 0, "600010.SS": 1, "600001.SS": 0, "600020.SS": 2, "600011.SS": 1, "600021.SS": 2,
+          "600002.SS": 0, "600012.SS": 1}
+
+
+def block_correlation(seed=0) -> pd.DataFrame:
+    """Noisy correlation matrix that is high within a group and low across groups."""
+    rng = np.random.default_rng(seed)
+    tickers = list(GROUPS)
+    same = np.equal.outer([GROUPS[t] for t in tickers], [GROUPS[t] for t in tickers])
+    corr = np.where(same, 0.9, 0.1) + rng.uniform(-0.05, 0.05, same.shape)
+    corr = (corr + corr.T) / 2
+    np.fill_diagonal(corr, 1.0)
+    return pd.DataFrame(corr, index=tickers, columns=tickers)
+
+
+def run(tmp_path, correlation, **params) -> pd.DataFrame:
+    save_matrix(str(tmp_path / "corr.npy"), correlation)
+    return run_clustering_model(str(tmp_path / "corr.npy"), str(tmp_path / "labels.csv"),
+                                linkage_path=str(tmp_path / "linkage.npy"), **params)
+
+
+def test_labels_align_with_tickers(tmp_path):
+    correlation = block_correlation()
+    correlation.loc["600000.SS", "600011.SS"] = np.nan  # dropped with its row and column
+
+    labels = run(tmp_path, correlation, n_clusters=3).set_index("ticker")["cluster"]
+
+    assert "600000.SS" not in labels.index
+    assert sorted(labels.index) == sorted(set(GROUPS) - {"600000.SS"})
+    for group in set(GROUPS.values()):
+        members = [t for t in labels.index if GROUPS[t] == group]
+        assert labels[members].nunique() == 1, group
+    assert labels.nunique() == 3
+
+
+def test_recut_of_the_saved_linkage_matches_a_fresh_fcluster(tmp_path):
+    correlation = block_correlation(seed=1)
+    run(tmp_path, correlation, n_clusters=3)
+
+    recut = recut_clusters(str(tmp_path / "recut.csv"), n_clusters=2, cluster_counts=(4,), distance_thresholds=(0.5,),
+                           linkage_path=str(tmp_path / "linkage.npy"))
+
+    distance = 1 - correlation.to_numpy()
+    np.fill_diagonal(distance, 0.0)
+    Z = linkage(squareform(distance, checks=False), method="complete")
+    assert recut["ticker"].tolist() == list(correlation.index)
+    np.testing.assert_array_equal(recut["cluster"], fcluster(Z, t=2, criterion="maxclust") - 1)
+    np.testing.assert_array_equal(recut["cluster_k4"], fcluster(Z, t=4, criterion="maxclust") - 1)
+    np.testing.assert_array_equal(recut["cluster_t0.5"], fcluster(Z, t=0.5, criterion="distance") - 1)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "recut.csv"), recut, check_dtype=False)
+
+
+def test_failed_linkage_save_keeps_the_previous_tree(tmp_path, monkeypatch):
+    run(tmp_path, block_correlation(), n_clusters=3)
+    path = str(tmp_path / "linkage.npy")
+    Z, tickers = load_linkage(path)
+
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+    monkeypatch.setattr(matrix_store.np, "save", disk_full)
+    with pytest.raises(OSError):
+        save_linkage(path, Z[:-1], tickers[:-1])
+    monkeypatch.undo()
+
+    saved, saved_tickers = load_linkage(path)
+    np.testing.assert_array_equal(saved, Z)
+    assert saved_tickers == tickers
+
+    # a crash between the sidecar and the tree is caught on load
+    matrix_store.save_npy(matrix_store.tickers_path(path), np.array(tickers[:-1], dtype=str))
+    with pytest.raises(ValueError):
+        load_linkage(path)
@@ -0,0 +1,38 @@
+from datetime import datetime
+import pandas as pd
+from src.api.columnar import encode_npz, stream_npz_frames
+from src.analysis.utils import close_panel_from_npz, close_panel_from_npz_stream
+
+
+DOCS = [
+    {"ticker": "600000.SS", "date": datetime(2020, 1, 2), "close": 10.0},
+    {"ticker": "600001.SS", "date": datetime(2020, 1, 2), "close": 5.5},
+    {"ticker": "600000.SS", "date": datetime(2020, 1, 3), "close": 10.5},
+    {"ticker": "600000.SS", "date": datetime(2020, 1, 3), "close": 99.0},  # duplicate bar
+    {"ticker": "600002.SS", "date": datetime(2020, 1, 6), "close": 7.0},
+]
+
+
+def _json_pivot(docs):
+    df = pd.DataFrame(docs).drop_duplicates(["ticker", "date"])
+    return df.pivot(index="date", columns="ticker", values="close").sort_index()
+
+
+def test_npz_bundle_matches_json_pivot():
+    panel = close_panel_from_npz(encode_npz(DOCS, ["date", "close"]))
+
+    pd.testing.assert_frame_equal(panel, _json_pivot(DOCS), check_index_type=False, check_column_type=False)
+
+
+def test_streamed_frames_match_json_pivot():
+    body = b"".join(stream_npz_frames(iter(DOCS), ["date", "close"], batch_size=2))
+    # Split the body at arbitrary points, as a chunked HTTP response would
+    chunks = [body[i:i + 37] for i in range(0, len(body), 37)]
+
+    panel = close_panel_from_npz_stream(chunks)
+
+    pd.testing.assert_frame_equal(panel, _json_pivot(DOCS), check_index_type=False, check_column_type=False)
+
+
+def test_empty_bundle():
+    assert close_panel_from_npz(encode_npz([], ["date", "close"])).empty
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+from src.analysis.corr_stats import CorrelationStats, pairwise_corr
+from analysis.correlation_model import update_correlation_stats
+
+
+def test_incremental_matches_pandas_pairwise_corr(random_walk_prices):
+    df = random_walk_prices()
+    stats = CorrelationStats()
+    stats.add(df.iloc[:150])
+    for k in range(150, len(df)):
+        stats.add(df.iloc[k:k + 1])
+
+    pd.testing.assert_frame_equal(stats.corr(), df.corr(), atol=1e-9, check_names=False)
+
+
+def test_remove_slides_window(random_walk_prices):
+    df = random_walk_prices()
+    stats = CorrelationStats()
+    stats.add(df)
+    stats.remove(df.iloc[:120], first_date=df.index[120])
+
+    pd.testing.assert_frame_equal(stats.corr(), df.iloc[120:].corr(), atol=1e-9, check_names=False)
+    assert stats.n_rows == len(df) - 120
+
+
+def test_save_and_load(tmp_path, random_walk_prices):
+    df = random_walk_prices()
+    stats = CorrelationStats()
+    stats.add(df)
+    stats.save(tmp_path / "stats.npz")
+
+    loaded = CorrelationStats.load(tmp_path / "stats.npz")
+
+    assert loaded.last_date == df.index[-1]
+    pd.testing.assert_frame_equal(loaded.corr(), stats.corr())
+
+
+def test_pairwise_corr_blocks_match_pandas(random_walk_prices):
+    df = random_walk_prices(n_tickers=11)
+
+    pd.testing.assert_frame_equal(pairwise_corr(df, block_size=4), df.corr(), atol=1e-10)
+    pd.testing.assert_frame_equal(pairwise_corr(df, dtype=np.float32, block_size=4), df.corr(), atol=1e-4)
+
+
+def test_high_price_levels_keep_precision_through_adds_and_removes(random_walk_prices):
+    # Tiny moves on a large level: raw sums of x² would cancel away the variance entirely
+    df = random_walk_prices() * 1e-3 + 1e6
+    stats = CorrelationStats()
+    for k in range(0, len(df), 25):
+        stats.add(df.iloc[k:k + 25])
+    stats.remove(df.iloc[:100], first_date=df.index[100])
+
+    pd.testing.assert_frame_equal(stats.corr(), df.iloc[100:].corr(), atol=1e-6, check_names=False)
+
+
+def test_ticker_set_change_rebuilds_the_stats(tmp_path, random_walk_prices):
+    df = random_walk_prices()
+    path = str(tmp_path / "stats.npz")
+    start, end = df.index[0], df.index[-1]
+    update_correlation_stats(df.iloc[:200, :5], start, end, path)
+
+    # a ticker backfilled with its whole history joins: its first 200 rows must count too
+    stats = update_correlation_stats(df, start, end, path)
+
+    pd.testing.assert_frame_equal(stats.corr(), df.corr(), atol=1e-9, check_names=False)
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import time
+import pandas as pd
+from src.db.fetcher import AdaptiveLimiter, FetchScheduler, RetryQueue, TokenBucket
+from src.db.sources import FrameSource
+
+
+def _source(tickers=("600000.SS", "600001.SS", "600002.SS")):
+    dates = pd.bdate_range("2024-01-01", periods=5)
+    frames = {
+        t: pd.DataFrame({"date": dates, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0,
+                         "volume": 100, "amount": 100.0})
+        for t in tickers
+    }
+    return FrameSource(frames)
+
+
+class FlakySource:
+    """Fails the first `failures[ticker]` calls of each ticker."""
+
+    def __init__(self, source, failures):
+        self.source = source
+        self.failures = dict(failures)
+        self.calls = []
+
+    def fetch(self, ticker):
+        self.calls.append(ticker)
+        if self.failures.get(ticker, 0) > 0:
+            self.failures[ticker] -= 1
+            raise ConnectionError("reset by peer")
+        return self.source.fetch_daily(ticker, start_date="20240102")
+
+
+def test_transient_failures_are_retried(tmp_path):
+    flaky = FlakySource(_source(), {"600001.SS": 2})
+    scheduler = FetchScheduler(rate=1000, burst=100, backoff_base=0.001, max_retries=3,
+                               retry_queue=RetryQueue(str(tmp_path / "retry.json")))
+    results = {}
+    stats = asyncio.run(scheduler.run(
+        ["600000.SS", "600001.SS", "600002.SS"], flaky.fetch,
+        lambda ticker, df, error: results.__setitem__(ticker, (df, error))
+    ))
+
+    assert stats["failed"] == 0 and stats["retried"] == 2
+    assert flaky.calls.count("600001.SS") == 3
+    assert all(error is None and len(df) == 4 for df, error in results.values())
+    assert json.loads((tmp_path / "retry.json").read_text()) == {}
+
+
+def test_exhausted_tickers_persist_in_retry_queue(tmp_path):
+    path = str(tmp_path / "retry.json")
+    flaky = FlakySource(_source(), {"600002.SS": 10})
+    scheduler = FetchScheduler(rate=1000, burst=100, backoff_base=0.001, max_retries=2, retry_queue=RetryQueue(path))
+    stats = asyncio.run(scheduler.run(["600000.SS", "600002.SS"], flaky.fetch, lambda *args: None))
+
+    assert stats["failed"] == 1
+    queued = RetryQueue(path)
+    assert queued.tickers() == ["600002.SS"]
+    assert queued.entries["600002.SS"]["attempts"] == 3
+
+    # A later successful fetch takes the ticker off the queue
+    scheduler = FetchScheduler(rate=1000, burst=100, backoff_base=0.001, retry_queue=queued)
+    asyncio.run(scheduler.run(["600002.SS"], lambda t: _source().fetch_daily(t, "20240101"), lambda *args: None))
+    assert RetryQueue(path).tickers() == []
+
+
+def test_token_bucket_limits_rate():
+    async def acquire_all():
+        bucket = TokenBucket(rate=50, capacity=1)
+        started = time.monotonic()
+        for _ in range(11):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(acquire_all()) >= 0.19
+
+
+def test_limiter_is_additive_increase_multiplicative_decrease():
+    limiter = AdaptiveLimiter(initial=4, minimum=1, maximum=8, target_latency=1.0)
+    for _ in range(4):
+        limiter.record(0.1, ok=True)
+    assert 4.9 < limiter.limit < 5.0
+    limiter.record(0.1, ok=False)
+    assert limiter.limit < 2.5
+    limiter.record(5.0, ok=True)  # too slow counts as congestion
+    limiter.record(5.0, ok=True)
+    assert limiter.limit == 1
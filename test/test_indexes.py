@@ -0,0 +1,14 @@
+from src.config.settings import get_collection
+from src.db.indexes import ensure_indexes, missing_indexes, verify_query_plans
+
+
+def test_required_indexes_present():
+    collection = get_collection()
+    ensure_indexes(collection)
+    assert missing_indexes(collection) == []
+
+
+def test_endpoint_queries_use_indexes():
+    plans = verify_query_plans(get_collection())
+    for stages in plans.values():
+        assert "COLLSCAN" not in stages
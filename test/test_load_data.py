@@ -0,0 +1,76 @@
+import pandas as pd
+from src.db.fetcher import AdaptiveLimiter, FetchScheduler, RetryQueue
+from src.db.load_data import Checkpoint, upload_all
+from src.db.sources import FrameSource, bar_records
+from src.db.storage import FlatStore
+
+
+def _source(tickers=("600000.SS", "600001.SS")):
+    dates = pd.bdate_range("2024-01-01", periods=10)
+    frames = {
+        t: pd.DataFrame({"date": dates, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0,
+                         "volume": 100, "amount": 100.0})
+        for t in tickers
+    }
+    return FrameSource(frames)
+
+
+def test_partly_stored_ticker_is_refetched_on_resume(mongo_db, tmp_path):
+    source = _source()
+    store = FlatStore(mongo_db.daily_prices)
+    # an earlier run wrote half of 600000.SS and stopped before checkpointing it
+    stored = bar_records(source.fetch_daily("600000.SS", "20240101"), "600000.SS", "")
+    store.write_bars(stored[:5])
+    Checkpoint(str(tmp_path / "checkpoint.json")).save()  # ... after saving its (still empty) checkpoint
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+
+    stats = upload_all(source, FetchScheduler(rate=1000, burst=100), checkpoint, "20240101", store)
+
+    assert stats["failed"] == 0
+    assert checkpoint.done == {"600000.SS", "600001.SS"}
+    assert store.ticker_summary()["600000.SS"]["count"] == 10
+    assert mongo_db.daily_prices.count_documents({"ticker": "600000.SS"}) == 10
+
+
+def test_checkpointed_tickers_are_skipped(mongo_db, tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = Checkpoint(path)
+    checkpoint.mark("600000.SS")
+    checkpoint.save()
+
+    store = FlatStore(mongo_db.daily_prices)
+    upload_all(_source(), FetchScheduler(rate=1000, burst=100), Checkpoint(path), "20240101", store)
+
+    assert store.list_tickers() == ["600001.SS"]
+
+
+def test_database_without_checkpoint_skips_fully_loaded_tickers(mongo_db, tmp_path):
+    source = _source(("600000.SS", "600001.SS", "600002.SS"))
+    store = FlatStore(mongo_db.daily_prices)
+    # loaded before checkpoints existed: one ticker from the start, one listed later
+    store.write_bars(bar_records(source.fetch_daily("600000.SS", "20240101"), "600000.SS", ""))
+    store.write_bars(bar_records(source.fetch_daily("600001.SS", "20240101"), "600001.SS", "")[3:])
+    fetched = []
+    fetch_daily = source.fetch_daily
+    source.fetch_daily = lambda ticker, **kwargs: fetched.append(ticker) or fetch_daily(ticker, **kwargs)
+    path = str(tmp_path / "checkpoint.json")
+
+    upload_all(source, FetchScheduler(rate=1000, burst=100), Checkpoint(path), "20240101", store)
+
+    assert sorted(fetched) == ["600001.SS", "600002.SS"]
+    assert Checkpoint(path).done == {"600000.SS", "600001.SS", "600002.SS"}
+
+
+def test_tickers_that_failed_last_run_are_fetched_first(mongo_db, tmp_path):
+    source = _source(("600000.SS", "600001.SS", "600002.SS"))
+    fetched = []
+    fetch_daily = source.fetch_daily
+    source.fetch_daily = lambda ticker, **kwargs: fetched.append(ticker) or fetch_daily(ticker, **kwargs)
+    queue = RetryQueue(str(tmp_path / "retry.json"))
+    queue.add("600002.SS", "ConnectionError: reset", attempts=4)
+
+    scheduler = FetchScheduler(rate=1000, burst=100, limiter=AdaptiveLimiter(initial=1, maximum=1), retry_queue=queue)
+    upload_all(source, scheduler, Checkpoint(None), "20240101", FlatStore(mongo_db.daily_prices))
+
+    assert fetched == ["600002.SS", "600000.SS", "600001.SS"]
+    assert RetryQueue(queue.path).tickers() == []
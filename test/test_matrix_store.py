@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from src.analysis.matrix_store import load_matrix, save_matrix, tickers_path
+
+TICKERS = ["600000.SS", "600001.SS", "600002.SS"]
+
+
+def _matrix(values=None):
+    values = np.array([[1.0, 0.5, -0.2], [0.5, 1.0, np.nan], [-0.2, np.nan, 1.0]]) if values is None else values
+    return pd.DataFrame(values, index=TICKERS, columns=TICKERS)
+
+
+def test_round_trip_is_memory_mapped_and_read_only(tmp_path):
+    path = str(tmp_path / "corr.npy")
+    csv_path = str(tmp_path / "corr.csv")
+    save_matrix(path, _matrix(), csv_path)
+
+    loaded = load_matrix(path)
+    pd.testing.assert_frame_equal(loaded, _matrix())
+    with pytest.raises(ValueError):
+        loaded.iloc[0, 0] = 0.0  # backed by a read-only memory map
+    pd.testing.assert_frame_equal(load_matrix(csv_path), _matrix())
+    assert sorted(os.listdir(tmp_path)) == ["corr.csv", "corr.npy", "corr.tickers.npy"]  # no temporary files left
+
+
+def test_resave_replaces_both_files(tmp_path):
+    path = str(tmp_path / "corr.npy")
+    save_matrix(path, _matrix())
+    smaller = pd.DataFrame([[1.0]], index=["600009.SS"], columns=["600009.SS"])
+    save_matrix(path, smaller)
+
+    pd.testing.assert_frame_equal(load_matrix(path, mmap=False), smaller)
+
+
+def test_mismatched_sidecar_is_rejected(tmp_path):
+    path = str(tmp_path / "corr.npy")
+    save_matrix(path, _matrix())
+    np.save(tickers_path(path), np.array(TICKERS[:2]))  # as if a save died between the two files
+
+    with pytest.raises(ValueError, match="doesn't match"):
+        load_matrix(path)
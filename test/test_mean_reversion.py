@@ -0,0 +1,41 @@
+import pickle
+import pandas as pd
+from analysis.mean_reversion import MeanReversionStrategy
+from analysis.price_cache import PriceCache
+
+
+def cached_panel(root, closes: pd.DataFrame):
+    """Price-cache panel over `closes`, memory-mapped like the one the pipeline hands the strategy."""
+    return PriceCache(str(root), fetch=lambda tickers, start=None: closes[list(tickers)]).refresh(list(closes.columns))
+
+
+def run_strategy(inputs, output, **params) -> pd.DataFrame:
+    MeanReversionStrategy(*inputs, str(output), lookback=20, z_entry=1.5, corr_limit=-1.0, **params).run()
+    return pd.read_csv(output)
+
+
+def test_process_pool_matches_serial_trades_and_order(tmp_path, synthetic_closes, strategy_inputs):
+    panel = cached_panel(tmp_path / "cache", synthetic_closes(n_tickers=8))
+    inputs = strategy_inputs(panel)
+
+    serial = run_strategy(inputs, tmp_path / "serial.csv", panel=panel, n_workers=1)
+    parallel = run_strategy(inputs, tmp_path / "parallel.csv", panel=panel, n_workers=2, chunksize=3)  # 10 tasks
+
+    assert len(serial) > 0
+    pd.testing.assert_frame_equal(parallel, serial)
+
+
+def test_cache_panel_pickles_as_its_mapped_file(tmp_path, synthetic_closes):
+    closes = synthetic_closes(n_tickers=8)
+    panel = cached_panel(tmp_path / "cache", closes)
+
+    payload = pickle.dumps(panel)
+    restored = pickle.loads(payload)
+
+    assert len(payload) < closes.to_numpy().nbytes / 4  # labels only, not the matrix
+    assert restored._mapped_file() == panel._mapped_file() is not None  # the worker maps the same file
+    pd.testing.assert_frame_equal(restored.prices, panel.prices)
+
+    # a sub-panel no longer spans the mapped file and is pickled in full
+    sub = panel.subset(panel.tickers[:3])
+    pd.testing.assert_frame_equal(pickle.loads(pickle.dumps(sub)).prices, sub.prices)
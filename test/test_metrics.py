@@ -0,0 +1,58 @@
+import asyncio
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.api.metrics import (
+    PHASE_SECONDS, REQUEST_SECONDS, REQUESTS, RESPONSE_BYTES, ROWS, MetricsMiddleware, Registry, drain
+)
+
+
+async def _cursor(rows):
+    for row in rows:
+        yield row
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.histogram("latency_seconds", "test", ["endpoint"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value, endpoint="/x")
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{endpoint="/x",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{endpoint="/x",le="1"} 3' in lines
+    assert 'latency_seconds_bucket{endpoint="/x",le="+Inf"} 4' in lines
+    assert 'latency_seconds_count{endpoint="/x"} 4' in lines
+    assert 'latency_seconds_sum{endpoint="/x"} 6.05' in lines
+
+
+def test_drain_times_query_and_decode_phases():
+    queries = PHASE_SECONDS.count(endpoint="/test", phase="query")
+    decodes = PHASE_SECONDS.count(endpoint="/test", phase="decode")
+    rows = ROWS.value(endpoint="/test")
+
+    assert asyncio.run(drain(_cursor([{"close": 1.0}, {"close": 2.0}]), "/test")) == [{"close": 1.0}, {"close": 2.0}]
+
+    assert PHASE_SECONDS.count(endpoint="/test", phase="query") == queries + 1
+    assert PHASE_SECONDS.count(endpoint="/test", phase="decode") == decodes + 1
+    assert ROWS.value(endpoint="/test") == rows + 2
+
+
+def test_middleware_labels_requests_by_route():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    before = REQUESTS.value(endpoint="/ping", status="200"), RESPONSE_BYTES.value(endpoint="/ping")
+    with TestClient(app) as client:
+        body = client.get("/ping").content
+        client.get("/no-such-path")
+
+    assert REQUESTS.value(endpoint="/ping", status="200") == before[0] + 1
+    assert RESPONSE_BYTES.value(endpoint="/ping") == before[1] + len(body)
+    assert REQUESTS.value(endpoint="other", status="404") >= 1
+    assert REQUEST_SECONDS.count(endpoint="/ping") >= 1
@@ -0,0 +1,30 @@
+import numpy as np
+from analysis.backtest import MeanReversionBacktester
+from analysis.mean_reversion import MeanReversionStrategy
+from analysis.param_sweep import run_parameter_sweep
+from analysis.pnl_engine import performance_metrics
+from analysis.price_panel import PricePanel
+
+
+def test_sweep_rows_match_strategy_run_and_backtest(tmp_path, synthetic_closes, strategy_inputs):
+    panel = PricePanel(synthetic_closes(n_tickers=8))
+    inputs = strategy_inputs(panel)
+    strategy = MeanReversionStrategy(*inputs, str(tmp_path / "unused.csv"), panel=panel, corr_limit=-1.0)
+
+    sweep = run_parameter_sweep(strategy, lookbacks=(20, 40), z_entries=(1.5, 2.0), z_exits=(0.25, 0.5),
+                                output_path=None)
+
+    assert len(sweep) == 8 and sweep["trades"].gt(0).all()
+    for row in sweep.itertuples():
+        output = tmp_path / f"trades_{row.Index}.csv"
+        MeanReversionStrategy(*inputs, str(output), z_entry=row.z_entry, z_exit=row.z_exit, lookback=row.lookback,
+                              panel=panel, corr_limit=-1.0).run()
+        backtester = MeanReversionBacktester(str(output), panel=panel)
+        pnl = backtester.backtest()
+        metrics = performance_metrics(pnl)
+
+        assert row.trades == len(backtester.trades)
+        np.testing.assert_allclose(
+            [row.sharpe, row.max_drawdown, row.total_pnl], [metrics["sharpe"], metrics["max_drawdown"], pnl.iloc[-1]],
+            rtol=1e-9, atol=1e-12
+        )
@@ -0,0 +1,38 @@
+from analysis.main import build_pipeline
+from analysis.price_panel import PricePanel
+
+
+def run(panel, cache_dir, **params) -> list:
+    """Run the pipeline against `cache_dir`; returns the names of the stages that actually ran."""
+    params.setdefault("corr_limit", 0.5)  # synthetic closes rarely correlate at 0.99: keep some pairs
+    pipeline = build_pipeline(panel, **params)
+    ran = []
+    for stage in pipeline.stages.values():
+        stage.publish = {}  # leave ../output untouched
+
+        def recorded(out_dir, inputs, _fn=stage.fn, _name=stage.name, **kwargs):
+            ran.append(_name)
+            _fn(out_dir, inputs, **kwargs)
+        stage.fn = recorded
+
+    pipeline.cache_dir = str(cache_dir)
+    pipeline.run()
+    return ran
+
+
+def test_unchanged_rerun_skips_every_stage(tmp_path, synthetic_closes):
+    panel = PricePanel(synthetic_closes())
+    assert run(panel, tmp_path) == ["correlation", "clustering", "strategy", "backtest"]
+    assert run(panel, tmp_path) == []
+
+
+def test_exit_threshold_change_reruns_only_strategy_and_backtest(tmp_path, synthetic_closes):
+    panel = PricePanel(synthetic_closes())
+    run(panel, tmp_path, z_exit=0.5)
+    assert run(panel, tmp_path, z_exit=0.25) == ["strategy", "backtest"]
+
+
+def test_day_after_training_window_keeps_correlation_and_clustering(tmp_path, synthetic_closes):
+    full = PricePanel(synthetic_closes())
+    run(PricePanel(full.prices.iloc[:-1]), tmp_path)
+    assert run(full, tmp_path) == ["strategy", "backtest"]
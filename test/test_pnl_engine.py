@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+from src.analysis.pnl_engine import portfolio_pnl
+
+
+def _trades(prices, n=60, seed=1):
+    rng = np.random.default_rng(seed)
+    dates, tickers = prices.index, list(prices.columns) + ["000000.SZ"]
+    rows = []
+    for _ in range(n):
+        a, b = rng.choice(len(tickers), 2, replace=False)
+        entry = rng.integers(0, len(dates) - 1)
+        exit_ = min(entry + rng.integers(0, 30), len(dates) - 1)
+        rows.append({
+            "ticker_a": tickers[a], "ticker_b": tickers[b],
+            "direction": rng.choice(["long", "short"]),
+            "entry_date": dates[entry], "exit_date": dates[exit_],
+        })
+    return pd.DataFrame(rows)
+
+
+def _reference_pnl(prices, trades):
+    """The original per-trade / per-day dict loop of MeanReversionBacktester.backtest."""
+    daily_pnl = {}
+    for _, trade in trades.iterrows():
+        s1 = prices[trade["ticker_a"]].dropna() if trade["ticker_a"] in prices else pd.Series(dtype=float)
+        s2 = prices[trade["ticker_b"]].dropna() if trade["ticker_b"] in prices else pd.Series(dtype=float)
+        entry, exit = trade["entry_date"], trade["exit_date"]
+        try:
+            p1_entry, p2_entry = s1.loc[entry], s2.loc[entry]
+            s1.loc[exit], s2.loc[exit]
+        except KeyError:
+            continue
+        if trade["direction"] == "long":
+            pnl_series = (s1.loc[entry:exit] / p1_entry - 1) - (s2.loc[entry:exit] / p2_entry - 1)
+        else:
+            pnl_series = (s2.loc[entry:exit] / p2_entry - 1) - (s1.loc[entry:exit] / p1_entry - 1)
+        for date, pnl in (pnl_series * 1.0).items():
+            daily_pnl[date] = daily_pnl.get(date, 0) + pnl
+    return pd.Series(daily_pnl).sort_index().fillna(0).cumsum()
+
+
+def test_pnl_matches_reference_loop_exactly(random_walk_prices):
+    prices = random_walk_prices()
+    trades = _trades(prices)
+    expected = _reference_pnl(prices, trades)
+    result = portfolio_pnl(prices, trades)
+    np.testing.assert_array_equal(result["pnl"].index, expected.index)
+    np.testing.assert_array_equal(result["pnl"].to_numpy(), expected.to_numpy())
+
+
+def test_positions_exposure_and_turnover(random_walk_prices):
+    prices = random_walk_prices()
+    dates = prices.index
+    trades = pd.DataFrame([
+        {"ticker_a": "600000.SS", "ticker_b": "600002.SS", "direction": "long",
+         "entry_date": dates[10], "exit_date": dates[20]},
+        {"ticker_a": "600000.SS", "ticker_b": "600004.SS", "direction": "short",
+         "entry_date": dates[15], "exit_date": dates[25]},
+    ])
+    result = portfolio_pnl(prices, trades)
+    positions = result["positions"]
+
+    assert positions.loc[dates[12], "600000.SS"] == 1.0
+    assert positions.loc[dates[12], "600002.SS"] == -1.0
+    assert positions.loc[dates[17], "600000.SS"] == 0.0  # long and short legs net out
+    assert positions.loc[dates[20], "600002.SS"] == -1.0  # still held on the exit date
+    assert positions.loc[dates[21], "600002.SS"] == 0.0
+    assert result["exposure"].loc[dates[17]] == 2.0
+    assert result["exposure"].loc[dates[26]] == 0.0
+    assert result["turnover"].loc[dates[10]] == 2.0
+    assert result["turnover"].loc[dates[15]] == 2.0
+    assert result["turnover"].sum() == 8.0
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from analysis import price_cache
+from analysis.price_cache import CURRENT_FILE, VERSION_PATTERN, PriceCache
+
+DATES = pd.bdate_range("2024-01-01", periods=8, name="date")
+CLOSES = pd.DataFrame(
+    {"600000.SS": np.arange(8.0), "600001.SS": np.arange(8.0) + 10, "600002.SS": np.arange(8.0) + 20}, index=DATES
+)
+
+
+class FakeFetcher:
+    """Serves CLOSES up to `as_of`, recording every (tickers, start) call."""
+
+    def __init__(self, as_of=DATES[-1]):
+        self.as_of = as_of
+        self.calls = []
+
+
+    def __call__(self, tickers, start=None):
+        self.calls.append((sorted(tickers), start))
+        frame = CLOSES.loc[start:self.as_of, list(tickers)]
+        return frame.dropna(how="all")
+
+
+def assert_prices(panel, expected: pd.DataFrame):
+    expected = expected.set_axis(expected.index.astype("datetime64[ns]"), axis=0)
+    pd.testing.assert_frame_equal(panel.prices, expected, check_names=False)
+
+
+def versions(root):
+    return sorted(name for name in os.listdir(root) if VERSION_PATTERN.fullmatch(name))
+
+
+def test_cold_build_then_incremental_append(tmp_path):
+    fetch = FakeFetcher(as_of=DATES[4])
+    cache = PriceCache(str(tmp_path), fetch=fetch)
+
+    panel = cache.refresh(["600000.SS", "600001.SS"])
+    assert_prices(panel, CLOSES.loc[:DATES[4], ["600000.SS", "600001.SS"]])
+
+    fetch.as_of = DATES[-1]
+    fetch.calls.clear()
+    panel = cache.refresh(["600000.SS", "600001.SS"])
+
+    # one call for both tickers, starting the day after their last cached bar
+    assert fetch.calls == [(["600000.SS", "600001.SS"], DATES[4] + pd.Timedelta(days=1))]
+    assert_prices(panel, CLOSES[["600000.SS", "600001.SS"]])
+    assert len(versions(tmp_path)) == 1
+
+
+def test_new_ticker_is_fetched_in_full(tmp_path):
+    fetch = FakeFetcher()
+    cache = PriceCache(str(tmp_path), fetch=fetch)
+    cache.refresh(["600000.SS"])
+
+    fetch.calls.clear()
+    panel = cache.refresh(["600000.SS", "600002.SS"])
+
+    # the new ticker's full history, and only what followed the cached ticker's last bar
+    assert fetch.calls == [(["600002.SS"], None), (["600000.SS"], DATES[-1] + pd.Timedelta(days=1))]
+    assert_prices(panel, CLOSES[["600000.SS", "600002.SS"]])
+    assert cache.last_dates() == {"600000.SS": DATES[-1], "600002.SS": DATES[-1]}
+
+
+def test_rebuild_refetches_everything(tmp_path):
+    fetch = FakeFetcher()
+    cache = PriceCache(str(tmp_path), fetch=fetch)
+    cache.refresh(["600000.SS"])
+    (tmp_path / "notes.txt").write_text("kept")
+
+    fetch.calls.clear()
+    panel = cache.refresh(["600000.SS"], rebuild=True)
+
+    assert fetch.calls == [(["600000.SS"], None)]
+    assert_prices(panel, CLOSES[["600000.SS"]])
+    assert len(versions(tmp_path)) == 1
+    assert (tmp_path / "notes.txt").read_text() == "kept"
+
+
+def test_interrupted_refresh_leaves_current_readable(tmp_path, monkeypatch):
+    fetch = FakeFetcher(as_of=DATES[4])
+    cache = PriceCache(str(tmp_path), fetch=fetch)
+    cache.refresh(["600000.SS"])
+    current = (tmp_path / CURRENT_FILE).read_text()
+
+    def disk_full(*args, **kwargs):
+        raise OSError("No space left on device")
+    fetch.as_of = DATES[-1]
+    monkeypatch.setattr(price_cache.np, "save", disk_full)
+    with pytest.raises(OSError):
+        cache.refresh(["600000.SS"])
+    monkeypatch.undo()
+
+    assert (tmp_path / CURRENT_FILE).read_text() == current
+    assert_prices(cache.panel(), CLOSES.loc[:DATES[4], ["600000.SS"]])
+
+    # the next refresh completes and removes the half-written snapshot
+    cache.refresh(["600000.SS"])
+    assert versions(tmp_path) == [(tmp_path / CURRENT_FILE).read_text()]
@@ -0,0 +1,38 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from src.analysis.rolling_ols import rolling_spread_zscore
+
+
+def _window_reference(x, y, lookback):
+    spreads = np.full(len(x), np.nan)
+    zs = np.full(len(x), np.nan)
+    for end in range(lookback, len(x)):
+        wx, wy = x[end - lookback:end], y[end - lookback:end]
+        model = LinearRegression().fit(wx.reshape(-1, 1), wy)
+        spread = wy - model.predict(wx.reshape(-1, 1))
+        spreads[end] = spread[-1]
+        zs[end] = (spread[-1] - spread.mean()) / spread.std()
+    return spreads, zs
+
+
+def test_rolling_matches_per_window_regression():
+    rng = np.random.default_rng(7)
+    x = 10 + np.cumsum(rng.normal(0, 0.2, 500))
+    y = 3 + 1.5 * x + rng.normal(0, 0.3, 500)
+
+    spread, z, _ = rolling_spread_zscore(x, y, lookback=60)
+    ref_spread, ref_z = _window_reference(x, y, lookback=60)
+
+    assert np.isnan(z[:60]).all()
+    np.testing.assert_allclose(spread[60:], ref_spread[60:], rtol=1e-7, atol=1e-9)
+    np.testing.assert_allclose(z[60:], ref_z[60:], rtol=1e-7, atol=1e-9)
+
+
+def test_flat_spread_gives_nan_zscore():
+    x = np.arange(100, dtype=float)
+    y = 2.0 * x + 1.0
+
+    _, z, beta = rolling_spread_zscore(x, y, lookback=20)
+
+    assert np.isnan(z).all()
+    np.testing.assert_allclose(beta[20:], 2.0)
@@ -0,0 +1,42 @@
+import numpy as np
+from src.analysis.signal_grid import LONG, SHORT, simulate_grid
+
+
+def _reference(z, z_entry, z_exit):
+    """Single-pair, single-config loop of MeanReversionStrategy.simulate_pair."""
+    trades, position, entry_row = [], None, None
+    for row, z_score in enumerate(z):
+        if np.isnan(z_score):
+            continue
+        if position is None:
+            if z_score > z_entry:
+                position, entry_row = SHORT, row
+            elif z_score < -z_entry:
+                position, entry_row = LONG, row
+        elif abs(z_score) < z_exit:
+            trades.append((entry_row, row, position))
+            position = None
+    return trades
+
+
+def test_simulate_grid_matches_per_pair_loop():
+    rng = np.random.default_rng(0)
+    z = rng.normal(0, 1.5, (500, 7))
+    z[:60] = np.nan  # lookback warm-up
+    z[200:230, 3] = np.nan  # gap
+    z[400:, 5] = np.nan  # shorter pair
+    z_entries = [1.5, 2.0, 2.0, 3.0]
+    z_exits = [0.5, 0.5, 1.0, 0.0]
+
+    pair, config, entry_row, exit_row, direction = simulate_grid(z, z_entries, z_exits)
+
+    for k in range(len(z_entries)):
+        for p in range(z.shape[1]):
+            mine = (pair == p) & (config == k)
+            got = list(zip(entry_row[mine], exit_row[mine], direction[mine]))
+            assert got == _reference(z[:, p], z_entries[k], z_exits[k])
+
+
+def test_simulate_grid_without_trades():
+    pair, config, entry_row, exit_row, direction = simulate_grid(np.full((10, 2), np.nan), [2.0], [0.5])
+    assert len(pair) == len(config) == len(entry_row) == len(exit_row) == len(direction) == 0
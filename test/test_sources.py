@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.db.sources import AKSHARE_COLUMNS, BAR_COLUMNS, FrameSource, SyntheticSource, bar_records
+
+
+def _akshare_frame(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "日期": pd.bdate_range("2024-01-01", periods=n).strftime("%Y-%m-%d"),
+        "开盘": rng.uniform(5, 10, n), "最高": rng.uniform(10, 11, n), "最低": rng.uniform(4, 5, n),
+        "收盘": rng.uniform(5, 10, n), "成交量": rng.integers(1, 10**7, n), "成交额": rng.uniform(1e5, 1e8, n),
+    })
+
+
+def test_bar_records_match_row_by_row_conversion():
+    raw = _akshare_frame()
+    expected = [{
+        "ticker": "600000.SS", "name": "浦发银行", "date": pd.to_datetime(r["日期"]),
+        "open": float(r["开盘"]), "high": float(r["最高"]), "low": float(r["最低"]), "close": float(r["收盘"]),
+        "volume": int(r["成交量"]), "amount": float(r["成交额"]),
+    } for _, r in raw.iterrows()]
+
+    df = raw.rename(columns=AKSHARE_COLUMNS)[BAR_COLUMNS]
+    records = bar_records(df, "600000.SS", "浦发银行")
+
+    assert records == expected
+    assert all(type(r["volume"]) is int and type(r["close"]) is float for r in records)
+
+
+def test_frame_source_filters_dates():
+    df = pd.DataFrame({"date": pd.bdate_range("2024-01-01", periods=10), **{c: 1.0 for c in BAR_COLUMNS[1:]}})
+    source = FrameSource({"600000.SS": df}, names={"600000.SS": "浦发银行"})
+    assert len(source.fetch_daily("600000.SS", "20240105", "20240110")) == 4
+    assert source.list_tickers().to_dict("records") == [{"ticker": "600000.SS", "name": "浦发银行"}]
+
+
+def test_synthetic_source_is_seeded_and_clustered():
+    source = SyntheticSource(n_tickers=30, start="2020-01-01", end="2022-12-30", n_clusters=3, seed=7)
+    again = SyntheticSource(n_tickers=30, start="2020-01-01", end="2022-12-30", n_clusters=3, seed=7)
+    ticker = source.tickers[5]
+    pd.testing.assert_frame_equal(source.fetch_daily(ticker, "20200101"), again.fetch_daily(ticker, "20200101"))
+
+    df = source.fetch_daily(ticker, "20200101")
+    assert list(df.columns) == BAR_COLUMNS
+    assert df["date"].is_monotonic_increasing
+    assert (df["low"] <= df[["open", "close"]].min(axis=1)).all()
+    assert (df["high"] >= df[["open", "close"]].max(axis=1)).all()
+
+    returns = pd.DataFrame({
+        t: source.fetch_daily(t, "20200101").set_index("date")["close"] for t in source.tickers
+    }).pct_change().corr().to_numpy()
+    same = source.cluster_of[:, None] == source.cluster_of[None, :]
+    off_diagonal = ~np.eye(len(source.tickers), dtype=bool)
+    assert np.nanmean(returns[same & off_diagonal]) > np.nanmean(returns[~same]) + 0.2
+
+
+def test_synthetic_source_as_of_and_failures():
+    source = SyntheticSource(n_tickers=3, start="2023-01-02", end="2023-12-29", as_of="2023-06-30")
+    assert source.fetch_daily(source.tickers[0], "20230101")["date"].max() <= pd.Timestamp("2023-06-30")
+
+    flaky = SyntheticSource(n_tickers=3, start="2023-01-02", end="2023-12-29", error_rate=1.0)
+    with pytest.raises(ConnectionError):
+        flaky.fetch_daily(flaky.tickers[0], "20230101")
@@ -0,0 +1,118 @@
+from collections import Counter
+from datetime import datetime
+import pytest
+from pymongo.errors import PyMongoError
+from src.db.queries import ticker_filter
+from src.db.storage import BucketStore, FlatStore, flat_write_outcome, ticker_meta_updates
+
+RECORDS = [
+    {"ticker": "600000.SS", "date": datetime(2024, 1, 3), "name": "", "close": 1.0},
+    {"ticker": "600000.SS", "date": datetime(2024, 1, 2), "name": "PFB", "close": 1.0},
+    {"ticker": "600001.SS", "date": datetime(2024, 1, 2), "name": "", "close": 1.0},
+    {"ticker": "600001.SS", "date": datetime(2024, 1, 4), "name": "", "close": 1.0},
+]
+
+
+def test_only_stored_and_inserted_bars_reach_the_metadata():
+    # bulk write: records 0 and 2 were new, record 3 failed, record 1 rewrote a stored bar
+    written, inserted = flat_write_outcome(RECORDS, upserted=[0, 2], failed=[3])
+
+    assert written == RECORDS[:3]
+    assert inserted == Counter({"600000.SS": 1, "600001.SS": 1})
+
+
+def test_meta_updates_fold_each_ticker_into_one_commutative_upsert(mongo_db):
+    stored = {"ticker": "600001.SS", "first": datetime(2024, 1, 3), "last": datetime(2024, 1, 3), "count": 5,
+              "name": "Stored"}
+    batches = [
+        ticker_meta_updates(RECORDS[:2], Counter({"600000.SS": 2})),
+        ticker_meta_updates(RECORDS[2:], Counter({"600001.SS": 1})),
+    ]
+    in_order, reversed_order = mongo_db.tickers, mongo_db.tickers_reversed
+    for collection, order in ((in_order, batches), (reversed_order, batches[::-1])):
+        collection.insert_one(dict(stored))
+        for updates in order:
+            assert len(updates) == 1  # one upsert per ticker in the batch
+            collection.bulk_write(updates)
+
+    def docs(collection):
+        found = {doc["ticker"]: doc for doc in collection.find({}, {"_id": 0})}
+        assert all(isinstance(doc.pop("last_updated"), datetime) for doc in found.values())
+        return found
+
+    assert docs(in_order) == docs(reversed_order) == {
+        "600000.SS": {"ticker": "600000.SS", "first": datetime(2024, 1, 2), "last": datetime(2024, 1, 3), "count": 2,
+                      "name": "PFB"},
+        # no name in the batch: the stored one is kept, not blanked out
+        "600001.SS": {"ticker": "600001.SS", "first": datetime(2024, 1, 2), "last": datetime(2024, 1, 4), "count": 6,
+                      "name": "Stored"},
+    }
+
+
+def test_ticker_filter():
+    assert ticker_filter() == {}
+    assert ticker_filter(250, datetime(2024, 1, 1)) == {"count": {"$gte": 250}, "last": {"$gte": datetime(2024, 1, 1)}}
+
+
+def bars(ticker, *days, name="", year=2024):
+    return [{"ticker": ticker, "date": datetime(year, 1, d), "name": name, "close": float(d)} for d in days]
+
+
+def stores(db):
+    return [FlatStore(db.daily_prices), BucketStore(db.daily_prices_buckets)]
+
+
+def test_write_bars_maintains_listing_and_summary(mongo_db):
+    for store in stores(mongo_db):
+        store.write_bars(bars("600001.SS", 2, 3, name="PFB") + bars("600000.SS", 2))
+        store.write_bars(bars("600001.SS", 3, 4))  # the 3rd is a rewrite: counted once
+
+        assert store.list_tickers() == ["600000.SS", "600001.SS"]
+        assert store.list_tickers(min_history=2) == ["600001.SS"]
+        assert store.list_tickers(active_since=datetime(2024, 1, 4)) == ["600001.SS"]
+        summary = store.ticker_summary()["600001.SS"]
+        assert (summary["first"], summary["last"], summary["count"], summary["name"]) == (
+            datetime(2024, 1, 2), datetime(2024, 1, 4), 3, "PFB"
+        )
+
+
+def test_existing_database_is_indexed_on_first_read(mongo_db):
+    mongo_db.daily_prices.insert_many(bars("600000.SS", 2, 3, 4, name="PFB"))
+    store = FlatStore(mongo_db.daily_prices)
+
+    assert store.list_tickers() == ["600000.SS"]
+    assert store.meta_ready
+    assert mongo_db.tickers.find_one({"ticker": "600000.SS"}, {"_id": 0, "last_updated": 0}) == {
+        "ticker": "600000.SS", "first": datetime(2024, 1, 2), "last": datetime(2024, 1, 4), "count": 3, "name": "PFB",
+    }
+
+
+def test_failed_bootstrap_is_retried(mongo_db):
+    mongo_db.daily_prices.insert_many(bars("600000.SS", 2))
+    store = FlatStore(mongo_db.daily_prices)
+    rebuild, attempts = store.rebuild_ticker_meta, []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise PyMongoError("primary stepped down")
+        return rebuild()
+    store.rebuild_ticker_meta = flaky
+
+    with pytest.raises(PyMongoError):
+        store.list_tickers()
+    assert not store.meta_ready
+    assert store.list_tickers() == ["600000.SS"]
+    assert len(attempts) == 2
+
+
+def test_bucket_layout_is_one_sorted_document_per_ticker_year(mongo_db):
+    store = BucketStore(mongo_db.daily_prices_buckets)
+    store.write_bars(bars("600000.SS", 4, 2, year=2023) + bars("600000.SS", 3, year=2024))
+
+    buckets = list(mongo_db.daily_prices_buckets.find({}, {"_id": 0}).sort("year", 1))
+    assert [(b["year"], b["count"], b["version"]) for b in buckets] == [(2023, 2, 1), (2024, 1, 1)]
+    assert buckets[0]["date"] == [datetime(2023, 1, 2), datetime(2023, 1, 4)]
+    assert buckets[0]["close"] == [2.0, 4.0]
+    assert (buckets[0]["first"], buckets[0]["last"]) == (datetime(2023, 1, 2), datetime(2023, 1, 4))
+    assert store.ticker_summary()["600000.SS"]["count"] == 3
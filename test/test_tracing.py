@@ -0,0 +1,33 @@
+import json
+import threading
+from src.tracing import Tracer
+
+
+def test_spans_dump_as_trace_events(tmp_path):
+    tracer = Tracer()
+
+    def work():
+        with tracer.span("fetch", "fetch") as info:
+            info["rows"] = 10
+
+    with tracer.span("update", "ingestion", tickers=3):
+        worker = threading.Thread(target=work)
+        worker.start()
+        worker.join()
+
+    trace = json.loads(open(tracer.dump(str(tmp_path / "trace.json"))).read())
+    events = {e["name"]: e for e in trace["traceEvents"]}
+
+    assert set(events) == {"update", "fetch"}
+    assert events["fetch"]["args"]["rows"] == 10
+    assert events["update"]["args"]["tickers"] == 3
+    assert events["fetch"]["tid"] != events["update"]["tid"]
+    assert events["update"]["dur"] >= events["fetch"]["dur"]
+    assert {"cpu_s", "rss_mb", "rss_delta_mb", "peak_rss_mb"} <= set(events["fetch"]["args"])
+    assert tracer.summary()["fetch"]["count"] == 1
+
+
+def test_both_import_names_share_one_tracer():
+    from src.tracing import tracer
+    from tracing import tracer as from_src_dir  # how the analysis stages import it
+    assert from_src_dir is tracer
@@ -0,0 +1,84 @@
+import time
+from datetime import datetime, timedelta
+from threading import Lock
+from src.db.storage import PartialWriteError
+from src.db.writer import BulkWriter
+
+
+class MemoryStore:
+    """(ticker, date)-keyed store; fails the first write of any record whose close is negative."""
+
+    def __init__(self):
+        self.bars = {}
+        self.calls = []
+        self.flaky = set()
+        self.lock = Lock()
+
+    def write_bars(self, records):
+        with self.lock:
+            self.calls.append(len(records))
+            failed = [r for r in records if r["close"] < 0 and (r["ticker"], r["date"]) not in self.flaky]
+            for r in records:
+                if r in failed:
+                    self.flaky.add((r["ticker"], r["date"]))
+                else:
+                    self.bars[(r["ticker"], r["date"])] = r
+            if failed:
+                raise PartialWriteError(failed, ["injected"])
+
+
+def _bars(ticker, n, close=1.0, start=datetime(2024, 1, 1)):
+    return [{"ticker": ticker, "date": start + timedelta(days=k), "close": close} for k in range(n)]
+
+
+def test_flushes_by_size_and_is_idempotent():
+    store = MemoryStore()
+    with BulkWriter(store, n_threads=2, batch_size=100, flush_interval=60, retry_delay=0) as writer:
+        for ticker in ("600000.SS", "600001.SS", "600002.SS"):
+            writer.put(_bars(ticker, 250))
+            writer.put(_bars(ticker, 250))  # rerun of the same bars
+    assert len(store.bars) == 750
+    assert max(store.calls) <= 100
+    assert writer.stats["written"] == 1500 and writer.stats["failed"] == 0
+
+
+def test_flushes_by_time():
+    store = MemoryStore()
+    writer = BulkWriter(store, n_threads=1, batch_size=10_000, flush_interval=0.05)
+    writer.start()
+    writer.put(_bars("600000.SS", 5))
+    time.sleep(0.3)
+    assert len(store.bars) == 5  # flushed before close()
+    writer.close()
+
+
+def test_retries_only_the_failed_sub_batch():
+    store = MemoryStore()
+    records = _bars("600000.SS", 20) + _bars("600001.SS", 3, close=-1.0)
+    with BulkWriter(store, n_threads=1, batch_size=100, retry_delay=0) as writer:
+        writer.put(records)
+    assert store.calls == [23, 3]
+    assert len(store.bars) == 23
+    assert writer.stats == {"written": 23, "batches": 1, "retried": 3, "failed": 0}
+
+
+def test_bounded_queue_blocks_producers():
+    class SlowStore(MemoryStore):
+        def write_bars(self, records):
+            time.sleep(0.05)
+            super().write_bars(records)
+
+    writer = BulkWriter(SlowStore(), n_threads=1, batch_size=1, flush_interval=0, max_queue=2)
+    writer.start()
+    started = time.monotonic()
+    for k in range(8):
+        writer.put(_bars(f"60000{k}.SS", 1))
+    assert time.monotonic() - started >= 0.2
+    writer.close()
+
+
+def test_reports_touched_tickers_after_each_batch():
+    touched = []
+    with BulkWriter(MemoryStore(), n_threads=1, batch_size=100, flush_interval=60, on_write=touched.append) as writer:
+        writer.put(_bars("600000.SS", 60) + _bars("600001.SS", 60))
+    assert touched == [{"600000.SS", "600001.SS"}, {"600001.SS"}]